@@ -0,0 +1,85 @@
+"""
+Repetition Avoidance Index
+Running record of what a week's plan has already used, updated once as each day completes
+instead of rescanning every earlier plan for every new day:
+  - every exercise name of the earlier days (warm-up, main, cool-down) for strict name avoidance
+  - the main-workout movement patterns of the last RECENT_DAYS days (a ring of per-day pattern
+    lists plus a Counter over the ring) for the recovery constraint
+Names keep first-seen order, so the prompt text (and its response cache key) is stable.
+"""
+
+from collections import Counter, deque
+from typing import Callable, Dict, Iterable, List, Optional
+
+RECENT_DAYS = 3 # Days whose movement patterns count toward the recovery constraint
+IGNORED_PATTERNS = ("Cardio/Mobility/Flexibility", "Miscellaneous/Unknown Pattern") # Never worth avoiding
+
+_NAME_SECTIONS = ('main_workout', 'warmup', 'cooldown')
+_PATTERN_SECTIONS = ('main_workout',)
+
+
+class AvoidanceIndex:
+    """Names and recent movement patterns of the days added so far (in day order)."""
+
+    def __init__(self, pattern_of: Callable[[str], str], recent_days: int = RECENT_DAYS):
+        self.pattern_of = pattern_of
+        self.days: List[str] = []
+        self.names: Dict[str, None] = {} # Insertion-ordered set
+        self.pattern_counts: Counter = Counter()
+        self.recent = deque(maxlen=recent_days) # Per-day pattern lists, oldest first
+        self._pattern_memo: Dict[str, str] = {}
+
+    @classmethod
+    def from_plans(cls, pattern_of: Callable[[str], str], day_order: Iterable[str], previous_plans: Optional[Dict],
+                   recent_days: int = RECENT_DAYS) -> "AvoidanceIndex":
+        """Index over the days of `day_order` present in previous_plans (the dict form the app used to pass)."""
+        index = cls(pattern_of, recent_days)
+        for day in day_order:
+            if previous_plans and day in previous_plans:
+                index.add_day(day, previous_plans[day])
+        return index
+
+    def __contains__(self, day: str) -> bool:
+        return day in self.days
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def add_day(self, day: str, result: Optional[Dict]):
+        """
+        Records a finished day (a generate_workout_plan result). Failed days still take a slot in
+        the ring, so it always spans the last RECENT_DAYS calendar days of the plan.
+        """
+        if day in self.days:
+            return
+        self.days.append(day)
+
+        plan_json = result.get('plan_json') if result and result.get('success') else None
+        patterns = []
+        if plan_json:
+            for section in _NAME_SECTIONS:
+                for exercise in plan_json.get(section, []):
+                    name = exercise.get('name', '').strip()
+                    if not name:
+                        continue
+                    self.names[name] = None
+                    if section in _PATTERN_SECTIONS:
+                        patterns.append(self._pattern(name))
+
+        if len(self.recent) == self.recent.maxlen:
+            self.pattern_counts -= Counter(self.recent[0]) # Drops patterns whose count reaches zero
+        self.recent.append(patterns)
+        self.pattern_counts.update(patterns)
+
+    def _pattern(self, name: str) -> str:
+        pattern = self._pattern_memo.get(name)
+        if pattern is None:
+            pattern = self._pattern_memo[name] = self.pattern_of(name)
+        return pattern
+
+    def exercises_to_avoid(self) -> List[str]:
+        return list(self.names)
+
+    def patterns_to_avoid(self) -> List[str]:
+        """Movement patterns trained in the last RECENT_DAYS days, minus the ones never worth avoiding."""
+        return [pattern for pattern in self.pattern_counts if pattern not in IGNORED_PATTERNS]
@@ -0,0 +1,304 @@
+"""
+Headless Batch Plan Generator
+Pre-generates workout plans for many onboarding profiles without the Streamlit form.
+
+Input:  JSONL, one user profile per line (same keys as the app's user_profile, e.g. "name", "age",
+        "fitness_level", "days_per_week", ...). An optional "profile_id" names the profile;
+        otherwise its line number is used.
+Output: JSONL, one record per generated day in the response.json schema
+        (plan_metadata / profile_summary / workout_day).
+Resume: completed profiles are recorded in a checkpoint together with the output offset, so a
+        re-run skips them and truncates any partially written tail.
+
+Usage:
+    python batch_generate.py profiles.jsonl -o plans.jsonl --workers 8 --rate-limit 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from cli_logging import quiet_streamlit_context_warnings
+quiet_streamlit_context_warnings() # Before the app imports below, which already call st.*
+
+import test26 as app # FitnessAdvisor, endpoint configuration and HTTP timeouts
+
+DEFAULT_WORKERS = 4
+DEFAULT_RATE_LIMIT = 2.0 # LLM requests per second across all workers
+DEFAULT_BURST = 4
+
+
+# ============ RATE LIMITING ============
+class RateLimiter:
+    """Thread-safe token bucket: `rate` requests per second with bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = DEFAULT_BURST):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return # Unlimited
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_seconds = (1 - self.tokens) / self.rate
+            time.sleep(wait_seconds)
+
+
+class RateLimitedSession(requests.Session):
+    """Keep-alive session that takes a rate-limit token before every request (retries included)."""
+
+    def __init__(self, limiter: RateLimiter, pool_size: int):
+        super().__init__()
+        self.limiter = limiter
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, *args, **kwargs):
+        self.limiter.acquire()
+        return super().request(*args, **kwargs)
+
+
+# ============ CHECKPOINT ============
+def _checkpoint_entry(line: bytes) -> Optional[Dict]:
+    """One checkpoint line, or None if it is unreadable. A line that an older version appended to a
+    torn one ('{"profile_id": 3, "outp{"profile_id": 4, ...}') still yields its complete last entry."""
+    for start in (0, line.rfind(b'{"profile_id"')):
+        if start < 0:
+            continue
+        try:
+            entry = json.loads(line[start:])
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            continue
+        if isinstance(entry, dict) and "profile_id" in entry and "output_offset" in entry:
+            return entry
+    return None
+
+
+def load_checkpoint(checkpoint_path: str) -> Tuple[set, int]:
+    """
+    Returns (completed profile ids, output offset after the last completed profile).
+    Unreadable lines are skipped, and anything after the last complete entry (the torn line of an
+    interrupted run) is cut off, so the next append starts on a line of its own.
+    """
+    completed, offset = set(), 0
+    if not os.path.exists(checkpoint_path):
+        return completed, offset
+
+    position = valid_end = 0
+    with open(checkpoint_path, "rb") as f:
+        for line in f:
+            position += len(line)
+            entry = _checkpoint_entry(line) if line.endswith(b"\n") else None
+            if entry is None:
+                continue
+            completed.add(entry["profile_id"])
+            offset = entry["output_offset"]
+            valid_end = position
+
+    if valid_end < position:
+        with open(checkpoint_path, "r+b") as f:
+            f.truncate(valid_end)
+    return completed, offset
+
+
+# ============ OUTPUT SCHEMA ============
+def _int_or_value(value):
+    """'3' -> 3, 'RPE 5' -> 5; anything else is kept as-is (e.g. '2-3')."""
+    text = str(value).replace("RPE", "").strip()
+    return int(text) if text.isdigit() else value
+
+
+def _export_exercise(exercise: Dict, section_key: str) -> Dict:
+    record = {
+        "name": exercise.get("name", "N/A"),
+        "benefit": exercise.get("benefit", exercise.get("focus", "N/A")),
+        "sets": _int_or_value(exercise.get("sets", 1)),
+    }
+    if section_key == "cooldown":
+        record["hold_duration"] = exercise.get("hold", "N/A")
+    else:
+        record["reps_description"] = exercise.get("reps", "N/A")
+    record.update({
+        "intensity_rpe": _int_or_value(exercise.get("intensity_rpe", "N/A")),
+        "rest": exercise.get("rest", "N/A"),
+        "equipment": exercise.get("equipment", "N/A"),
+        "safety_cue": exercise.get("safety_cue", "N/A"),
+        "estimated_calories": int(exercise.get("planned_total_cal", 0)),
+        "steps": exercise.get("steps", [])
+    })
+    return record
+
+
+def to_response_record(profile_id: str, profile: Dict, day_name: str, result: Dict) -> Dict:
+    """Maps a generate_workout_plan() result onto the response.json schema."""
+    plan_json = result.get("plan_json") or {}
+    sections = {
+        section_key: [_export_exercise(exercise, section_key) for exercise in plan_json.get(section_key, []) or []]
+        for section_key in ("warmup", "main_workout", "cooldown")
+    }
+    conditions = profile.get("medical_conditions", ["None"])
+
+    return {
+        "plan_metadata": {
+            "profile_id": profile_id,
+            "generated_on": datetime.now().strftime("%B %d, %Y"),
+            "status": "SUCCESS" if result.get("success") else "FALLBACK",
+            "error": result.get("error"),
+            "total_estimated_calories": sum(exercise["estimated_calories"] for exercises in sections.values() for exercise in exercises)
+        },
+        "profile_summary": {
+            "name": profile.get("name", "User"),
+            "age": profile.get("age"),
+            "gender": profile.get("gender"),
+            "bmi": profile.get("bmi"),
+            "primary_goal": profile.get("primary_goal"),
+            "secondary_goal": profile.get("secondary_goal", "None"),
+            "fitness_level": profile.get("fitness_level"),
+            "training_days": profile.get("days_per_week", []),
+            "session_duration": profile.get("session_duration"),
+            "medical_conditions": ", ".join(conditions) if isinstance(conditions, list) else conditions,
+            "physical_limitations": profile.get("physical_limitation") or "None",
+            "available_equipment": profile.get("available_equipment", []),
+            "weekly_progression_goal": result.get("progression_tip")
+        },
+        "workout_day": {
+            "day_name": day_name,
+            "warmup": {"duration": plan_json.get("warmup_duration", "N/A"), "exercises": sections["warmup"]},
+            "main_workout": {"category": plan_json.get("main_workout_category", "N/A"), "exercises": sections["main_workout"]},
+            "cooldown": {"duration": plan_json.get("cooldown_duration", "N/A"), "exercises": sections["cooldown"]},
+            "safety_notes": plan_json.get("safety_notes", [])
+        }
+    }
+
+
+# ============ GENERATION ============
+def generate_profile(advisor, profile: Dict) -> Tuple[List[Tuple[str, Dict]], List[float]]:
+    """Generates every training day of one profile in order (later days see the earlier plans, as in the app)."""
+    results, day_latencies, previous_plans = [], [], {}
+    for day_index, day in enumerate(profile.get("days_per_week", [])):
+        started = time.perf_counter()
+        result = advisor.generate_workout_plan(profile, day, day_index, dict(previous_plans), "Full Body")
+        day_latencies.append(time.perf_counter() - started)
+        previous_plans[day] = result
+        results.append((day, result))
+    return results, day_latencies
+
+
+def read_profiles(input_path: str) -> List[Tuple[str, Dict]]:
+    profiles = []
+    with open(input_path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            profile = json.loads(line)
+            profiles.append((str(profile.pop("profile_id", line_number)), profile))
+    return profiles
+
+
+def run_batch(input_path: str, output_path: str, checkpoint_path: Optional[str] = None, workers: int = DEFAULT_WORKERS,
+              rate_limit: float = DEFAULT_RATE_LIMIT, endpoint_url: str = app.ENDPOINT_URL, api_key: str = app.API_KEY,
+              use_cache: bool = True) -> Dict:
+    """Runs the batch and returns the throughput stats (also printed by the CLI)."""
+    checkpoint_path = checkpoint_path or output_path + ".checkpoint"
+    completed, output_offset = load_checkpoint(checkpoint_path)
+    pending = [(profile_id, profile) for profile_id, profile in read_profiles(input_path) if profile_id not in completed]
+
+    session = RateLimitedSession(RateLimiter(rate_limit), pool_size=max(1, workers))
+    advisor = app.FitnessAdvisor(api_key, endpoint_url, http_session=session)
+    if not use_cache:
+        advisor.response_cache = None
+
+    # Drop anything written after the last checkpointed profile (interrupted run)
+    with open(output_path, "a+b") as f:
+        f.truncate(output_offset)
+
+    stats = {"profiles": 0, "days": 0, "fallback_days": 0, "skipped_profiles": len(completed), "failed_profiles": 0}
+    day_latencies = []
+    write_lock = threading.Lock()
+    started = time.perf_counter()
+
+    with open(output_path, "ab") as output, open(checkpoint_path, "a", encoding="utf-8") as checkpoint, \
+            ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(generate_profile, advisor, profile): (profile_id, profile) for profile_id, profile in pending}
+
+        for future in as_completed(futures):
+            profile_id, profile = futures[future]
+            try:
+                day_results, latencies = future.result()
+            except Exception as e: # One bad profile must not stop an overnight run
+                stats["failed_profiles"] += 1
+                print(f"[batch] profile {profile_id} failed: {e}", file=sys.stderr)
+                continue
+
+            lines = b"".join(
+                json.dumps(to_response_record(profile_id, profile, day, result), ensure_ascii=False).encode("utf-8") + b"\n"
+                for day, result in day_results
+            )
+            with write_lock:
+                output.write(lines)
+                output.flush()
+                os.fsync(output.fileno())
+                # The checkpoint is written only after the profile's records are durable
+                checkpoint.write(json.dumps({"profile_id": profile_id, "output_offset": output.tell()}) + "\n")
+                checkpoint.flush()
+
+            stats["profiles"] += 1
+            stats["days"] += len(day_results)
+            stats["fallback_days"] += sum(1 for _, result in day_results if not result.get("success"))
+            day_latencies.extend(latencies)
+
+    elapsed = time.perf_counter() - started
+    stats["elapsed_seconds"] = round(elapsed, 2)
+    stats["profiles_per_minute"] = round(stats["profiles"] / elapsed * 60, 2) if elapsed else 0.0
+    stats["days_per_second"] = round(stats["days"] / elapsed, 3) if elapsed else 0.0
+    if day_latencies:
+        stats["day_latency_p50_seconds"] = round(float(np.percentile(day_latencies, 50)), 3)
+        stats["day_latency_p95_seconds"] = round(float(np.percentile(day_latencies, 95)), 3)
+    if advisor.response_cache is not None:
+        cache_stats = advisor.response_cache.stats()
+        stats["cache_hits"], stats["cache_misses"] = cache_stats["hits"], cache_stats["misses"]
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate workout plans for a JSONL file of profiles (no UI).")
+    parser.add_argument("input", help="Profiles JSONL (one user_profile object per line)")
+    parser.add_argument("-o", "--output", default="plans.jsonl", help="Output JSONL in the response.json schema")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Profiles generated in parallel")
+    parser.add_argument("--rate-limit", type=float, default=DEFAULT_RATE_LIMIT, help="Max LLM requests per second (0 = unlimited)")
+    parser.add_argument("--endpoint", default=app.ENDPOINT_URL)
+    parser.add_argument("--api-key", default=app.API_KEY)
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk response cache")
+    args = parser.parse_args()
+
+    stats = run_batch(args.input, args.output, args.checkpoint, args.workers, args.rate_limit, args.endpoint, args.api_key, not args.no_cache)
+
+    print("Batch complete")
+    for key, value in stats.items():
+        print(f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
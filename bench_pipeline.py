@@ -0,0 +1,221 @@
+"""
+Plan Pipeline Benchmark
+Runs the test26.py pipeline end to end against the local chat-completions stub
+(fake_llm_server.py) and times every stage, plus blend.py's CSV-based generate_workout_plan.
+
+Stages: prompt_build, llm_call, json_extraction, calories, markdown, export, blend_generate.
+Reports p50/p95 per stage and plan throughput for 1-7 training days. Baselines are stored as
+JSON; later runs are compared against them and slower stages are flagged.
+
+Usage:
+    python bench_pipeline.py --latency 0.05 --save-baseline bench_baseline.json
+    python bench_pipeline.py --latency 0.05 --baseline bench_baseline.json --fail-on-regression
+"""
+
+import argparse
+import copy
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from cli_logging import quiet_streamlit_context_warnings
+quiet_streamlit_context_warnings() # Before the app imports below, which already call st.*
+
+import fake_llm_server
+from plan_schema import fill_plan, section_targets
+import test26 as app
+import blend
+
+DEFAULT_BASELINE_PATH = "bench_baseline.json"
+DEFAULT_ITERATIONS = 30
+DEFAULT_TOLERANCE = 0.25 # p50 more than 25% slower than baseline counts as a regression
+WEEK_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+BENCH_PROFILE = {
+    "name": "Bench", "age": 42, "gender": "Female", "weight_kg": 72.0, "height_cm": 168.0, "bmi": 25.5,
+    "primary_goal": "Weight Loss", "secondary_goal": "None", "target_body_parts": ["Full Body"],
+    "fitness_level": "Beginner (0–6 months)", "medical_conditions": ["None"], "physical_limitation": "",
+    "specific_avoidance": "None", "days_per_week": ["Monday", "Wednesday", "Friday"],
+    "session_duration": "30-45 minutes", "available_equipment": ["None"], "unit_system": "Metric",
+    "workout_location": "Home"
+}
+
+BLEND_PROFILE = {
+    "name": "Bench", "age": 42, "gender": "Female", "weight_kg": 72.0, "height_cm": 168.0, "bmi": 25.5,
+    "primary_goal": "Muscle Gain (Hypertrophy)", "secondary_goal": "None",
+    "fitness_level": "Level 3 – Moderate / Independent", "medical_conditions": ["None"], "physical_limitations": "",
+    "days_per_week": ["Monday", "Wednesday", "Friday"], "session_duration": "30-45 minutes",
+    "available_equipment": ["Bodyweight Only", "Dumbbells", "Stable Chair", "Yoga Mat"], "workout_location": "Home"
+}
+
+
+def time_call(fn: Callable, iterations: int) -> List[float]:
+    """Wall-clock seconds for each of `iterations` calls (one untimed warm-up call first)."""
+    fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    values = np.asarray(samples) * 1000.0
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "mean_ms": round(float(values.mean()), 3),
+        "n": len(samples)
+    }
+
+
+def bench_stages(advisor, iterations: int) -> Dict[str, Dict[str, float]]:
+    """Times each stage of generate_workout_plan in isolation (same calls, same order as the app)."""
+    profile = dict(BENCH_PROFILE)
+    day, day_index = profile["days_per_week"][0], 0
+
+    system_prompt = advisor._build_system_prompt(profile, day, day_index, {}, "Full Body")
+    payload = advisor._build_payload(system_prompt) # Same request body (and response_format) as the app
+
+    def llm_call():
+        response = advisor.http_session.post(advisor.endpoint_url, json=payload, timeout=(app.HTTP_CONNECT_TIMEOUT, app.HTTP_READ_TIMEOUT))
+        return response.json()['choices'][0]['message']['content']
+
+    plan_text = llm_call()
+    plan_json = advisor._extract_plan_json(plan_text)
+    if advisor.structured_output != "off":
+        # As in generate_workout_plan: sets/RPE/rest are not in the structured completion, Python fills them
+        values = advisor._prompt_values(profile, day, day_index, {}, "Full Body")
+        fill_plan(plan_json, section_targets(values['target_sets'], values['target_rpe'], values['target_rest']))
+    enriched_plan = copy.deepcopy(plan_json)
+    plan_md = advisor._convert_plan_to_markdown_enhanced(enriched_plan, profile)
+    workout_plans = {d: {"success": True, "plan_json": enriched_plan, "plan_md": plan_md, "error": None} for d in profile["days_per_week"]}
+
+    # The markdown export reads the JSON plans from session state, as in the app
+    app.st.session_state.all_json_plans = {d: enriched_plan for d in workout_plans}
+
+    def export():
+        app.generate_markdown_export(profile, workout_plans, "Bench tip")
+        json.dumps({"profile": profile, "plans_json": {d: enriched_plan for d in workout_plans}, "logged_performance": {}}, indent=4)
+
+    df_exercise = blend.load_exercise_data()
+
+    return {
+        "prompt_build": summarize(time_call(lambda: advisor._build_system_prompt(profile, day, day_index, {}, "Full Body"), iterations)),
+        "llm_call": summarize(time_call(llm_call, iterations)),
+        "json_extraction": summarize(time_call(lambda: advisor._extract_plan_json(plan_text), iterations)),
+        "calories": summarize(time_call(lambda: advisor.build_calorie_table(plan_json, profile["fitness_level"]).summary(profile["weight_kg"]), iterations)),
+        "markdown": summarize(time_call(lambda: advisor._convert_plan_to_markdown_enhanced(copy.deepcopy(plan_json), profile), iterations)),
+        "export": summarize(time_call(export, iterations)),
+        "blend_generate": summarize(time_call(lambda: blend.generate_workout_plan(df_exercise, dict(BLEND_PROFILE)), iterations))
+    }
+
+
+def bench_throughput(advisor, repeats: int) -> Dict[str, Dict[str, float]]:
+    """Full-plan generation for 1-7 training days, using the same path as the app (concurrent for >1 day)."""
+    throughput = {}
+    for day_count in range(1, 8):
+        profile = {**BENCH_PROFILE, "days_per_week": WEEK_DAYS[:day_count]}
+
+        def generate_plan():
+            if app.CONCURRENT_GENERATION and day_count > 1:
+                advisor.generate_workout_plans_concurrently(profile)
+            else:
+                advisor.generate_workout_plan(profile, profile["days_per_week"][0], 0, {}, "Full Body")
+
+        samples = time_call(generate_plan, repeats)
+        stats = summarize(samples)
+        stats["plans_per_second"] = round(1.0 / float(np.median(samples)), 3)
+        stats["days_per_second"] = round(day_count / float(np.median(samples)), 3)
+        throughput[f"{day_count}_days"] = stats
+    return throughput
+
+
+def compare_to_baseline(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Returns one message per stage/plan size whose p50 regressed by more than `tolerance`."""
+    regressions = []
+    for group in ("stages", "throughput"):
+        for name, stats in results.get(group, {}).items():
+            previous = baseline.get(group, {}).get(name)
+            if not previous or not previous.get("p50_ms"):
+                continue
+            ratio = stats["p50_ms"] / previous["p50_ms"]
+            if ratio > 1 + tolerance:
+                regressions.append(f"{group}.{name}: p50 {previous['p50_ms']:.2f} ms -> {stats['p50_ms']:.2f} ms ({ratio:.2f}x)")
+    return regressions
+
+
+def print_report(results: Dict):
+    print(f"\nStage latency ({results['config']['iterations']} iterations, LLM latency {results['config']['latency_s']}s)")
+    print(f"  {'stage':<18}{'p50 ms':>12}{'p95 ms':>12}")
+    for name, stats in results["stages"].items():
+        print(f"  {name:<18}{stats['p50_ms']:>12.3f}{stats['p95_ms']:>12.3f}")
+
+    print("\nPlan throughput")
+    print(f"  {'plan':<10}{'p50 ms':>12}{'p95 ms':>12}{'plans/s':>10}{'days/s':>10}")
+    for name, stats in results["throughput"].items():
+        print(f"  {name:<10}{stats['p50_ms']:>12.1f}{stats['p95_ms']:>12.1f}{stats['plans_per_second']:>10.2f}{stats['days_per_second']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the plan pipeline against a local fake LLM endpoint.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated LLM response latency in seconds")
+    parser.add_argument("--plan", help="Canned plan JSON served by the stub (default: built-in sample plan)")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="Samples per stage")
+    parser.add_argument("--plan-repeats", type=int, default=5, help="Samples per plan size (1-7 days)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="Baseline JSON to compare against (if it exists)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 if any stage regressed")
+    args = parser.parse_args()
+
+    plan = None
+    if args.plan:
+        with open(args.plan, encoding="utf-8") as f:
+            plan = json.load(f)
+
+    server = fake_llm_server.start_server(plan=plan, response_delay=args.latency)
+    advisor = app.FitnessAdvisor("bench-key", fake_llm_server.endpoint_url(server))
+    advisor.response_cache = None # Every call must reach the (fake) endpoint
+
+    results = {
+        "config": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "latency_s": args.latency,
+            "iterations": args.iterations,
+            "plan_repeats": args.plan_repeats,
+            "python": platform.python_version(),
+            "machine": platform.machine()
+        },
+        "stages": bench_stages(advisor, args.iterations),
+        "throughput": bench_throughput(advisor, args.plan_repeats)
+    }
+    server.shutdown()
+    print_report(results)
+
+    regressions = []
+    if args.baseline and os.path.exists(args.baseline) and args.baseline != args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        print(f"\nCompared against {args.baseline} (tolerance {args.tolerance:.0%}): {len(regressions)} regression(s)")
+        for message in regressions:
+            print(f"  REGRESSION {message}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.save_baseline}")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
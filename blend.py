@@ -1,12 +1,21 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Tuple, Union
 import re
 import random
 import requests # Library for making HTTP requests (for Gemini API)
 import json # Library for handling JSON data
 import time # For exponential backoff
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from contraindication_index import ContraindicationIndex, split_phrases
+from filter_cache import StageMaskCache, tag_dataset
+from exercise_catalog import CATALOG, CSV_SOURCE_FILE
+from exercise_store import EXERCISE_ID_COLUMN, ExerciseStore, TokenVocabulary, decode_categoricals
 
 # Note: The API Key for the Gemini API is automatically provided by the Canvas environment 
 # when the apiKey variable is left as an empty string and used in the URL.
@@ -45,25 +54,65 @@ DURATION_MAP = {
     "45-60 minutes": {'total_time': 53, 'warmup_count': 3, 'cooldown_count': 2, 'main_count': 11},
 }
 
-EXERCISE_DATA_FILE = "Latest exercise database- New model.csv"
+EXERCISE_DATA_FILE = CSV_SOURCE_FILE # Read through the shared exercise catalog (exercise_catalog.py)
 
 # Define Resistance Categories
 RESISTANCE_CATS = ['Upper Body Push', 'Upper Body Pull', 'Lower Body', 'Core']
 
+MAX_PARALLEL_PLANS = 4 # Worker threads for generate_workout_plans_concurrently
+
+# Profile fields that shape a generated plan; their stable hash seeds the plan's random stream
+PLAN_SEED_FIELDS = ('primary_goal', 'fitness_level', 'medical_conditions', 'physical_limitations', 'days_per_week',
+                    'session_duration', 'available_equipment', 'workout_location', 'age', 'gender', 'bmi')
+
+# Goals accepted when the strict goal match is too small (the profile's own goal is added at filter time)
+COMPATIBLE_GOALS = ['strength gain', 'general fitness', 'posture & balance improvement', 'cardiovascular fitness']
+
+# Location rules (equipment tokens are compared with spaces removed)
+HOME_FORBIDDEN_EQUIPMENT = ['machines', 'barbells', 'cables', 'pull-upbar', 'barbell', 'cable']
+OUTDOOR_ALLOWED_EQUIPMENT = ['bodyweight', 'outdooronly', 'mat', 'wall', 'bench']
+
+# Prescription columns holding an 'N-N' range (parsed once into _Prefix/_Low/_High/_Suffix columns)
+RANGE_COLUMNS = ('RPE', 'Reps')
+RANGE_PATTERN = r'(?s)^(.*?)(\d+)-(\d+)(.*)$'
+
+# Per-stage filter masks, shared by every session of this process
+STAGE_MASKS = StageMaskCache()
+
+# Feature matrix column prefixes (one boolean column per token, built once in load_exercise_data)
+EQUIPMENT_FEATURE_PREFIX = "Eq::"
+GOAL_FEATURE_PREFIX = "Goal::"
+FEATURE_FLAG_COLUMNS = ('Has_Bodyweight', 'Is_Bodyweight_Strength', 'Home_Compatible', 'Gym_Compatible', 'Outdoor_Compatible',
+                        'Is_Strength_Category', 'Is_Assisted', 'RPE_Max')
+
+# Filter/selection-only columns, dropped from every returned daily plan (see drop_internal_columns)
+INTERNAL_COLUMNS = FEATURE_FLAG_COLUMNS + tuple(
+    f'{column}_{part}' for column in RANGE_COLUMNS for part in ('Prefix', 'Low', 'High', 'Suffix')
+) + (EXERCISE_ID_COLUMN,)
+
 @st.cache_data
 def load_exercise_data():
     """
-    Loads the actual exercise database from CSV, cleans it, and creates required filtering columns.
+    The compact exercise frame used for filtering and selection (see load_exercise_store).
+    """
+    return load_exercise_store().frame
+
+@st.cache_resource
+def load_exercise_store() -> ExerciseStore:
+    """
+    Loads the actual exercise database from CSV, cleans it, creates the required filtering columns
+    and splits it into the compact store (exercise_store.py). Built once per process and shared:
+    sessions get a copy of the small frame, never of the text side table.
     """
     try:
         # NOTE: If this file is not present in the same directory, this will fail.
-        df = pd.read_csv(EXERCISE_DATA_FILE, encoding='utf-8')
+        df = CATALOG.source_table('csv')
     except FileNotFoundError:
         st.error(f"❌ Error: Exercise database file '{EXERCISE_DATA_FILE}' not found. Please ensure the file is uploaded and in the correct directory.")
-        return pd.DataFrame()
+        return ExerciseStore(pd.DataFrame())
     except Exception as e:
         st.error(f"❌ Error loading exercise data: {e}")
-        return pd.DataFrame()
+        return ExerciseStore(pd.DataFrame())
 
     # --- Data Cleaning and Augmentation ---
     
@@ -76,15 +125,18 @@ def load_exercise_data():
     required_cols = ['Goals', 'Available Equipment', 'Category', 'Exercise Name', 'Target Region', 'Contraindications']
     if not all(col in df.columns for col in required_cols):
         st.error(f"Internal Error: Missing required columns in CSV: {list(set(required_cols) - set(df.columns))}")
-        return pd.DataFrame()
+        return ExerciseStore(pd.DataFrame())
 
-    # Robustly create Goals_List and Equipment_List for reliable filtering
-    df['Goals_List'] = df['Goals'].fillna('').astype(str).apply(
-        lambda x: [s.strip().lower() for s in x.split(',')]
-    )
-    df['Equipment_List'] = df['Available Equipment'].fillna('').astype(str).apply(
-        lambda x: [s.strip().lower() for s in x.replace("/", ",").split(',')]
-    )
+    # Robustly tokenize Goals and Available Equipment for reliable filtering (interned ids, not per-row lists)
+    df = df.reset_index(drop=True)
+    vocabularies = {
+        'goals': TokenVocabulary(
+            [s.strip().lower() for s in x.split(',')] for x in df['Goals'].fillna('').astype(str)
+        ),
+        'equipment': TokenVocabulary(
+            [s.strip().lower() for s in x.replace("/", ",").split(',')] for x in df['Available Equipment'].fillna('').astype(str)
+        )
+    }
     
     # Create Concept_Group (e.g., 'reverse lunge' -> 'reverse')
     df['Concept_Group'] = df['Exercise Name'].str.split(' ').str[0].str.lower()
@@ -112,11 +164,102 @@ def load_exercise_data():
     # Ensure Category is clean for grouping
     df['Category'] = df['Category'].astype(str).str.strip()
     
+    # Parse the RPE/Reps ranges once; plan adjustments work on the numeric bounds
+    df = parse_range_columns(df)
+    
+    # Categoricals, token ids and the text side table; the frame is fingerprinted so filter stage masks
+    # are shared across reruns (see filter_cache.py)
+    store = ExerciseStore.from_frame(build_feature_matrix(df, vocabularies), vocabularies)
+    tag_dataset(store.frame)
+    return store
+
+def parse_range_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Splits each RANGE_COLUMNS value at its first 'N-N' range: 'Hold 30-45 sec / side' ->
+    Reps_Prefix 'Hold ', Reps_Low 30, Reps_High 45, Reps_Suffix ' sec / side'.
+    Values without a range get NaN bounds and keep their text unchanged.
+    """
+    for column in RANGE_COLUMNS:
+        if column not in df.columns:
+            continue
+        parts = df[column].astype(str).str.extract(RANGE_PATTERN)
+        df[f'{column}_Prefix'] = parts[0]
+        df[f'{column}_Low'] = pd.to_numeric(parts[1]).astype(float)
+        df[f'{column}_High'] = pd.to_numeric(parts[2]).astype(float)
+        df[f'{column}_Suffix'] = parts[3]
+    return df
+
+def format_range_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Writes the (adjusted) numeric bounds back into the RANGE_COLUMNS text, e.g. '8-12 / side'."""
+    for column in RANGE_COLUMNS:
+        low_column, high_column = f'{column}_Low', f'{column}_High'
+        if low_column not in df.columns:
+            continue
+        # A daily plan is a dozen rows: plain arrays are far cheaper here than pandas string ops
+        texts = df[column].to_numpy(dtype=object)
+        lows, highs = df[low_column].to_numpy(dtype=float), df[high_column].to_numpy(dtype=float)
+        prefixes, suffixes = df[f'{column}_Prefix'].to_numpy(dtype=object), df[f'{column}_Suffix'].to_numpy(dtype=object)
+        df[column] = [
+            f"{prefix}{int(low)}-{int(high)}{suffix}" if not (np.isnan(low) or np.isnan(high)) else text
+            for text, low, high, prefix, suffix in zip(texts, lows, highs, prefixes, suffixes)
+        ]
     return df
 
-# Global sets for A/B split variety tracking
-used_concept_groups_A = set()
-used_concept_groups_B = set()
+def drop_internal_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """A rendered daily plan without the feature matrix, range bounds and Exercise_Id (display/export columns only)."""
+    internal = [column for column in df.columns
+                if column in INTERNAL_COLUMNS or column.startswith((EQUIPMENT_FEATURE_PREFIX, GOAL_FEATURE_PREFIX))]
+    return df.drop(columns=internal)
+
+def goal_key(goal: str) -> str:
+    """'Muscle Gain (Hypertrophy)' -> 'muscle gain' (the substring matched against each goal token)."""
+    return goal.lower().split('(')[0].strip()
+
+def build_feature_matrix(df: pd.DataFrame, vocabularies: Dict[str, TokenVocabulary]) -> pd.DataFrame:
+    """
+    Precomputes the boolean feature columns used by filter_and_select_exercises, so filtering a
+    profile is a handful of vectorized AND/OR masks instead of row-wise Python lambdas:
+    one column per equipment token and goal, plus location compatibility, assisted/strength flags and the max RPE (for the RPE 5+ stimulus bucket).
+    """
+    features = {}
+    goals, equipment = vocabularies['goals'], vocabularies['equipment']
+    
+    # Equipment: one column per token (spaces removed, as the profile's equipment is normalized)
+    for token in sorted({eq.replace(" ", "") for eq in equipment.tokens}):
+        features[EQUIPMENT_FEATURE_PREFIX + token] = equipment.rows_matching(lambda eq, t=token: eq.replace(" ", "") == t)
+    features['Has_Bodyweight'] = equipment.rows_matching(lambda eq: 'bodyweight' in eq)
+    features['Is_Bodyweight_Strength'] = equipment.rows_matching(lambda eq: eq == 'bodyweightonly') | (
+        equipment.rows_matching(lambda eq: eq == 'bodyweight') & (equipment.row_lengths() == 1)
+    )
+    
+    # Location compatibility
+    features['Home_Compatible'] = ~equipment.rows_matching(lambda eq: eq.replace(" ", "") in HOME_FORBIDDEN_EQUIPMENT)
+    features['Gym_Compatible'] = ~df['Available Equipment'].fillna('').str.lower().str.contains('outdoor only', na=False)
+    features['Outdoor_Compatible'] = ~equipment.rows_matching(lambda eq: eq.replace(" ", "").replace("/", "").strip() not in OUTDOOR_ALLOWED_EQUIPMENT)
+    
+    # Goals: substring match against each listed goal (same rule as the filter)
+    for key in sorted({goal_key(g) for g in GOAL_OPTIONS} | set(COMPATIBLE_GOALS)):
+        features[GOAL_FEATURE_PREFIX + key] = goals.rows_matching(lambda g, k=key: k in g)
+    
+    # Level filters: strength categories and assisted variations
+    features['Is_Strength_Category'] = df['Category'].str.contains('Body|Strength|Resistance', case=False, na=False)
+    features['Is_Assisted'] = df['Exercise Name'].str.lower().str.contains(r'assisted|seated|wall', na=False)
+    
+    # RPE bucket: highest number in the RPE string (NaN when there is none)
+    features['RPE_Max'] = df['RPE'].apply(
+        lambda x: max((int(n) for n in re.findall(r'\d+', str(x))), default=np.nan) if pd.notna(x) else np.nan
+    ).astype(float)
+    
+    return pd.concat([df, pd.DataFrame(features, index=df.index)], axis=1)
+
+@st.cache_resource
+def load_contraindication_index() -> ContraindicationIndex:
+    """
+    Inverted index over the Contraindications text (term -> exercises), keyed by Exercise_Id.
+    Built once per process and shared by every session.
+    """
+    store = load_exercise_store()
+    return ContraindicationIndex({exercise_id: split_phrases(record.contraindications) for exercise_id, record in enumerate(store.text)})
 
 def calculate_bmi(weight_kg: float, height_cm: float) -> Optional[float]:
     """Calculates BMI from weight (kg) and height (cm)."""
@@ -152,12 +295,21 @@ def get_training_split(days_count: int, fitness_level: str) -> List[str]:
         return ["Split A", "Split B", "Active Recovery", "Split A", "Split B", "Split A", "Split B"]
     return ["Full-Body A"] * days_count 
 
+def _feature_column(df: pd.DataFrame, prefix: str, key: str, compute) -> np.ndarray:
+    """Precomputed feature column if the key is known, otherwise computed on the fly (e.g. a custom goal)."""
+    column = prefix + key
+    if column in df.columns:
+        return df[column].to_numpy(dtype=bool)
+    return np.asarray(compute(), dtype=bool)
+
 def filter_and_select_exercises(df: pd.DataFrame, profile: Dict[str, Any]) -> pd.DataFrame:
     """
     Filters the exercise dataframe based on ALL user profile and goal/level logic.
+    Every rule is a boolean mask over the precomputed feature matrix; the rows are materialized once at the end.
+    Each stage's mask is cached (STAGE_MASKS) on the profile fields it reads plus the keys of the stages
+    it depends on, so changing one form field only recomputes the stages downstream of it.
     """
     
-    filtered_df = df.copy()
     session_counts = get_session_counts(profile['session_duration'])
     target_main_count = session_counts['main_count']
     
@@ -165,114 +317,121 @@ def filter_and_select_exercises(df: pd.DataFrame, profile: Dict[str, Any]) -> pd
     medical_conditions = [c.lower() for c in profile.get('medical_conditions', []) if c != "None"]
     physical_limitations = profile.get('physical_limitations', '').lower()
     
-    if (medical_conditions or physical_limitations) and 'Contraindications' in filtered_df.columns:
+    exclusion_keywords = []
+    if (medical_conditions or physical_limitations) and EXERCISE_ID_COLUMN in df.columns:
         exclusion_keywords = medical_conditions
         exclusion_keywords.extend([word.strip() for word in re.split(r'[^\w\s]', physical_limitations) if len(word) > 2])
-        if exclusion_keywords:
-            exclusion_pattern = '|'.join(re.escape(k) for k in exclusion_keywords)
-            filtered_df = filtered_df[
-                ~filtered_df['Contraindications'].fillna('').str.lower().str.contains(exclusion_pattern, na=False)
-            ]
-            st.info(f"Filtered out exercises contraindicated by: **{', '.join(exclusion_keywords[:3])}...**")
+    
+    # Union of the exercises indexed under each keyword (synonyms and qualifiers normalized)
+    safety_key = tuple(exclusion_keywords)
+    safety_mask = STAGE_MASKS.get(df, 'safety', safety_key,
+                                  lambda: ~df[EXERCISE_ID_COLUMN].isin(list(load_contraindication_index().excluded_ids(exclusion_keywords))).to_numpy())
+    if exclusion_keywords:
+        st.info(f"Filtered out exercises contraindicated by: **{', '.join(exclusion_keywords[:3])}...**")
     
     # 2. Level & Complexity Filter 
     user_level_str = profile['fitness_level']
     user_max_complexity = FITNESS_LEVELS[user_level_str]['max_complexity']
-    filtered_df = filtered_df[filtered_df['Complexity_Level'] <= user_max_complexity]
     
-    # 2b. Exclude overly assisted movements for Level 3 and above
-    if user_max_complexity >= 3:
-        assisted_keywords = r'assisted|seated|wall' 
-        is_strength_category = filtered_df['Category'].str.contains('Body|Strength|Resistance', case=False, na=False)
-        is_assisted = filtered_df['Exercise Name'].str.lower().str.contains(assisted_keywords, na=False)
-        filtered_df = filtered_df[~(is_strength_category & is_assisted)].copy()
+    def level_stage() -> np.ndarray:
+        level_mask = df['Complexity_Level'].to_numpy() <= user_max_complexity
+        # 2b. Exclude overly assisted movements for Level 3 and above
+        if user_max_complexity >= 3:
+            level_mask &= ~(df['Is_Strength_Category'].to_numpy(dtype=bool) & df['Is_Assisted'].to_numpy(dtype=bool))
+        return level_mask
+    
+    level_key = (user_level_str,)
+    level_mask = STAGE_MASKS.get(df, 'level', level_key, level_stage)
         
     # 3. Equipment Filter (Rule 6)
     available_equipment = [e.lower().replace(" ", "") for e in profile.get('available_equipment', ["Bodyweight Only"])]
     
-    def has_required_equipment(exercise_eq_list):
-        if 'bodyweightonly' in available_equipment and any('bodyweight' in eq for eq in exercise_eq_list):
-            return True
-        for required_eq in exercise_eq_list:
-            if required_eq.replace(" ", "") in available_equipment:
-                return True
-        return False
+    def equipment_stage() -> np.ndarray:
+        has_equipment = np.zeros(len(df), dtype=bool)
+        if 'bodyweightonly' in available_equipment:
+            has_equipment |= df['Has_Bodyweight'].to_numpy(dtype=bool)
+        for token in available_equipment:
+            column = EQUIPMENT_FEATURE_PREFIX + token
+            if column in df.columns:
+                has_equipment |= df[column].to_numpy(dtype=bool)
+        return has_equipment
     
-    filtered_df = filtered_df[filtered_df['Equipment_List'].apply(has_required_equipment)]
+    equipment_key = tuple(sorted(set(available_equipment)))
+    equipment_mask = STAGE_MASKS.get(df, 'equipment', equipment_key, equipment_stage)
 
     # 4. Location Filter (Rule 5)
     location = profile.get('workout_location')
-    if location == "Home":
-        gym_only_forbidden = ['machines', 'barbells', 'cables', 'pull-upbar', 'barbell', 'cable'] 
-        def is_home_compatible(exercise_eq_list):
-            return not any(eq.replace(" ", "") in gym_only_forbidden for eq in exercise_eq_list)
-        filtered_df = filtered_df[filtered_df['Equipment_List'].apply(is_home_compatible)]
-    elif location == "Gym":
-        filtered_df = filtered_df[~filtered_df['Available Equipment'].fillna('').str.lower().str.contains('outdoor only', na=False)]
-    elif location == "Outdoor":
-        outdoor_allowed_eq = ['bodyweight', 'outdooronly', 'mat', 'wall', 'bench']
-        def is_outdoor_compatible(exercise_eq_list):
-            return all(eq.replace(" ", "").replace("/", "").strip() in outdoor_allowed_eq for eq in exercise_eq_list)
-        filtered_df = filtered_df[filtered_df['Equipment_List'].apply(is_outdoor_compatible)]
+    
+    def location_stage() -> np.ndarray:
+        if location == "Home":
+            return df['Home_Compatible'].to_numpy(dtype=bool)
+        elif location == "Gym":
+            return df['Gym_Compatible'].to_numpy(dtype=bool)
+        elif location == "Outdoor":
+            return df['Outdoor_Compatible'].to_numpy(dtype=bool)
+        return np.ones(len(df), dtype=bool)
+    
+    location_key = (location,)
+    location_mask = STAGE_MASKS.get(df, 'location', location_key, location_stage)
+    
+    # Stages 1-4 are independent row predicates; everything below depends on their combined pool
+    pool_key = (safety_key, level_key, equipment_key, location_key)
     
     
     # 5. Goal Alignment Filter (Conditional Relaxation for generation volume)
-    goal_lower = profile['primary_goal'].lower().split('(')[0].strip()
+    goal_lower = goal_key(profile['primary_goal'])
     
-    # Filter 1: Strict Goal Match
-    strict_goal_df = filtered_df[filtered_df['Goals_List'].apply(lambda x: any(goal_lower in g for g in x))].copy()
+    def goal_mask(key: str) -> np.ndarray:
+        return _feature_column(df, GOAL_FEATURE_PREFIX, key, lambda: load_exercise_store().vocabulary_mask('goals', lambda g: key in g, df))
     
-    # If strict goal matching is insufficient, relax the goal criteria.
-    if len(strict_goal_df) < target_main_count:
-        compatible_goals = [goal_lower, 'strength gain', 'general fitness', 'posture & balance improvement', 'cardiovascular fitness']
-        relaxed_goal_df = filtered_df[filtered_df['Goals_List'].apply(
-            lambda x: any(comp_goal in g for g in x for comp_goal in compatible_goals)
-        )].copy()
+    def goal_stage() -> np.ndarray:
+        mask = safety_mask & level_mask & equipment_mask & location_mask
+        
+        # Filter 1: Strict Goal Match
+        strict_goal_mask = mask & goal_mask(goal_lower)
         
-        filtered_df = relaxed_goal_df if len(relaxed_goal_df) >= target_main_count else (strict_goal_df if not strict_goal_df.empty else filtered_df)
-    else:
-        filtered_df = strict_goal_df
+        # If strict goal matching is insufficient, relax the goal criteria.
+        if strict_goal_mask.sum() < target_main_count:
+            relaxed_goal_mask = np.zeros(len(df), dtype=bool)
+            for comp_goal in [goal_lower] + COMPATIBLE_GOALS:
+                relaxed_goal_mask |= goal_mask(comp_goal)
+            relaxed_goal_mask &= mask
+            
+            return relaxed_goal_mask if relaxed_goal_mask.sum() >= target_main_count else (strict_goal_mask if strict_goal_mask.any() else mask)
+        return strict_goal_mask
+    
+    goal_stage_key = pool_key + (goal_lower, target_main_count)
+    mask = STAGE_MASKS.get(df, 'goal', goal_stage_key, goal_stage)
 
     # 6. CRITICAL HYPERTROPHY FILTERING (Addressing RPE and Equipment conflict)
     if profile['primary_goal'] in ["Muscle Gain (Hypertrophy)", "Strength Gain"]:
         
-        # Function to check if the max RPE is at least 5 (Lowering threshold to RPE 5+ to prevent pool exhaustion)
-        def meets_stimulus_rpe(rpe_str):
-            if pd.isna(rpe_str): return False
-            try:
-                # FIX: Check for RPE 5+ instead of 7+ to keep more exercises in the running pool.
-                numbers = [int(n) for n in re.findall(r'\d+', str(rpe_str))]
-                return max(numbers) >= 5
-            except:
-                return False
-        
-        # Drop any exercise that cannot achieve RPE 5+ (eliminates dedicated mobility/stretches from the main pool)
-        filtered_df = filtered_df[filtered_df['RPE'].apply(meets_stimulus_rpe)].copy()
-        
         # Equipment Prioritization (Addressing the Bodyweight penalty leading to empty pool)
         has_loadable_equipment = any(eq in available_equipment for eq in ['dumbbells', 'kettlebells', 'barbell', 'cables'])
         
-        # FIX: Only apply the bodyweight penalty if we have a very large pool to start with (3x target)
-        # This prevents the filter from wiping out the entire pool when data is sparse.
-        if has_loadable_equipment and len(filtered_df) > target_main_count * 3:
-            
-            # Identify exercises that are bodyweight AND are suitable for resistance
-            is_bodyweight_strength = filtered_df['Equipment_List'].apply(
-                # If only 'bodyweight' is in the list AND it's a strength category
-                lambda x: 'bodyweightonly' in x or ('bodyweight' in x and len(x) == 1)
-            )
-            is_resistance_category = filtered_df['Resistance_Category'].isin(['Upper Body Push', 'Upper Body Pull', 'Lower Body'])
+        def hypertrophy_stage() -> np.ndarray:
+            # Drop any exercise that cannot achieve RPE 5+ (eliminates dedicated mobility/stretches from the main pool)
+            # FIX: Check for RPE 5+ instead of 7+ to keep more exercises in the running pool.
+            hypertrophy_mask = mask & (df['RPE_Max'].to_numpy() >= 5)
             
-            # Drop pure bodyweight resistance movements to force selection of weighted movements
-            temp_df = filtered_df[~(is_bodyweight_strength & is_resistance_category)].copy()
+            # FIX: Only apply the bodyweight penalty if we have a very large pool to start with (3x target)
+            # This prevents the filter from wiping out the entire pool when data is sparse.
+            if has_loadable_equipment and hypertrophy_mask.sum() > target_main_count * 3:
+                
+                # Drop pure bodyweight resistance movements to force selection of weighted movements
+                is_resistance_category = df['Resistance_Category'].isin(['Upper Body Push', 'Upper Body Pull', 'Lower Body']).to_numpy()
+                temp_mask = hypertrophy_mask & ~(df['Is_Bodyweight_Strength'].to_numpy(dtype=bool) & is_resistance_category)
 
-            # Ensure the pool isn't wiped out before assigning it back
-            if len(temp_df) >= target_main_count:
-                filtered_df = temp_df
-            # ELSE: If filtering bodyweight would leave us with too few weighted exercises, keep the bodyweight exercises as a necessary fallback.
+                # Ensure the pool isn't wiped out before assigning it back
+                if temp_mask.sum() >= target_main_count:
+                    return temp_mask
+                # ELSE: If filtering bodyweight would leave us with too few weighted exercises, keep the bodyweight exercises as a necessary fallback.
+            return hypertrophy_mask
         
+        mask = STAGE_MASKS.get(df, 'hypertrophy', goal_stage_key + (has_loadable_equipment,), hypertrophy_stage)
         
-    return filtered_df
+        
+    return df[mask].copy()
 
 # ============ AI FALLBACK IMPLEMENTATION ============
 
@@ -365,22 +524,87 @@ def generate_ai_exercise(profile: Dict[str, Any], res_cat: str) -> Optional[Dict
             st.error("AI Fallback failed after multiple attempts. Proceeding without substitution.")
             return None
 
-def generate_workout_plan(df_master: pd.DataFrame, profile: Dict[str, Any]) -> Dict[str, pd.DataFrame]:
+# ============ PLAN SELECTION STATE ============
+
+class ConceptVarietySelector:
+    """
+    A/B split variety state for ONE plan generation: the concept groups (e.g. 'reverse' for
+    'Reverse Lunge') already used by Full-Body A and Full-Body B days. Create one per request;
+    nothing here is shared between sessions.
+    """
+
+    def __init__(self):
+        self.used_concept_groups_A = set()
+        self.used_concept_groups_B = set()
+
+    def concepts_for(self, rule: str) -> Tuple[set, set]:
+        """(concept groups to avoid, set that tracks today's picks) for a split rule."""
+        if rule == "Full-Body A":
+            return self.used_concept_groups_B, self.used_concept_groups_A
+        elif rule == "Full-Body B":
+            return self.used_concept_groups_A, self.used_concept_groups_B
+        return self.used_concept_groups_A.union(self.used_concept_groups_B), self.used_concept_groups_A
+
+    def record(self, rule: str, concept_groups: List[str]):
+        """Marks the main-workout concept groups of a finished A or B day as used."""
+        if rule == "Full-Body A":
+            self.used_concept_groups_A.update(concept_groups)
+        elif rule == "Full-Body B":
+            self.used_concept_groups_B.update(concept_groups)
+
+NO_ROWS = np.empty(0, dtype=np.intp)
+
+def plan_seed(profile: Dict[str, Any]) -> int:
+    """Stable 64-bit seed from the plan-shaping profile fields (identical in every process, unlike hash())."""
+    fields = {field: profile.get(field) for field in PLAN_SEED_FIELDS}
+    for field in ('medical_conditions', 'available_equipment'): # Selection order does not change the plan
+        if isinstance(fields[field], list):
+            fields[field] = sorted(fields[field])
+    digest = hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+def plan_rng(profile: Dict[str, Any]) -> np.random.Generator:
+    """The plan-level random stream: same profile -> same plan, across workers and restarts."""
+    return np.random.default_rng(plan_seed(profile))
+
+def _sample_rows(pool: np.ndarray, n: int, rng: np.random.Generator) -> np.ndarray:
+    """Draws min(n, len(pool)) pool rows without replacement (in draw order), without materializing them."""
+    n = min(n, len(pool))
+    return pool[rng.choice(len(pool), size=n, replace=False)]
+
+def _member_mask(values: np.ndarray, members) -> np.ndarray:
+    """Boolean mask of values contained in members (Series.isin over a plain array)."""
+    members = set(members)
+    return np.fromiter((value in members for value in values), dtype=bool, count=len(values))
+
+def _first_by_name(rows: np.ndarray, names: np.ndarray) -> np.ndarray:
+    """Keeps the first row per exercise name, in order (drop_duplicates(subset=['Exercise Name']))."""
+    seen, kept = set(), []
+    for row in rows:
+        if names[row] not in seen:
+            seen.add(names[row])
+            kept.append(row)
+    return np.asarray(kept, dtype=np.intp)
+
+def generate_workout_plan(df_master: pd.DataFrame, profile: Dict[str, Any], selector: Optional[ConceptVarietySelector] = None,
+                          rng: Optional[np.random.Generator] = None) -> Dict[str, pd.DataFrame]:
     """
     Generates the full weekly plan with day-wise exercises and structure.
     Implements Tier 4 (AI Fallback) when the resistance pool is empty.
+    All variety state lives in `selector` (a fresh one per call by default) and df_master is only
+    read, so concurrent calls from different sessions/threads do not interfere. Every random pick
+    comes from `rng` (default: plan_rng(profile)), so the same profile always yields the same plan.
     """
     
-    global used_concept_groups_A
-    global used_concept_groups_B
-
-    # Reset globals for a new plan generation
-    used_concept_groups_A = set() 
-    used_concept_groups_B = set()
+    # Fresh A/B variety tracking and the plan's random stream for a new plan generation
+    selector = selector or ConceptVarietySelector()
+    if rng is None:
+        rng = plan_rng(profile)
     
     # --- STEP 1: Filter Master Data and Segregate Pools ---
     
-    df_all_filtered = filter_and_select_exercises(df_master, profile)
+    # Only the profile's pool goes back to plain string columns (the shared frame stays categorical)
+    df_all_filtered = decode_categoricals(filter_and_select_exercises(df_master, profile))
     
     if df_all_filtered.empty:
         # Check here only if the *entire* filtered pool is empty (Mobility + Resistance)
@@ -404,7 +628,7 @@ def generate_workout_plan(df_master: pd.DataFrame, profile: Dict[str, Any]) -> D
         for cat in missing_categories:
             ai_data = generate_ai_exercise(profile, cat)
             if ai_data:
-                ai_substitutions.append(pd.DataFrame([ai_data]))
+                ai_substitutions.append(parse_range_columns(pd.DataFrame([ai_data])))
                 st.success(f"✅ AI successfully generated **{ai_data['Exercise Name']}** for {cat}.")
                 break 
         
@@ -456,139 +680,170 @@ def generate_workout_plan(df_master: pd.DataFrame, profile: Dict[str, Any]) -> D
         else: workout_targets[rule] = base_targets
     
     
-    # --- STEP 3: Generate Daily Plans ---
+    # --- STEP 3: Selection Index (built once; days pick integer row positions instead of copying pools) ---
+    
+    exercise_store = load_exercise_store()
+    main_pool = df_resistance
+    # CRITICAL HYPERTROPHY PARAMETER ENFORCEMENT (Final output display fix)
+    if profile['primary_goal'] in ["Muscle Gain (Hypertrophy)", "Strength Gain"]:
+        # Ensure every exercise selected has hypertrophy parameters (at least 3 sets, 8-15 reps, RPE 7-9)
+        main_pool['Sets'] = np.maximum(3, pd.to_numeric(main_pool['Sets'], errors='coerce').fillna(3)).astype(int)
+        main_pool['Reps_Low'] = np.maximum(8, main_pool['Reps_Low'])
+        main_pool['Reps_High'] = np.minimum(15, main_pool['Reps_High'])
+        main_pool['RPE_Low'] = np.maximum(7, main_pool['RPE_Low'])
+        main_pool['RPE_High'] = np.minimum(9, main_pool['RPE_High'])
+    
+    # One catalog (mobility rows first, then resistance rows): every daily plan is a single take() from it
+    plan_catalog = pd.concat([df_mobility, main_pool], ignore_index=True)
+    resistance_offset = len(df_mobility)
+    
+    mobility_rows = np.arange(len(df_mobility))
+    mobility_concepts = df_mobility['Concept_Group'].to_numpy()
+    resistance_names = main_pool['Exercise Name'].to_numpy()
+    resistance_concepts = main_pool['Concept_Group'].to_numpy()
+    resistance_categories = main_pool['Resistance_Category'].to_numpy()
+    category_rows = {res_cat: np.flatnonzero(resistance_categories == res_cat) for res_cat in RESISTANCE_CATS}
+    
+    # FIX: Strictly exclude mobility exercises by name if they somehow slipped into the resistance pool
+    is_mobility_name = main_pool['Exercise Name'].isin(df_mobility['Exercise Name'].unique()).to_numpy()
+    
+    
+    # --- STEP 4: Generate Daily Plans ---
     
     for day_index, (day, rule) in enumerate(zip(training_days, split_rules)):
         
         current_targets = workout_targets.get(rule, {})
         
         # --- Variety Setup (Crucial for A-B Split) ---
-        if rule == "Full-Body A":
-            filter_concepts = used_concept_groups_B 
-            track_concepts = used_concept_groups_A 
-        elif rule == "Full-Body B":
-            filter_concepts = used_concept_groups_A 
-            track_concepts = used_concept_groups_B 
-        else:
-            filter_concepts = used_concept_groups_A.union(used_concept_groups_B) 
-            track_concepts = used_concept_groups_A
+        filter_concepts, track_concepts = selector.concepts_for(rule)
             
         # 1. Warm-up (Select from strictly mobility pool)
-        warmup_pool = df_mobility[~df_mobility['Concept_Group'].isin(filter_concepts)].copy()
-        if warmup_pool.empty: warmup_pool = df_mobility.copy() 
-
-        warmup_selection = warmup_pool.sample(min(target_warmup_count, len(warmup_pool)), replace=False, random_state=abs(42 + day_index) % (2**32 - 1))
-        warmup_selection = warmup_selection.assign(Part='Warm-Up', Order=range(1, len(warmup_selection) + 1))
-        warmup_selection['Sets'] = warmup_selection['Sets'].fillna(1)
-        warmup_selection['RPE'] = warmup_selection['RPE'].apply(lambda x: re.sub(r'(\d+)-(\d+)', lambda m: f"{min(1, int(m.group(1)))}-{min(4, int(m.group(2)))}", str(x)))
+        warmup_pool = mobility_rows[~_member_mask(mobility_concepts, filter_concepts)]
+        if len(warmup_pool) == 0: warmup_pool = mobility_rows
+        warmup_rows = _sample_rows(warmup_pool, target_warmup_count, rng)
 
 
         # 2. Main Workout (Strict Balanced Selection from Resistance pool)
-        if rule == "Active Recovery":
-            main_selection = pd.DataFrame()
-        else:
-            # Use the dedicated resistance pool here
-            main_pool = df_resistance.copy() 
-            
-            # CRITICAL HYPERTROPHY PARAMETER ENFORCEMENT (Final output display fix)
-            if profile['primary_goal'] in ["Muscle Gain (Hypertrophy)", "Strength Gain"]:
-                # Ensure every exercise selected has hypertrophy parameters
-                main_pool['Sets'] = main_pool['Sets'].apply(lambda x: max(3, int(x)) if pd.notna(x) else 3)
-                main_pool['Reps'] = main_pool['Reps'].apply(lambda x: re.sub(r'(\d+)-(\d+)', lambda m: f"{max(8, int(m.group(1)))}-{min(15, int(m.group(2)))}", str(x)))
-                main_pool['RPE'] = main_pool['RPE'].apply(lambda x: re.sub(r'(\d+)-(\d+)', lambda m: f"{max(7, int(m.group(1)))}-{min(9, int(m.group(2)))}", str(x)))
-
-
-            main_selection_list = []
+        main_rows = NO_ROWS
+        if rule != "Active Recovery":
+            selected_rows = []
             current_day_names = set() 
             
             # --- Tier 1 Selection (Mandatory Resistance Guarantee) ---
             for res_cat, count in current_targets.items():
                 if count == 0: continue
                 
-                cat_pool = main_pool[main_pool['Resistance_Category'] == res_cat].copy()
-                
-                # FIX: Strictly exclude mobility exercises by name if they somehow slipped into the resistance pool
-                mobility_names = df_mobility['Exercise Name'].unique()
-                cat_pool = cat_pool[~cat_pool['Exercise Name'].isin(mobility_names)]
-
-                cat_pool = cat_pool[~cat_pool['Concept_Group'].isin(filter_concepts)]
-                cat_pool = cat_pool[~cat_pool['Exercise Name'].isin(current_day_names)]
+                cat_rows = category_rows.get(res_cat, NO_ROWS)
+                name_available = ~_member_mask(resistance_names[cat_rows], current_day_names)
+                cat_pool = cat_rows[name_available & ~is_mobility_name[cat_rows] & ~_member_mask(resistance_concepts[cat_rows], filter_concepts)]
                 selection_n = min(count, len(cat_pool))
                 
                 # CRITICAL: If Tier 1 fails to find the required count, we must accept what we can get for balance
                 # BUT WE CANNOT PROCEED IF COUNT IS 0 AND IT IS A PUSH/PULL/LOWER CATEGORY
                 if selection_n > 0:
-                    seed_val = abs(day_index + hash(res_cat)) % (2**32 - 1)
-                    selected = cat_pool.sample(selection_n, replace=False, random_state=seed_val)
-                    current_day_names.update(selected['Exercise Name'].tolist())
-                    main_selection_list.append(selected)
+                    selected = _sample_rows(cat_pool, selection_n, rng)
                 elif count > 0 and res_cat in ['Upper Body Push', 'Upper Body Pull', 'Lower Body']:
                     # Tier 2 Fallback for balance: relax concept filter but keep name uniqueness
-                    cat_pool_relaxed = main_pool[main_pool['Resistance_Category'] == res_cat].copy()
-                    cat_pool_relaxed = cat_pool_relaxed[~cat_pool_relaxed['Exercise Name'].isin(current_day_names)]
-                    
-                    if not cat_pool_relaxed.empty:
-                        selection_n_fallback = min(count, len(cat_pool_relaxed))
-                        seed_val = abs(day_index + hash(res_cat) + 50) % (2**32 - 1)
-                        selected = cat_pool_relaxed.sample(selection_n_fallback, replace=False, random_state=seed_val)
-                        current_day_names.update(selected['Exercise Name'].tolist())
-                        main_selection_list.append(selected)
+                    cat_pool_relaxed = cat_rows[name_available]
+                    if len(cat_pool_relaxed) == 0: continue
+                    selected = _sample_rows(cat_pool_relaxed, count, rng)
+                else:
+                    continue
+                current_day_names.update(resistance_names[selected].tolist())
+                selected_rows.append(selected)
 
 
-            if main_selection_list:
-                main_selection = pd.concat(main_selection_list).drop_duplicates(subset=['Exercise Name'])
-                track_concepts.update(main_selection['Concept_Group'].tolist())
+            if selected_rows:
+                main_rows = _first_by_name(np.concatenate(selected_rows), resistance_names)
+                track_concepts.update(resistance_concepts[main_rows].tolist())
                 
                 # --- Tier 3: Final Volume Fill ---
-                while len(main_selection) < target_main_count:
-                    fill_needed = target_main_count - len(main_selection)
-                    reusable_pool = main_pool[~main_pool['Exercise Name'].isin(main_selection['Exercise Name'])] 
+                while len(main_rows) < target_main_count:
+                    fill_needed = target_main_count - len(main_rows)
+                    reusable_pool = np.flatnonzero(~_member_mask(resistance_names, resistance_names[main_rows]))
                     
-                    if reusable_pool.empty: break
+                    if len(reusable_pool) == 0: break
                         
-                    reused_selection = reusable_pool.sample(min(fill_needed, len(reusable_pool)), replace=False, random_state=abs(day_index + len(main_selection) + 700) % (2**32 - 1))
-                    main_selection = pd.concat([main_selection, reused_selection]).drop_duplicates(subset=['Exercise Name'])
+                    reused_rows = _sample_rows(reusable_pool, fill_needed, rng)
+                    main_rows = _first_by_name(np.concatenate([main_rows, reused_rows]), resistance_names)
 
                 # Finalize selection and shuffle
-                main_selection = main_selection.head(target_main_count) 
-                final_shuffle_seed = abs(day_index + 100) % (2**32 - 1)
-                main_selection = main_selection.sample(frac=1, random_state=final_shuffle_seed) 
-                main_selection = main_selection.assign(Part='Main Workout', Order=range(1, len(main_selection) + 1))
-            else:
-                main_selection = pd.DataFrame() 
+                main_rows = main_rows[:target_main_count]
+                main_rows = rng.permutation(main_rows)
                 
         # 3. Cool-Down (Select from strictly mobility pool)
-        cooldown_pool = df_mobility[~df_mobility['Concept_Group'].isin(track_concepts)].copy()
-        if cooldown_pool.empty: cooldown_pool = df_mobility.copy() 
+        cooldown_pool = mobility_rows[~_member_mask(mobility_concepts, track_concepts)]
+        if len(cooldown_pool) == 0: cooldown_pool = mobility_rows
 
-        cooldown_selection = cooldown_pool.sample(min(target_cooldown_count, len(cooldown_pool)), replace=False, random_state=abs(42 + day_index * 2) % (2**32 - 1))
-        cooldown_selection = cooldown_selection.assign(Part='Cool-Down', Order=range(1, len(cooldown_selection) + 1))
+        cooldown_rows = _sample_rows(cooldown_pool, target_cooldown_count, rng)
+        
+        # Combine: the only DataFrame materialized for the day (mobility-only days keep the mobility pool's dtypes)
+        if len(main_rows):
+            daily_plan = plan_catalog.take(np.concatenate([warmup_rows, main_rows + resistance_offset, cooldown_rows]))
+        else:
+            daily_plan = df_mobility.take(np.concatenate([warmup_rows, cooldown_rows]))
+        # Text (steps, cues, benefits) is looked up from the side table only for the day's rows
+        part_sizes = {'Warm-Up': len(warmup_rows), 'Main Workout': len(main_rows), 'Cool-Down': len(cooldown_rows)}
+        daily_plan = exercise_store.render(
+            daily_plan.reset_index(drop=True),
+            Part=[part for part, size in part_sizes.items() for _ in range(size)],
+            Order=[order for size in part_sizes.values() for order in range(1, size + 1)]
+        )
+        
+        warmup_index = daily_plan.index[:len(warmup_rows)]
+        cooldown_index = daily_plan.index[len(daily_plan) - len(cooldown_rows):]
+        if daily_plan['Sets'].isna().any():
+            for part_index in (warmup_index, cooldown_index):
+                daily_plan.loc[part_index, 'Sets'] = daily_plan.loc[part_index, 'Sets'].fillna(1)
         
-        cooldown_selection['Sets'] = cooldown_selection['Sets'].fillna(1)
-        cooldown_selection['RPE'] = cooldown_selection['RPE'].apply(lambda x: re.sub(r'(\d+)-(\d+)', lambda m: f"{min(1, int(m.group(1)))}-{min(3, int(m.group(2)))}", str(x)))
+        # RPE bounds as arrays (NaN where the text has no range; NaN stays NaN through every clip)
+        rpe_low = daily_plan['RPE_Low'].to_numpy(dtype=float, copy=True)
+        rpe_high = daily_plan['RPE_High'].to_numpy(dtype=float, copy=True)
         
-        # Combine
-        daily_plan = pd.concat([warmup_selection, main_selection, cooldown_selection]).reset_index(drop=True)
+        # Mobility parts stay light: warm-up capped at 1-4, cool-down at 1-3
+        warmup_slice, cooldown_slice = slice(0, len(warmup_rows)), slice(len(daily_plan) - len(cooldown_rows), len(daily_plan))
+        rpe_low[warmup_slice], rpe_high[warmup_slice] = np.minimum(1, rpe_low[warmup_slice]), np.minimum(4, rpe_high[warmup_slice])
+        rpe_low[cooldown_slice], rpe_high[cooldown_slice] = np.minimum(1, rpe_low[cooldown_slice]), np.minimum(3, rpe_high[cooldown_slice])
         
         # Demographic Adjustments (ACSM guideline implementation)
         if profile['age'] >= 60 or (profile['bmi'] is not None and profile['bmi'] >= 30):
-            daily_plan['RPE'] = daily_plan['RPE'].apply(lambda x: re.sub(r'(\d+)-(\d+)', lambda m: f"{max(1, int(m.group(1))-1)}-{max(2, int(m.group(2))-1)}", x))
-            daily_plan['Safety Cue'] = daily_plan['Safety Cue'].fillna('').apply(lambda x: f"{x} (Prioritize stability and balance.)" if "(Prioritize stability and balance.)" not in x else x)
+            rpe_low, rpe_high = np.maximum(1, rpe_low - 1), np.maximum(2, rpe_high - 1)
+            safety_cue = daily_plan['Safety Cue'].fillna('')
+            has_cue = safety_cue.str.contains("(Prioritize stability and balance.)", regex=False)
+            daily_plan['Safety Cue'] = safety_cue.where(has_cue, safety_cue + " (Prioritize stability and balance.)")
         
         if profile['gender'] == 'Female':
-            daily_plan['RPE'] = daily_plan['RPE'].apply(lambda x: re.sub(r'(\d+)-(\d+)', lambda m: f"{m.group(1)}-{max(2, int(m.group(2))-1)}", x))
+            rpe_high = np.maximum(2, rpe_high - 1)
+        
+        daily_plan['RPE_Low'], daily_plan['RPE_High'] = rpe_low, rpe_high
+        
+        # Render the adjusted RPE/Reps text once for the finished day, then keep only the display columns
+        daily_plan = drop_internal_columns(format_range_columns(daily_plan))
 
         workout_plan[day] = daily_plan
         
-        # FIX: Only attempt to update concept groups if main_selection is NOT empty
-        if not main_selection.empty:
-            if rule == "Full-Body A":
-                used_concept_groups_A.update(main_selection['Concept_Group'].tolist())
-            elif rule == "Full-Body B":
-                used_concept_groups_B.update(main_selection['Concept_Group'].tolist())
+        # FIX: Only attempt to update concept groups if the main selection is NOT empty
+        if len(main_rows):
+            selector.record(rule, resistance_concepts[main_rows].tolist())
         
     return workout_plan
 
+def generate_workout_plans_concurrently(df_master: pd.DataFrame, profiles: List[Dict[str, Any]], max_workers: int = MAX_PARALLEL_PLANS) -> List[Dict[str, pd.DataFrame]]:
+    """
+    Generates one plan per profile on a thread pool (batch jobs, or one process serving several
+    sessions). Each plan gets its own ConceptVarietySelector, so the results are identical to
+    calling generate_workout_plan() for each profile in turn. Returned in the order of `profiles`.
+    """
+    # Worker threads inherit the script context so the st.info/st.warning calls inside generation stay attached
+    script_ctx = get_script_run_ctx()
+    def attach_script_ctx():
+        if script_ctx is not None:
+            add_script_run_ctx(threading.current_thread(), script_ctx)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(profiles))), initializer=attach_script_ctx) as executor:
+        futures = [executor.submit(generate_workout_plan, df_master, dict(profile), ConceptVarietySelector()) for profile in profiles]
+        return [future.result() for future in futures]
+
 # ============ DISPLAY FUNCTIONS (Strict Custom Format) ============
 
 def display_exercise_plan(workout_plan: Dict[str, pd.DataFrame], profile: Dict[str, Any]):
@@ -0,0 +1,80 @@
+"""
+Plan-Level Calorie Engine
+Flattens a day plan (warm-up, main workout, cool-down) into column arrays and computes
+planned and logged calorie burn for every exercise in one vectorized pass.
+Formula: Calories = (MET * Weight_KG * 3.5) / 200 * (Duration in minutes)
+"""
+
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+# (exercise id prefix, plan_json key) in display order
+PLAN_SECTIONS = (('warmup', 'warmup'), ('main', 'main_workout'), ('cooldown', 'cooldown'))
+
+SECONDS_PER_REP = 5.0 # 3-1-1 tempo estimate used for rep-based work
+
+
+def iter_plan_exercises(plan_json: Dict) -> Iterator[Tuple[str, str, int, Dict]]:
+    """Yields (exercise_id, section_key, 1-based index, exercise) with ids like 'main_1'."""
+    for section_key, plan_key in PLAN_SECTIONS:
+        for idx, exercise in enumerate(plan_json.get(plan_key, []) or []):
+            yield f"{section_key}_{idx + 1}", section_key, idx + 1, exercise
+
+
+class PlanCalorieTable:
+    """Column store of the calorie inputs for one day plan."""
+
+    def __init__(self, exercise_ids: List[str], met: List[float], planned_sets: List[float],
+                 planned_seconds_per_set: List[float], seconds_per_logged_unit: List[float],
+                 seconds_per_rate_unit: List[float]):
+        self.exercise_ids = exercise_ids
+        self.position = {ex_id: i for i, ex_id in enumerate(exercise_ids)}
+        self.met = np.asarray(met, dtype=np.float64)
+        self.planned_sets = np.asarray(planned_sets, dtype=np.float64)
+        self.planned_seconds_per_set = np.asarray(planned_seconds_per_set, dtype=np.float64)
+        self.seconds_per_logged_unit = np.asarray(seconds_per_logged_unit, dtype=np.float64)
+        self.seconds_per_rate_unit = np.asarray(seconds_per_rate_unit, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.exercise_ids)
+
+    def _kcal_per_minute(self, weight_kg: float) -> np.ndarray:
+        # Same operation order as the scalar formula, so rounded values match to the calorie
+        return (self.met * weight_kg * 3.5) / 200
+
+    def planned_calories(self, weight_kg: float) -> np.ndarray:
+        """Estimated burn across ALL planned sets, rounded per exercise (as shown in the plan)."""
+        if weight_kg <= 0:
+            return np.zeros(len(self), dtype=np.int64)
+        minutes = self.planned_sets * self.planned_seconds_per_set / 60.0
+        return np.round(self._kcal_per_minute(weight_kg) * minutes).astype(np.int64)
+
+    def logged_calories(self, logged_performance: Dict[str, Dict], weight_kg: float) -> np.ndarray:
+        """Burn from the logged sets and reps/seconds per set (0 for anything not logged)."""
+        actual_sets = np.array([logged_performance.get(ex_id, {}).get('actual_sets', 0) for ex_id in self.exercise_ids], dtype=np.float64)
+        actual_units = np.array([logged_performance.get(ex_id, {}).get('actual_reps', 0) for ex_id in self.exercise_ids], dtype=np.float64)
+        if weight_kg <= 0:
+            return np.zeros(len(self), dtype=np.float64)
+
+        logged = (actual_sets > 0) & (actual_units > 0)
+        minutes = np.where(logged, actual_sets * actual_units * self.seconds_per_logged_unit / 60.0, 0.0)
+        return np.maximum(0.0, self._kcal_per_minute(weight_kg) * minutes)
+
+    def calorie_rates(self, weight_kg: float) -> np.ndarray:
+        """Calories per logged unit (per second for time-based work, per rep otherwise)."""
+        return self._kcal_per_minute(weight_kg) * self.seconds_per_rate_unit / 60.0
+
+    def summary(self, weight_kg: float, logged_performance: Dict[str, Dict] = None) -> Dict:
+        """Per-exercise and per-day totals keyed by exercise id, ready for the renderer."""
+        planned = self.planned_calories(weight_kg)
+        logged = self.logged_calories(logged_performance or {}, weight_kg)
+        rates = self.calorie_rates(weight_kg)
+        return {
+            "met": dict(zip(self.exercise_ids, self.met.tolist())),
+            "planned": dict(zip(self.exercise_ids, planned.tolist())),
+            "logged": dict(zip(self.exercise_ids, logged.tolist())),
+            "rates": dict(zip(self.exercise_ids, rates.tolist())),
+            "planned_total": int(planned.sum()),
+            "logged_total": float(logged.sum())
+        }
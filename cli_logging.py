@@ -0,0 +1,25 @@
+"""
+Command-Line Script Logging
+Outside `streamlit run` every st.* call logs a "missing ScriptRunContext" warning, including the
+calls test26.py makes at import time. The batch, bench and check scripts call
+quiet_streamlit_context_warnings() before importing the app modules; the warnings are expected there.
+"""
+
+import logging
+
+SCRIPT_RUN_CONTEXT_LOGGERS = ("streamlit.runtime.scriptrunner_utils.script_run_context", "streamlit.runtime.scriptrunner.script_run_context")
+
+
+def _errors_only(record: logging.LogRecord) -> bool:
+    return record.levelno >= logging.ERROR
+
+
+def quiet_streamlit_context_warnings():
+    """
+    Drops everything below ERROR from the ScriptRunContext loggers for the rest of the process.
+    A filter rather than setLevel: streamlit resets its loggers' levels when it parses its config.
+    """
+    for logger_name in SCRIPT_RUN_CONTEXT_LOGGERS:
+        logger = logging.getLogger(logger_name)
+        if _errors_only not in logger.filters:
+            logger.addFilter(_errors_only)
@@ -0,0 +1,81 @@
+"""
+Shared Medical Condition Loader
+Column-wise loader for the medical-conditions Excel sheet used by the Streamlit apps,
+with a pickle sidecar keyed on the workbook's mtime and size so unchanged workbooks
+never go through openpyxl again.
+"""
+
+import os
+import pickle
+from typing import Dict
+
+import pandas as pd
+
+# Excel column -> key used in the condition records (and in the LLM prompt)
+CONDITION_COLUMNS = {
+    'Medication(s)': 'medications',
+    'Direct Exercise Impact': 'direct_impact',
+    'Indirect Exercise Impacts': 'indirect_impact',
+    'Contraindicated Exercises': 'contraindicated',
+    'Modified / Safer Exercises': 'modified_safer'
+}
+
+SIDECAR_SUFFIX = ".conditions.pkl"
+SIDECAR_VERSION = 1 # Bump when the record format changes
+
+
+def parse_condition_sheet(df: pd.DataFrame) -> Dict[str, Dict]:
+    """
+    Vectorized equivalent of the old iterrows() loop: skips blank/'None' conditions,
+    blanks out NaN cells, and keeps the last row for duplicated condition names.
+    """
+    if 'Condition' not in df.columns:
+        return {}
+
+    conditions = df['Condition']
+    keep = conditions.notna() & (conditions.astype(str).str.lower() != "none")
+
+    records = (
+        df.loc[keep]
+        .reindex(columns=['Condition'] + list(CONDITION_COLUMNS)) # Missing columns become NaN -> ""
+        .astype(object)
+        .fillna("")
+        .rename(columns=CONDITION_COLUMNS)
+        .drop_duplicates(subset='Condition', keep='last')
+        .set_index('Condition')
+    )
+    return records.to_dict('index')
+
+
+def _sidecar_path(excel_path: str) -> str:
+    return excel_path + SIDECAR_SUFFIX
+
+
+def load_condition_records(excel_path: str) -> Dict[str, Dict]:
+    """
+    Loads condition records from the workbook, serving them from the pickle sidecar when
+    the workbook's mtime and size match. Raises FileNotFoundError if the workbook is missing.
+    """
+    stat = os.stat(excel_path)
+    fingerprint = (SIDECAR_VERSION, stat.st_mtime_ns, stat.st_size)
+    sidecar_path = _sidecar_path(excel_path)
+
+    try:
+        with open(sidecar_path, 'rb') as f:
+            cached = pickle.load(f)
+        if cached.get('fingerprint') == fingerprint:
+            return cached['records']
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, KeyError, TypeError):
+        pass # Missing or stale sidecar: rebuild from the workbook
+
+    records = parse_condition_sheet(pd.read_excel(excel_path))
+
+    try:
+        tmp_path = sidecar_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'fingerprint': fingerprint, 'records': records}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, sidecar_path)
+    except OSError:
+        pass # Read-only deployments still work, they just parse the workbook each cold start
+
+    return records
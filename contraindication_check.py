@@ -0,0 +1,97 @@
+"""
+Contraindication Index Check
+Verifies that ContraindicationIndex never excludes less than the substring rules it replaced,
+over the exercise CSV (blend.py's index):
+  - blend.py:    keyword in the lowercased Contraindications cell
+  - new05-11.PY: phrase in condition, or condition in phrase (bidirectional=True)
+
+Keywords are the selectable MEDICAL_CONDITIONS plus free-text limitations: every word, word
+prefix (3+ letters) and 2-3 word run of the contraindication texts, the built-in samples below,
+and optionally one limitation per line from --limitations. Exits with status 1 on any miss.
+
+Usage:
+    python contraindication_check.py
+    python contraindication_check.py --limitations limitations.txt --verbose
+"""
+
+import argparse
+import re
+import sys
+from typing import Dict, Iterable, List, Set
+
+from cli_logging import quiet_streamlit_context_warnings
+quiet_streamlit_context_warnings() # Before the app imports below, which already call st.*
+
+import blend
+from contraindication_index import ContraindicationIndex, split_phrases
+
+SAMPLE_LIMITATIONS = [
+    "high blood pressure", "blood pressure", "deep vein thrombosis", "thrombosis", "tendon", "strain", "disc",
+    "bad left knee", "lower back pain", "low back", "shoulder impingement", "acid reflux", "pregnant", "hernia",
+    "wrist sensitivity", "recent knee surgery", "neck", "dizziness", "osteoporosis", "rotator cuff",
+]
+MIN_PREFIX = 3 # blend.py drops limitation keywords shorter than this
+
+
+def limitation_keywords(texts: Iterable[str]) -> Set[str]:
+    """Keywords the way blend.py cuts a limitation (split on punctuation), as words, prefixes and runs."""
+    keywords = set()
+    for text in texts:
+        for chunk in re.split(r'[^\w\s]', text.lower()):
+            words = chunk.split()
+            for start in range(len(words)):
+                word = words[start]
+                keywords.update(word[:end] for end in range(MIN_PREFIX, len(word) + 1))
+                for length in (2, 3):
+                    if start + length <= len(words):
+                        keywords.add(" ".join(words[start:start + length]))
+    return {keyword for keyword in keywords if len(keyword) >= MIN_PREFIX}
+
+
+def check(index: ContraindicationIndex, cells: List[str], keywords: Iterable[str], bidirectional: bool) -> Dict[str, Set[int]]:
+    """Keyword -> exercise ids the substring rule excluded but the index does not (empty when all is well)."""
+    lowered = [cell.lower() for cell in cells]
+    phrases = [[phrase.lower() for phrase in split_phrases(cell)] for cell in cells]
+    misses = {}
+    for keyword in keywords:
+        if bidirectional:
+            old = {i for i, cell_phrases in enumerate(phrases) if any(keyword in phrase or phrase in keyword for phrase in cell_phrases)}
+        else:
+            old = {i for i, cell in enumerate(lowered) if keyword in cell}
+        missing = old - index.excluded_ids([keyword], bidirectional=bidirectional)
+        if missing:
+            misses[keyword] = missing
+    return misses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the contraindication index excludes everything the substring rules did.")
+    parser.add_argument("--limitations", help="Extra free-text limitations, one per line")
+    parser.add_argument("--verbose", action="store_true", help="List every missed keyword")
+    args = parser.parse_args()
+
+    cells = [record.contraindications or "" for record in blend.load_exercise_store().text]
+    index = blend.load_contraindication_index()
+
+    extra = []
+    if args.limitations:
+        with open(args.limitations, encoding="utf-8") as f:
+            extra = [line.strip() for line in f if line.strip()]
+    conditions = {condition.lower() for condition in blend.MEDICAL_CONDITIONS if condition != "None"}
+    keywords = sorted(conditions | limitation_keywords(cells + SAMPLE_LIMITATIONS + extra))
+
+    failed = False
+    for bidirectional, rule in ((False, "keyword in cell (blend.py)"), (True, "phrase/condition either way (new05-11.PY)")):
+        misses = check(index, cells, keywords, bidirectional)
+        print(f"{rule}: {len(keywords)} keywords, {len(misses)} with missed exclusions")
+        for keyword, missing in sorted(misses.items())[:None if args.verbose else 10]:
+            print(f"  MISSED {keyword!r}: {len(missing)} exercise(s)")
+        failed |= bool(misses)
+
+    sample = index.excluded_ids(["blood pressure"])
+    print(f"'blood pressure' excludes {len(sample)} exercises")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
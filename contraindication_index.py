@@ -0,0 +1,176 @@
+"""
+Contraindication Index
+Tokenized inverted index over exercise contraindications. Each contraindication phrase
+('Acute low back pain', 'recent knee surgery') is normalized into a set of terms, and every
+term maps to the phrases (and so the exercises) that mention it. Excluding exercises for a
+profile is then a few set intersections plus one union instead of a text scan per exercise.
+
+Every phrase and every query is indexed twice:
+  - normalized terms: lowercase, parenthetical notes dropped ('(use cushion)'), synonyms folded
+    ('high blood pressure' -> 'hypertension', 'low back' -> 'lower back', 'knees' -> 'knee') and
+    severity qualifiers ignored ('acute', 'chronic', 'recent', ...), so 'Chronic Low Back Pain'
+    matches an exercise contraindicated for 'acute low back pain'
+  - raw terms: every word as written, parentheticals included, matched by containment
+    ('tendon' -> 'tendonitis'), so anything the old substring filter excluded still is
+A phrase matches if either form matches; the synonyms only ever add exclusions.
+"""
+
+import re
+import threading
+from typing import Dict, FrozenSet, Hashable, Iterable, List, Set
+
+# Multi-word synonyms, folded before tokenizing (longest first)
+PHRASE_SYNONYMS = {
+    "high blood pressure": "hypertension",
+    "elevated blood pressure": "hypertension",
+    "type 2 diabetes": "diabetes",
+    "type ii diabetes": "diabetes",
+    "deep vein thrombosis": "dvt",
+    "low back": "lower back",
+    "lumbar spine": "lower back",
+}
+
+# Single-term synonyms and plural/adjective forms (a value may expand to several terms)
+TERM_SYNONYMS = {
+    "htn": "hypertension", "hypertensive": "hypertension",
+    "diabetic": "diabetes", "t2d": "diabetes",
+    "obese": "obesity", "overweight": "obesity",
+    "lumbar": "lower back", "lbp": "lower back pain",
+    "spine": "spinal", "vertebral": "spinal",
+    "osteoporotic": "osteoporosis", "arthritic": "arthritis",
+    "pregnant": "pregnancy", "dizzy": "dizziness",
+    "knees": "knee", "shoulders": "shoulder", "hips": "hip", "wrists": "wrist", "ankles": "ankle",
+    "elbows": "elbow", "hamstrings": "hamstring", "hernias": "hernia",
+    "herniation": "hernia", "herniated": "hernia", # Kept together so 'hernia' still excludes disc herniation work
+    "injuries": "injury", "injured": "injury",
+    "surgeries": "surgery", "surgical": "surgery", "operation": "surgery",
+    "fractures": "fracture", "fractured": "fracture", "broken": "fracture",
+    "tears": "tear", "torn": "tear", "sprains": "sprain", "sprained": "sprain",
+    "strains": "strain", "strained": "strain", "painful": "pain",
+}
+
+# Severity qualifiers, notes and filler words that do not change which body part/condition is meant
+IGNORED_TERMS = frozenset({
+    "acute", "chronic", "severe", "mild", "moderate", "recent", "recently", "unhealed", "unmanaged",
+    "unstable", "uncontrolled", "current", "previous", "prior", "history", "late", "stage",
+    "a", "an", "and", "or", "of", "the", "with", "in", "on", "to", "for", "any",
+    "none", "other", "check", "consult", "doc", "physician", "protocol", "modify", "avoid", "use", "issues", "condition",
+})
+
+_PARENTHETICAL_RE = re.compile(r'\([^)]*\)')
+_PHRASE_SEPARATORS_RE = re.compile(r'[,;\n](?![^()]*\))') # Not inside a parenthetical
+_TERM_RE = re.compile(r'[a-z0-9]+')
+_PHRASE_SYNONYM_RE = re.compile(r'\b(' + '|'.join(re.escape(p) for p in sorted(PHRASE_SYNONYMS, key=len, reverse=True)) + r')\b')
+
+_NO_PHRASES: FrozenSet[int] = frozenset()
+
+
+def normalize_terms(text: str) -> FrozenSet[str]:
+    """'Acute low back pain (perform gently)' -> {'lower', 'back', 'pain'}."""
+    text = _PARENTHETICAL_RE.sub(' ', str(text).lower())
+    text = _PHRASE_SYNONYM_RE.sub(lambda match: PHRASE_SYNONYMS[match.group(1)], text)
+    terms = set()
+    for token in _TERM_RE.findall(text):
+        for term in TERM_SYNONYMS.get(token, token).split():
+            if term not in IGNORED_TERMS:
+                terms.add(term)
+    return frozenset(terms)
+
+
+def raw_terms(text: str) -> FrozenSet[str]:
+    """Every lowercased word, as written: 'Severe GERD (Acid Reflux)' -> {'severe', 'gerd', 'acid', 'reflux'}."""
+    return frozenset(_TERM_RE.findall(str(text).lower()))
+
+
+def split_phrases(text: str) -> List[str]:
+    """Splits a free-text contraindication cell ('Acute knee pain, recent hip surgery') into phrases (notes kept)."""
+    if not isinstance(text, str):
+        return []
+    return [phrase.strip() for phrase in _PHRASE_SEPARATORS_RE.split(text) if phrase.strip()]
+
+
+class ContraindicationIndex:
+    """Inverted index: (normalized and raw) term -> contraindication phrases, phrase -> owning exercise id."""
+
+    def __init__(self, contraindications: Dict[Hashable, Iterable[str]]):
+        self.phrase_terms: List[FrozenSet[str]] = []
+        self.phrase_raw_terms: List[FrozenSet[str]] = []
+        self.phrase_owner: List[Hashable] = []
+        self.postings: Dict[str, Set[int]] = {}
+        self.raw_postings: Dict[str, Set[int]] = {}
+
+        for exercise_id, phrases in contraindications.items():
+            for phrase in phrases:
+                raw = raw_terms(phrase)
+                if not raw:
+                    continue
+                phrase_id = len(self.phrase_terms)
+                self.phrase_terms.append(normalize_terms(phrase)) # Empty for a qualifier-only phrase ('severe')
+                self.phrase_raw_terms.append(raw)
+                self.phrase_owner.append(exercise_id)
+                for term in self.phrase_terms[phrase_id]:
+                    self.postings.setdefault(term, set()).add(phrase_id)
+                for term in raw:
+                    self.raw_postings.setdefault(term, set()).add(phrase_id)
+
+        self._resolved = {}
+        self._containing = {} # Raw query word -> phrases with a raw term containing it
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.phrase_terms)
+
+    def _phrases_containing(self, word: str) -> FrozenSet[int]:
+        """Phrases with a raw term that contains `word` ('tendon' -> 'tendonitis'), memoized per word."""
+        phrases = self._containing.get(word)
+        if phrases is None:
+            phrases = frozenset().union(*(ids for term, ids in self.raw_postings.items() if word in term))
+            with self._lock:
+                self._containing[word] = phrases
+        return phrases
+
+    def _matching_phrases(self, query: FrozenSet[str], raw_query: FrozenSet[str], bidirectional: bool) -> Set[int]:
+        matched = set()
+
+        # Query inside a phrase: the phrase mentions every query term ('knee pain' -> 'acute knee pain'),
+        # either as normalized terms or as raw words containing each query word
+        postings = sorted((self.postings.get(term, _NO_PHRASES) for term in query), key=len)
+        if postings:
+            matched.update(set(postings[0]).intersection(*postings[1:]))
+        raw_postings = sorted((self._phrases_containing(word) for word in raw_query), key=len)
+        if raw_postings:
+            matched.update(set(raw_postings[0]).intersection(*raw_postings[1:]))
+
+        # Phrase inside the query: every phrase term is in the query ('hernia' -> 'hiatal hernia'),
+        # or every raw phrase word is part of a query word
+        if bidirectional:
+            for phrase_id in set().union(*postings):
+                if self.phrase_terms[phrase_id] <= query:
+                    matched.add(phrase_id)
+            candidates = set().union(*(ids for term, ids in self.raw_postings.items() if any(term in word for word in raw_query)))
+            for phrase_id in candidates:
+                if all(any(term in word for word in raw_query) for term in self.phrase_raw_terms[phrase_id]):
+                    matched.add(phrase_id)
+        return matched
+
+    def excluded_ids(self, conditions: Iterable[str], bidirectional: bool = False) -> FrozenSet[Hashable]:
+        """
+        Exercise ids contraindicated by any of the conditions (union over conditions).
+        By default a condition matches phrases that contain all of its terms; with
+        bidirectional=True a phrase whose terms are all in the condition also matches.
+        Always a superset of plain substring matching (condition in phrase, or phrase in condition).
+        """
+        excluded = set()
+        for condition in conditions:
+            query, raw_query = normalize_terms(condition), raw_terms(condition)
+            key = (query, raw_query, bidirectional)
+            owners = self._resolved.get(key)
+            if owners is None:
+                owners = frozenset(self.phrase_owner[phrase_id] for phrase_id in self._matching_phrases(query, raw_query, bidirectional))
+                with self._lock:
+                    self._resolved[key] = owners
+            excluded |= owners
+        return frozenset(excluded)
+
+    def is_contraindicated(self, exercise_id: Hashable, conditions: Iterable[str], bidirectional: bool = False) -> bool:
+        return exercise_id in self.excluded_ids(conditions, bidirectional)
@@ -5,6 +5,8 @@ from typing import Dict, List, Any, Optional
 import re
 import random
 
+from exercise_catalog import CATALOG, CSV_SOURCE_FILE
+
 # ============ CONFIGURATION & DATA DEFINITIONS ============
 
 FITNESS_LEVELS = {
@@ -37,7 +39,7 @@ DURATION_MAP = {
     "45-60 minutes": {'total_time': 53, 'warmup_count': 3, 'cooldown_count': 3, 'main_count': 11},
 }
 
-EXERCISE_DATA_FILE = "Latest exercise database- New model.csv"
+EXERCISE_DATA_FILE = CSV_SOURCE_FILE # Read through the shared exercise catalog (exercise_catalog.py)
 
 @st.cache_data
 def load_exercise_data():
@@ -46,7 +48,7 @@ def load_exercise_data():
     """
     try:
         # Load the actual CSV data
-        df = pd.read_csv(EXERCISE_DATA_FILE, encoding='utf-8')
+        df = CATALOG.source_table('csv')
     except FileNotFoundError:
         st.error(f"❌ Error: Exercise database file '{EXERCISE_DATA_FILE}' not found. Please ensure the file is uploaded and in the correct directory.")
         return pd.DataFrame()
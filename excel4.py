@@ -5,6 +5,9 @@ from typing import Dict, List, Any, Optional
 import re
 import random
 
+from filter_cache import StageMaskCache, tag_dataset
+from exercise_catalog import CATALOG, CSV_SOURCE_FILE
+
 # ============ CONFIGURATION & DATA DEFINITIONS ============
 
 FITNESS_LEVELS = {
@@ -37,7 +40,10 @@ DURATION_MAP = {
     "45-60 minutes": {'total_time': 53, 'warmup_count': 3, 'cooldown_count': 2, 'main_count': 11},
 }
 
-EXERCISE_DATA_FILE = "Latest exercise database- New model.csv"
+EXERCISE_DATA_FILE = CSV_SOURCE_FILE # Read through the shared exercise catalog (exercise_catalog.py)
+
+# Per-stage filter masks, shared by every session of this process
+STAGE_MASKS = StageMaskCache()
 
 @st.cache_data
 def load_exercise_data():
@@ -47,7 +53,7 @@ def load_exercise_data():
     try:
         # NOTE: If this file is not present in the same directory, this will fail.
         # This assumes the user has uploaded or placed the CSV file alongside the script.
-        df = pd.read_csv(EXERCISE_DATA_FILE, encoding='utf-8')
+        df = CATALOG.source_table('csv')
     except FileNotFoundError:
         st.error(f"❌ Error: Exercise database file '{EXERCISE_DATA_FILE}' not found. Please ensure the file is uploaded and in the correct directory.")
         return pd.DataFrame()
@@ -102,7 +108,8 @@ def load_exercise_data():
     # Ensure Category is clean for grouping
     df['Category'] = df['Category'].astype(str).str.strip()
     
-    return df
+    # Fingerprint the loaded frame so filter stage masks are shared across reruns (see filter_cache.py)
+    return tag_dataset(df)
 
 # Global sets for A/B split variety tracking
 used_concept_groups_A = set()
@@ -146,9 +153,11 @@ def filter_and_select_exercises(df: pd.DataFrame, profile: Dict[str, Any]) -> pd
     """
     Filters the exercise dataframe based on ALL user profile and goal/level logic.
     (Updated to adjust RPE filter and Equipment Prioritization for robustness)
+    Each stage yields a boolean row mask over the full dataframe, cached (STAGE_MASKS) on the profile
+    fields it reads plus the keys of the stages it depends on, so changing one form field only
+    recomputes the stages downstream of it. The rows are materialized once at the end.
     """
     
-    filtered_df = df.copy()
     session_counts = get_session_counts(profile['session_duration'])
     target_main_count = session_counts['main_count']
     
@@ -156,27 +165,38 @@ def filter_and_select_exercises(df: pd.DataFrame, profile: Dict[str, Any]) -> pd
     medical_conditions = [c.lower() for c in profile.get('medical_conditions', []) if c != "None"]
     physical_limitations = profile.get('physical_limitations', '').lower()
     
-    if (medical_conditions or physical_limitations) and 'Contraindications' in filtered_df.columns:
+    exclusion_keywords = []
+    if (medical_conditions or physical_limitations) and 'Contraindications' in df.columns:
         exclusion_keywords = medical_conditions
         exclusion_keywords.extend([word.strip() for word in re.split(r'[^\w\s]', physical_limitations) if len(word) > 2])
-        if exclusion_keywords:
-            exclusion_pattern = '|'.join(re.escape(k) for k in exclusion_keywords)
-            filtered_df = filtered_df[
-                ~filtered_df['Contraindications'].fillna('').str.lower().str.contains(exclusion_pattern, na=False)
-            ]
-            st.info(f"Filtered out exercises contraindicated by: **{', '.join(exclusion_keywords[:3])}...**")
+    
+    def safety_stage() -> np.ndarray:
+        if not exclusion_keywords:
+            return np.ones(len(df), dtype=bool)
+        exclusion_pattern = '|'.join(re.escape(k) for k in exclusion_keywords)
+        return ~df['Contraindications'].fillna('').str.lower().str.contains(exclusion_pattern, na=False).to_numpy(dtype=bool)
+    
+    safety_key = tuple(exclusion_keywords)
+    safety_mask = STAGE_MASKS.get(df, 'safety', safety_key, safety_stage)
+    if exclusion_keywords:
+        st.info(f"Filtered out exercises contraindicated by: **{', '.join(exclusion_keywords[:3])}...**")
     
     # 2. Level & Complexity Filter 
     user_level_str = profile['fitness_level']
     user_max_complexity = FITNESS_LEVELS[user_level_str]['max_complexity']
-    filtered_df = filtered_df[filtered_df['Complexity_Level'] <= user_max_complexity]
     
-    # 2b. Exclude overly assisted movements for Level 3 and above
-    if user_max_complexity >= 3:
-        assisted_keywords = r'assisted|seated|wall' 
-        is_strength_category = filtered_df['Category'].str.contains('Body|Strength|Resistance', case=False, na=False)
-        is_assisted = filtered_df['Exercise Name'].str.lower().str.contains(assisted_keywords, na=False)
-        filtered_df = filtered_df[~(is_strength_category & is_assisted)].copy()
+    def level_stage() -> np.ndarray:
+        level_mask = (df['Complexity_Level'] <= user_max_complexity).to_numpy()
+        # 2b. Exclude overly assisted movements for Level 3 and above
+        if user_max_complexity >= 3:
+            assisted_keywords = r'assisted|seated|wall' 
+            is_strength_category = df['Category'].str.contains('Body|Strength|Resistance', case=False, na=False)
+            is_assisted = df['Exercise Name'].str.lower().str.contains(assisted_keywords, na=False)
+            level_mask = level_mask & ~(is_strength_category & is_assisted).to_numpy(dtype=bool)
+        return level_mask
+    
+    level_key = (user_level_str,)
+    level_mask = STAGE_MASKS.get(df, 'level', level_key, level_stage)
         
     # 3. Equipment Filter (Rule 6)
     available_equipment = [e.lower().replace(" ", "") for e in profile.get('available_equipment', ["Bodyweight Only"])]
@@ -189,40 +209,55 @@ def filter_and_select_exercises(df: pd.DataFrame, profile: Dict[str, Any]) -> pd
                 return True
         return False
     
-    filtered_df = filtered_df[filtered_df['Equipment_List'].apply(has_required_equipment)]
+    equipment_key = tuple(sorted(set(available_equipment)))
+    equipment_mask = STAGE_MASKS.get(df, 'equipment', equipment_key, lambda: df['Equipment_List'].apply(has_required_equipment))
 
     # 4. Location Filter (Rule 5)
     location = profile.get('workout_location')
-    if location == "Home":
-        gym_only_forbidden = ['machines', 'barbells', 'cables', 'pull-upbar', 'barbell', 'cable'] 
-        def is_home_compatible(exercise_eq_list):
-            return not any(eq.replace(" ", "") in gym_only_forbidden for eq in exercise_eq_list)
-        filtered_df = filtered_df[filtered_df['Equipment_List'].apply(is_home_compatible)]
-    elif location == "Gym":
-        filtered_df = filtered_df[~filtered_df['Available Equipment'].fillna('').str.lower().str.contains('outdoor only', na=False)]
-    elif location == "Outdoor":
-        outdoor_allowed_eq = ['bodyweight', 'outdooronly', 'mat', 'wall', 'bench']
-        def is_outdoor_compatible(exercise_eq_list):
-            return all(eq.replace(" ", "").replace("/", "").strip() in outdoor_allowed_eq for eq in exercise_eq_list)
-        filtered_df = filtered_df[filtered_df['Equipment_List'].apply(is_outdoor_compatible)]
+    
+    def location_stage() -> np.ndarray:
+        if location == "Home":
+            gym_only_forbidden = ['machines', 'barbells', 'cables', 'pull-upbar', 'barbell', 'cable'] 
+            def is_home_compatible(exercise_eq_list):
+                return not any(eq.replace(" ", "") in gym_only_forbidden for eq in exercise_eq_list)
+            return df['Equipment_List'].apply(is_home_compatible)
+        elif location == "Gym":
+            return ~df['Available Equipment'].fillna('').str.lower().str.contains('outdoor only', na=False)
+        elif location == "Outdoor":
+            outdoor_allowed_eq = ['bodyweight', 'outdooronly', 'mat', 'wall', 'bench']
+            def is_outdoor_compatible(exercise_eq_list):
+                return all(eq.replace(" ", "").replace("/", "").strip() in outdoor_allowed_eq for eq in exercise_eq_list)
+            return df['Equipment_List'].apply(is_outdoor_compatible)
+        return np.ones(len(df), dtype=bool)
+    
+    location_key = (location,)
+    location_mask = STAGE_MASKS.get(df, 'location', location_key, location_stage)
+    
+    # Stages 1-4 are independent row predicates; everything below depends on their combined pool
+    pool_key = (safety_key, level_key, equipment_key, location_key)
     
     
     # 5. Goal Alignment Filter (Conditional Relaxation for generation volume)
     goal_lower = profile['primary_goal'].lower().split('(')[0].strip()
     
-    # Filter 1: Strict Goal Match
-    strict_goal_df = filtered_df[filtered_df['Goals_List'].apply(lambda x: any(goal_lower in g for g in x))].copy()
-    
-    # If strict goal matching is insufficient, relax the goal criteria.
-    if len(strict_goal_df) < target_main_count:
-        compatible_goals = [goal_lower, 'strength gain', 'general fitness', 'posture & balance improvement', 'cardiovascular fitness']
-        relaxed_goal_df = filtered_df[filtered_df['Goals_List'].apply(
-            lambda x: any(comp_goal in g for g in x for comp_goal in compatible_goals)
-        )].copy()
+    def goal_stage() -> np.ndarray:
+        mask = safety_mask & level_mask & equipment_mask & location_mask
         
-        filtered_df = relaxed_goal_df if len(relaxed_goal_df) >= target_main_count else (strict_goal_df if not strict_goal_df.empty else filtered_df)
-    else:
-        filtered_df = strict_goal_df
+        # Filter 1: Strict Goal Match
+        strict_goal_mask = mask & df['Goals_List'].apply(lambda x: any(goal_lower in g for g in x)).to_numpy(dtype=bool)
+        
+        # If strict goal matching is insufficient, relax the goal criteria.
+        if strict_goal_mask.sum() < target_main_count:
+            compatible_goals = [goal_lower, 'strength gain', 'general fitness', 'posture & balance improvement', 'cardiovascular fitness']
+            relaxed_goal_mask = mask & df['Goals_List'].apply(
+                lambda x: any(comp_goal in g for g in x for comp_goal in compatible_goals)
+            ).to_numpy(dtype=bool)
+            
+            return relaxed_goal_mask if relaxed_goal_mask.sum() >= target_main_count else (strict_goal_mask if strict_goal_mask.any() else mask)
+        return strict_goal_mask
+    
+    goal_stage_key = pool_key + (goal_lower, target_main_count)
+    mask = STAGE_MASKS.get(df, 'goal', goal_stage_key, goal_stage)
 
     # 6. CRITICAL HYPERTROPHY FILTERING (Addressing RPE and Equipment conflict)
     if profile['primary_goal'] in ["Muscle Gain (Hypertrophy)", "Strength Gain"]:
@@ -237,33 +272,37 @@ def filter_and_select_exercises(df: pd.DataFrame, profile: Dict[str, Any]) -> pd
             except:
                 return False
         
-        # Drop any exercise that cannot achieve RPE 5+ (eliminates dedicated mobility/stretches from the main pool)
-        filtered_df = filtered_df[filtered_df['RPE'].apply(meets_stimulus_rpe)].copy()
-        
         # Equipment Prioritization (Addressing the Bodyweight penalty leading to empty pool)
         has_loadable_equipment = any(eq in available_equipment for eq in ['dumbbells', 'kettlebells', 'barbell', 'cables'])
         
-        # FIX: Only apply the bodyweight penalty if we have a very large pool to start with (3x target)
-        # This prevents the filter from wiping out the entire pool when data is sparse.
-        if has_loadable_equipment and len(filtered_df) > target_main_count * 3:
+        def hypertrophy_stage() -> np.ndarray:
+            # Drop any exercise that cannot achieve RPE 5+ (eliminates dedicated mobility/stretches from the main pool)
+            hypertrophy_mask = mask & df['RPE'].apply(meets_stimulus_rpe).to_numpy(dtype=bool)
             
-            # Identify exercises that are bodyweight AND are suitable for resistance
-            is_bodyweight_strength = filtered_df['Equipment_List'].apply(
-                # If only 'bodyweight' is in the list AND it's a strength category
-                lambda x: 'bodyweightonly' in x or ('bodyweight' in x and len(x) == 1)
-            )
-            is_resistance_category = filtered_df['Resistance_Category'].isin(['Upper Body Push', 'Upper Body Pull', 'Lower Body'])
-            
-            # Drop pure bodyweight resistance movements to force selection of weighted movements
-            temp_df = filtered_df[~(is_bodyweight_strength & is_resistance_category)].copy()
+            # FIX: Only apply the bodyweight penalty if we have a very large pool to start with (3x target)
+            # This prevents the filter from wiping out the entire pool when data is sparse.
+            if has_loadable_equipment and hypertrophy_mask.sum() > target_main_count * 3:
+                
+                # Identify exercises that are bodyweight AND are suitable for resistance
+                is_bodyweight_strength = df['Equipment_List'].apply(
+                    # If only 'bodyweight' is in the list AND it's a strength category
+                    lambda x: 'bodyweightonly' in x or ('bodyweight' in x and len(x) == 1)
+                )
+                is_resistance_category = df['Resistance_Category'].isin(['Upper Body Push', 'Upper Body Pull', 'Lower Body'])
+                
+                # Drop pure bodyweight resistance movements to force selection of weighted movements
+                temp_mask = hypertrophy_mask & ~(is_bodyweight_strength & is_resistance_category).to_numpy(dtype=bool)
 
-            # Ensure the pool isn't wiped out before assigning it back
-            if len(temp_df) >= target_main_count:
-                filtered_df = temp_df
-            # ELSE: If filtering bodyweight would leave us with too few weighted exercises, keep the bodyweight exercises as a necessary fallback.
+                # Ensure the pool isn't wiped out before assigning it back
+                if temp_mask.sum() >= target_main_count:
+                    return temp_mask
+                # ELSE: If filtering bodyweight would leave us with too few weighted exercises, keep the bodyweight exercises as a necessary fallback.
+            return hypertrophy_mask
+        
+        mask = STAGE_MASKS.get(df, 'hypertrophy', goal_stage_key + (has_loadable_equipment,), hypertrophy_stage)
         
         
-    return filtered_df
+    return df[mask].copy()
 
 def generate_workout_plan(df_master: pd.DataFrame, profile: Dict[str, Any]) -> Dict[str, pd.DataFrame]:
     """
@@ -0,0 +1,288 @@
+"""
+Unified Exercise Catalog
+One id-keyed, in-memory index over every exercise source in the repo:
+  csv         'Latest exercise database- New model.csv' (blend.py, excel*.py)
+  curated     exercise_library.json (the ExerciseDatabase library of the fitness advisor apps)
+  exercisedb  archive/exercisedb_v1_sample/exercises.json (with its multi-resolution GIFs)
+
+Sources are loaded lazily, on the first query that needs them, into normalized CatalogEntry
+records with '<source>:<key>' ids ('csv:12', 'curated:supine_dead_bug', 'exercisedb:2ORFMoR').
+Generators that need a source's native shape (blend.py's DataFrame, the ExerciseDatabase dict)
+get a private copy of it from source_table(). Parsed sources are kept in a pickle snapshot keyed
+on each file's mtime and size, so a cold start with unchanged files skips CSV/JSON parsing.
+"""
+
+import copy
+import json
+import os
+import pickle
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from contraindication_index import split_phrases
+
+CSV_SOURCE_FILE = "Latest exercise database- New model.csv"
+CURATED_SOURCE_FILE = "exercise_library.json"
+EXERCISEDB_DIR = os.path.join("archive", "exercisedb_v1_sample")
+
+SOURCE_FILES = {
+    "csv": CSV_SOURCE_FILE,
+    "curated": CURATED_SOURCE_FILE,
+    "exercisedb": os.path.join(EXERCISEDB_DIR, "exercises.json"),
+}
+
+EXERCISEDB_GIF_SIZES = (180, 360, 720, 1080) # gifs_<size>x<size>/ renditions shipped with the archive
+
+SNAPSHOT_PATH = ".exercise_catalog.pkl"
+SNAPSHOT_VERSION = 1 # Bump when CatalogEntry or a source parser changes
+
+_NAME_NOISE_RE = re.compile(r'[^a-z0-9]+')
+_NUMBERED_STEP_RE = re.compile(r'(?:^|\s)\d+\.\s+')
+_EXERCISEDB_STEP_RE = re.compile(r'^Step:\s*\d+\s*')
+
+
+def normalize_name(name: str) -> str:
+    """'Push-Ups (Knee)' -> 'push ups knee' (the key used for cross-source name lookups)."""
+    return _NAME_NOISE_RE.sub(' ', str(name).lower()).strip()
+
+
+class CatalogEntry:
+    """One exercise from any source, in the shared field layout (lists are lowercase tuples)."""
+    __slots__ = ("id", "source", "key", "name", "category", "level", "target_areas", "equipment",
+                 "contraindications", "steps", "safety_cue", "benefit", "media")
+
+    def __init__(self, source: str, key: Any, name: str, category: Optional[str] = None, level: Optional[str] = None,
+                 target_areas: Iterable[str] = (), equipment: Iterable[str] = (), contraindications: Iterable[str] = (),
+                 steps: Iterable[str] = (), safety_cue: Optional[str] = None, benefit: Optional[str] = None,
+                 media: Optional[str] = None):
+        self.id = f"{source}:{key}"
+        self.source = source
+        self.key = key
+        self.name = name
+        self.category = category
+        self.level = level
+        self.target_areas = _lower_tuple(target_areas)
+        self.equipment = _lower_tuple(equipment)
+        self.contraindications = tuple(contraindications)
+        self.steps = tuple(steps)
+        self.safety_cue = safety_cue
+        self.benefit = benefit
+        self.media = media
+
+    def __repr__(self) -> str:
+        return f"CatalogEntry({self.id!r}, {self.name!r})"
+
+
+# ============ SOURCE PARSERS ============
+# Each returns (native table, entries): the table is what source_table() hands out (copied),
+# the entries feed the shared index.
+
+def _parse_csv(path: str) -> Tuple[pd.DataFrame, List[CatalogEntry]]:
+    df = pd.read_csv(path, encoding='utf-8')
+    entries = []
+    for row, record in enumerate(df.to_dict('records')):
+        entries.append(CatalogEntry(
+            "csv", row, record.get('Exercise Name'),
+            category=_text(record.get('Category')),
+            level=_text(record.get('Fitness Level')),
+            target_areas=_split(record.get('Target Region'), ','),
+            equipment=_split(record.get('Available Equipment'), ',/'),
+            contraindications=split_phrases(record.get('Contraindications')),
+            steps=[step.strip() for step in _NUMBERED_STEP_RE.split(_text(record.get('Steps to Perform')) or '') if step.strip()],
+            safety_cue=_text(record.get('Safety Cue')),
+            benefit=_text(record.get('Health Benefit'))
+        ))
+    return df, entries
+
+
+def _parse_curated(path: str) -> Tuple[Dict[str, Dict], List[CatalogEntry]]:
+    with open(path, encoding='utf-8') as f:
+        library = json.load(f)
+    entries = [
+        CatalogEntry(
+            "curated", key, exercise.get("name"),
+            category=exercise.get("type"),
+            level=exercise.get("level"),
+            target_areas=exercise.get("target_areas", []),
+            equipment=exercise.get("equipment", []),
+            contraindications=exercise.get("contraindications", []),
+            steps=exercise.get("steps", []),
+            safety_cue=exercise.get("safety"),
+            benefit=exercise.get("benefits"),
+            media=exercise.get("demo_video")
+        )
+        for key, exercise in library.items()
+    ]
+    return library, entries
+
+
+def _parse_exercisedb(path: str) -> Tuple[List[Dict], List[CatalogEntry]]:
+    with open(path, encoding='utf-8') as f:
+        exercises = json.load(f)
+    entries = [
+        CatalogEntry(
+            "exercisedb", exercise["exerciseId"], exercise.get("name"),
+            target_areas=list(exercise.get("targetMuscles", [])) + list(exercise.get("bodyParts", [])),
+            equipment=exercise.get("equipments", []),
+            steps=[_EXERCISEDB_STEP_RE.sub('', step).strip() for step in exercise.get("instructions", [])],
+            media=exercise.get("gifUrl")
+        )
+        for exercise in exercises
+    ]
+    return exercises, entries
+
+
+SOURCE_PARSERS = {
+    "csv": _parse_csv,
+    "curated": _parse_curated,
+    "exercisedb": _parse_exercisedb,
+}
+
+
+# ============ CATALOG ============
+
+class ExerciseCatalog:
+    """Lazily loaded index over all sources; thread-safe, one instance per process (CATALOG)."""
+
+    def __init__(self, source_files: Optional[Dict[str, str]] = None, snapshot_path: Optional[str] = SNAPSHOT_PATH):
+        self.source_files = dict(source_files or SOURCE_FILES)
+        self.snapshot_path = snapshot_path
+        self._tables: Dict[str, Any] = {}
+        self._entries: Dict[str, CatalogEntry] = {}
+        self._by_name: Dict[str, List[str]] = {}
+        self._snapshot: Optional[Dict[str, Dict]] = None
+        self._lock = threading.RLock()
+
+    # ----- loading -----
+
+    def _fingerprint(self, source: str) -> Tuple:
+        stat = os.stat(self.source_files[source]) # FileNotFoundError propagates to the caller
+        return (SNAPSHOT_VERSION, stat.st_mtime_ns, stat.st_size)
+
+    def _read_snapshot(self) -> Dict[str, Dict]:
+        if self._snapshot is None:
+            self._snapshot = {}
+            if self.snapshot_path:
+                try:
+                    with open(self.snapshot_path, 'rb') as f:
+                        self._snapshot = pickle.load(f)
+                except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, TypeError):
+                    pass # Missing or unreadable snapshot: sources are parsed from their files
+        return self._snapshot
+
+    def _write_snapshot(self):
+        if not self.snapshot_path:
+            return
+        try:
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(self._snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError:
+            pass # Read-only deployments still work, they just parse the sources each cold start
+
+    def load(self, source: str):
+        """Loads one source into the index (no-op if it already is). Raises FileNotFoundError if its file is missing."""
+        if source in self._tables:
+            return
+        with self._lock:
+            if source in self._tables:
+                return
+            fingerprint = self._fingerprint(source)
+            snapshot = self._read_snapshot()
+            cached = snapshot.get(source)
+            if cached is not None and cached.get('fingerprint') == fingerprint:
+                table, entries = cached['table'], cached['entries']
+            else:
+                table, entries = SOURCE_PARSERS[source](self.source_files[source])
+                snapshot[source] = {'fingerprint': fingerprint, 'table': table, 'entries': entries}
+                self._write_snapshot()
+
+            for entry in entries:
+                self._entries[entry.id] = entry
+                self._by_name.setdefault(normalize_name(entry.name), []).append(entry.id)
+            self._tables[source] = table
+
+    def load_all(self):
+        """Loads every source whose file exists (used to prebuild the snapshot)."""
+        for source, path in self.source_files.items():
+            if os.path.exists(path):
+                self.load(source)
+
+    # ----- queries -----
+
+    def source_table(self, source: str):
+        """A private copy of the source in its native shape (DataFrame, dict or list)."""
+        self.load(source)
+        table = self._tables[source]
+        return table.copy() if isinstance(table, pd.DataFrame) else copy.deepcopy(table)
+
+    def entries(self, source: Optional[str] = None) -> List[CatalogEntry]:
+        """All entries of one source (loaded on demand), or of every source available."""
+        if source is None:
+            self.load_all()
+            return list(self._entries.values())
+        self.load(source)
+        return [entry for entry in self._entries.values() if entry.source == source]
+
+    def get(self, entry_id: str) -> Optional[CatalogEntry]:
+        """Entry by id ('csv:12', 'curated:supine_dead_bug', ...)."""
+        source = entry_id.split(":", 1)[0]
+        if source in self.source_files:
+            self.load(source)
+        return self._entries.get(entry_id)
+
+    def find(self, name: str, sources: Optional[Iterable[str]] = None) -> List[CatalogEntry]:
+        """Entries whose normalized name matches (in source order), from `sources` or every available source."""
+        sources = list(sources) if sources is not None else [s for s, path in self.source_files.items() if os.path.exists(path)]
+        for source in sources:
+            self.load(source)
+        return [self._entries[entry_id] for entry_id in self._by_name.get(normalize_name(name), [])
+                if self._entries[entry_id].source in sources]
+
+    def search(self, source: Optional[str] = None, target_area: Optional[str] = None, equipment: Optional[str] = None) -> List[CatalogEntry]:
+        """Entries mentioning the target area / equipment (case-insensitive substring of any listed value)."""
+        target_area = target_area.lower() if target_area else None
+        equipment = equipment.lower() if equipment else None
+        return [
+            entry for entry in self.entries(source)
+            if (target_area is None or any(target_area in area for area in entry.target_areas))
+            and (equipment is None or any(equipment in item for item in entry.equipment))
+        ]
+
+    def gif_path(self, entry: CatalogEntry, size: int = EXERCISEDB_GIF_SIZES[0]) -> Optional[str]:
+        """Path of an exercisedb entry's GIF rendition (size from EXERCISEDB_GIF_SIZES), or None."""
+        if entry.source != "exercisedb" or not entry.media:
+            return None
+        path = os.path.join(os.path.dirname(self.source_files["exercisedb"]), f"gifs_{size}x{size}", entry.media)
+        return path if os.path.exists(path) else None
+
+
+def _text(value) -> Optional[str]:
+    return value if isinstance(value, str) else None
+
+
+def _split(value, separators: str) -> List[str]:
+    if not isinstance(value, str):
+        return []
+    return [part.strip() for part in re.split(f"[{re.escape(separators)}]", value) if part.strip()]
+
+
+def _lower_tuple(values: Iterable[str]) -> Tuple[str, ...]:
+    return tuple(str(value).strip().lower() for value in values if str(value).strip())
+
+
+# Process-wide catalog: every generator queries this one index
+CATALOG = ExerciseCatalog()
+
+
+if __name__ == "__main__":
+    # Prebuild the snapshot (e.g. in a deploy step) so the first request does not parse any source.
+    # Imported by module name so the pickled entries reference exercise_catalog, not __main__.
+    from exercise_catalog import CATALOG as catalog
+    catalog.load_all()
+    counts = {source: len(catalog.entries(source)) for source, path in catalog.source_files.items() if os.path.exists(path)}
+    print(f"Catalog snapshot written to {catalog.snapshot_path}: {counts}")
@@ -0,0 +1,139 @@
+"""
+Exercise Media Cache
+Serves exercisedb demo GIFs (archive/exercisedb_v1_sample, rendered at 180/360/720/1080 px) for
+the exercises in a plan. An exercise name resolves through the shared catalog to its gifUrl, and
+then to the smallest rendition that still covers the display width, so a 320 px slot never
+reads a 1080 px file. Bytes are read once into a process-wide LRU bounded by total size rather
+than entry count; callers only ask for them when the media is actually shown (e.g. when a
+"Show Detailed Steps" expander is open).
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Mapping, Optional
+
+from exercise_catalog import CATALOG, EXERCISEDB_GIF_SIZES, CatalogEntry, ExerciseCatalog
+
+MEDIA_CACHE_BUDGET_BYTES = 24 * 1024 * 1024 # ~80 GIFs at 360 px; one 1080 px GIF alone is ~1.8 MB
+DEFAULT_DISPLAY_WIDTH = 320 # CSS px the app shows a demo GIF at
+MAX_PIXEL_RATIO = 3.0 # Caps the DPR client hint (a 3x phone already gets the 1080 px rendition)
+
+
+def pick_rendition(display_width: float, sizes=EXERCISEDB_GIF_SIZES) -> int:
+    """Smallest rendition at least display_width px wide (the largest one if none is)."""
+    for size in sorted(sizes):
+        if size >= display_width:
+            return size
+    return max(sizes)
+
+
+def display_width_for(headers: Optional[Mapping[str, str]], width: int = DEFAULT_DISPLAY_WIDTH) -> int:
+    """
+    Device pixels needed to show media `width` CSS px wide, narrowed to the viewport and scaled by
+    the pixel ratio when the browser sends the Viewport-Width/DPR client hints (st.context.headers).
+    """
+    headers = headers or {}
+
+    def hint(*names) -> Optional[float]:
+        for name in names:
+            try:
+                return float(headers.get(name))
+            except (TypeError, ValueError):
+                continue
+        return None
+
+    viewport = hint("Sec-CH-Viewport-Width", "Viewport-Width")
+    ratio = hint("Sec-CH-DPR", "DPR") or 1.0
+    css_width = min(width, viewport) if viewport else width
+    return int(round(css_width * min(max(ratio, 1.0), MAX_PIXEL_RATIO)))
+
+
+class MediaCache:
+    """Thread-safe LRU of file bytes, evicting least recently used files beyond `budget_bytes` in total."""
+
+    def __init__(self, budget_bytes: int = MEDIA_CACHE_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self._files = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def read(self, path: str) -> bytes:
+        """The file's bytes, from memory when cached. Files larger than the whole budget are not kept."""
+        with self._lock:
+            data = self._files.get(path)
+            if data is not None:
+                self._files.move_to_end(path)
+                self.hits += 1
+                return data
+
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        with self._lock:
+            self.misses += 1
+            if len(data) <= self.budget_bytes and path not in self._files:
+                self._files[path] = data
+                self._size += len(data)
+                while self._size > self.budget_bytes:
+                    _, evicted = self._files.popitem(last=False)
+                    self._size -= len(evicted)
+        return data
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._files), "bytes": self._size}
+
+    def clear(self):
+        with self._lock:
+            self._files.clear()
+            self._size = 0
+            self.hits = self.misses = 0
+
+
+class ExerciseMedia:
+    """Name -> exercisedb entry -> best-fitting GIF rendition -> cached bytes."""
+
+    def __init__(self, catalog: ExerciseCatalog = CATALOG, cache: Optional[MediaCache] = None):
+        self.catalog = catalog
+        self.cache = cache or MediaCache()
+
+    def entry_for(self, name: str) -> Optional[CatalogEntry]:
+        """The exercisedb entry with this (normalized) name, or None (also when the archive is absent)."""
+        if not name:
+            return None
+        try:
+            matches = self.catalog.find(name, sources=["exercisedb"])
+        except FileNotFoundError:
+            return None
+        return matches[0] if matches else None
+
+    def gif_path(self, entry: CatalogEntry, display_width: int = DEFAULT_DISPLAY_WIDTH) -> Optional[str]:
+        """
+        Path of the smallest existing rendition covering display_width; if that size is missing
+        on disk, the next larger one, then the next smaller.
+        """
+        preferred = pick_rendition(display_width)
+        sizes = sorted(EXERCISEDB_GIF_SIZES)
+        ordered = [s for s in sizes if s >= preferred] + [s for s in reversed(sizes) if s < preferred]
+        for size in ordered:
+            path = self.catalog.gif_path(entry, size)
+            if path:
+                return path
+        return None
+
+    def gif_for(self, name: str, display_width: int = DEFAULT_DISPLAY_WIDTH) -> Optional[bytes]:
+        """Demo GIF bytes for the exercise (None when exercisedb has no media for it)."""
+        entry = self.entry_for(name)
+        path = self.gif_path(entry, display_width) if entry is not None else None
+        if path is None:
+            return None
+        try:
+            return self.cache.read(path)
+        except OSError:
+            return None
+
+
+# Process-wide media layer (one byte budget shared by every session)
+MEDIA = ExerciseMedia()
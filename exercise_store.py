@@ -0,0 +1,162 @@
+"""
+Compact Exercise Store
+Columnar layout for the exercise CSV, built once per process. The filter/selection frame only holds
+what planning reads:
+  - repeated labels (Category, Fitness Level, Resistance_Category, ...) as categorical dtypes
+  - list-valued cells (Goals, Available Equipment) as interned token ids (TokenVocabulary)
+    instead of per-row Python lists
+  - an integer Exercise_Id per row
+Long text (steps, safety cue, benefit, contraindications) lives in a side table of __slots__ records
+and is looked up by Exercise_Id only when a daily plan is rendered (ExerciseStore.render), so the
+per-session frame copies and every filtered pool stay small.
+"""
+
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+EXERCISE_ID_COLUMN = "Exercise_Id"
+
+# Repeated labels (a few dozen distinct values over hundreds of rows)
+CATEGORICAL_COLUMNS = (
+    "Category", "Fitness Level", "Resistance_Category", "Concept_Group", "Age Group", "Goals",
+    "Target Region", "Available Equipment", "Rest Intervals", "RPE", "Validation Status",
+    "RPE_Prefix", "RPE_Suffix", "Reps_Prefix", "Reps_Suffix"
+)
+
+# Heavy free text, moved to the side table (column -> ExerciseText attribute)
+TEXT_COLUMNS = {
+    "Steps to Perform": "steps",
+    "Safety Cue": "safety_cue",
+    "Health Benefit": "health_benefit",
+    "Contraindications": "contraindications",
+}
+
+
+class ExerciseText:
+    """The long text fields of one exercise (one record per Exercise_Id)."""
+    __slots__ = tuple(TEXT_COLUMNS.values())
+
+    def __init__(self, steps=None, safety_cue=None, health_benefit=None, contraindications=None):
+        self.steps = steps
+        self.safety_cue = safety_cue
+        self.health_benefit = health_benefit
+        self.contraindications = contraindications
+
+
+class TokenVocabulary:
+    """
+    Interned tokens of a list-valued column in CSR form: `tokens` holds each distinct token once,
+    row i owns token_ids[offsets[i]:offsets[i + 1]]. Row predicates are evaluated once per distinct
+    token and then spread to the rows.
+    """
+    __slots__ = ("tokens", "token_ids", "offsets", "_row_of")
+
+    def __init__(self, rows: Iterable[List[str]]):
+        ids: Dict[str, int] = {}
+        token_ids: List[int] = []
+        offsets = [0]
+        for tokens in rows:
+            for token in tokens:
+                token_ids.append(ids.setdefault(token, len(ids)))
+            offsets.append(len(token_ids))
+
+        self.tokens = tuple(ids)
+        self.token_ids = np.asarray(token_ids, dtype=np.int32)
+        self.offsets = np.asarray(offsets, dtype=np.int32)
+        self._row_of = np.repeat(np.arange(len(offsets) - 1, dtype=np.int32), np.diff(self.offsets))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def row_tokens(self, row: int) -> List[str]:
+        return [self.tokens[i] for i in self.token_ids[self.offsets[row]:self.offsets[row + 1]]]
+
+    def row_lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def rows_matching(self, predicate: Callable[[str], bool]) -> np.ndarray:
+        """Boolean mask (one entry per row): True where any of the row's tokens satisfies predicate."""
+        token_hits = np.fromiter((predicate(token) for token in self.tokens), dtype=bool, count=len(self.tokens))
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self._row_of[token_hits[self.token_ids]]] = True
+        return mask
+
+
+class ExerciseStore:
+    """The compact exercise frame plus its token vocabularies and text side table."""
+    __slots__ = ("frame", "vocabularies", "text")
+
+    def __init__(self, frame: pd.DataFrame, vocabularies: Optional[Dict[str, TokenVocabulary]] = None,
+                 text: Sequence[ExerciseText] = ()):
+        self.frame = frame
+        self.vocabularies = vocabularies or {}
+        self.text = tuple(text)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, vocabularies: Optional[Dict[str, TokenVocabulary]] = None,
+                   categorical_columns: Sequence[str] = CATEGORICAL_COLUMNS) -> "ExerciseStore":
+        """
+        Splits a loaded exercise frame into the store. Rows get Exercise_Id 0..n-1 in frame order,
+        which is also the row order of the vocabularies (built from the same frame).
+        """
+        df = df.reset_index(drop=True)
+        text_columns = [column for column in TEXT_COLUMNS if column in df.columns]
+        text_values = [df[column].to_numpy(dtype=object) for column in text_columns]
+        text = [
+            ExerciseText(**{TEXT_COLUMNS[column]: _present(values[row]) for column, values in zip(text_columns, text_values)})
+            for row in range(len(df))
+        ]
+
+        frame = df.drop(columns=text_columns)
+        for column in categorical_columns:
+            if column in frame.columns:
+                frame[column] = frame[column].astype("category")
+        frame[EXERCISE_ID_COLUMN] = np.arange(len(frame), dtype=np.int32)
+        return cls(frame, vocabularies, text)
+
+    def vocabulary_mask(self, name: str, predicate: Callable[[str], bool], df: Optional[pd.DataFrame] = None) -> np.ndarray:
+        """rows_matching() over the store, or aligned to the rows of `df` (any subset of the frame)."""
+        mask = self.vocabularies[name].rows_matching(predicate)
+        if df is None:
+            return mask
+        return mask[df[EXERCISE_ID_COLUMN].to_numpy()]
+
+    def render(self, plan: pd.DataFrame, **columns) -> pd.DataFrame:
+        """
+        Plan rows ready for display/export: the text columns looked up by Exercise_Id and the
+        categorical columns back to plain strings (decode_categoricals the pool first to do that
+        once instead of per plan). Rows without an id (AI substitutions) keep the text they carry.
+        Extra `columns` (like DataFrame.assign) are added in the same pass.
+        """
+        ids = plan[EXERCISE_ID_COLUMN].to_numpy(dtype=float) if EXERCISE_ID_COLUMN in plan.columns else np.full(len(plan), np.nan)
+        records = [self.text[int(i)] if not np.isnan(i) else None for i in ids]
+
+        for column, attribute in TEXT_COLUMNS.items():
+            own = plan[column].to_numpy(dtype=object) if column in plan.columns else [None] * len(plan)
+            columns[column] = [getattr(record, attribute) if record is not None else value for record, value in zip(records, own)]
+
+        # One concat instead of a column insert per text field (plans are a dozen rows but ~160 columns wide)
+        plan = decode_categoricals(plan)
+        replaced = [column for column in columns if column in plan.columns]
+        if replaced:
+            plan = plan.drop(columns=replaced)
+        return pd.concat([plan, pd.DataFrame(columns, index=plan.index)], axis=1)
+
+
+def decode_categoricals(df: pd.DataFrame) -> pd.DataFrame:
+    """The categorical columns of df back to their plain value dtype (no-op when there are none)."""
+    # categories.take(codes) is about twice as fast as astype; code -1 (missing) becomes NaN
+    if not any(isinstance(dtype, pd.CategoricalDtype) for dtype in df.dtypes):
+        return df
+    columns = {
+        column: values.array.categories.take(values.array.codes, allow_fill=True, fill_value=np.nan).array
+        for column, values in df.select_dtypes("category").items()
+    }
+    return df.assign(**columns)
+
+
+def _present(value):
+    """NaN cells become None in the side table (the frame used NaN for missing text)."""
+    return None if isinstance(value, float) and np.isnan(value) else value
@@ -0,0 +1,205 @@
+"""
+Local Chat-Completions Stub
+Tiny HTTP server that stands in for the Azure endpoint: it replays a recorded SSE stream
+for "stream": true requests and returns a normal completion otherwise. Used to exercise
+streaming generation without network access or API cost. A "json_schema" response_format is
+honoured the way the real endpoint would: the plan is cut down to the schema's properties and
+sent as bare JSON.
+
+Usage:
+    python fake_llm_server.py --port 8765                       # built-in sample plan
+    python fake_llm_server.py --sse fixtures/plan_stream.sse    # replay a recorded stream verbatim
+    python fake_llm_server.py --plan plan.json --chunk-delay 0.02
+Then point ENDPOINT_URL at http://127.0.0.1:8765/chat/completions.
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+DEFAULT_CHUNK_CHARS = 24 # Roughly a handful of tokens per SSE event
+
+SAMPLE_PLAN = {
+    "warmup_duration": "5-7 minutes",
+    "warmup": [
+        {"name": "March in Place", "benefit": "Raises heart rate gradually.", "steps": ["Stand tall.", "Lift knees alternately.", "Swing arms naturally."],
+         "sets": "1", "reps": "60-90 seconds", "intensity_rpe": "RPE 3-4", "rest": "15 seconds", "equipment": "None",
+         "safety_cue": "Keep your core engaged.", "est_calories": "Est: 0 Cal (MET: 0.0)"},
+        {"name": "Arm Circles", "benefit": "Mobilizes the shoulders.", "steps": ["Extend arms.", "Draw small circles.", "Reverse direction."],
+         "sets": "1", "reps": "10-12", "intensity_rpe": "RPE 2-3", "rest": "15 seconds", "equipment": "None",
+         "safety_cue": "Move within a pain-free range.", "est_calories": "Est: 0 Cal (MET: 0.0)"}
+    ],
+    "main_workout_category": "Full Body",
+    "main_workout": [
+        {"name": "Bodyweight Squat", "benefit": "Builds leg strength (Knee Dominant).", "steps": ["Feet shoulder-width apart.", "Sit hips back.", "Drive up through heels."],
+         "sets": "3", "reps": "10-12", "intensity_rpe": "RPE 5-6", "rest": "60 seconds", "equipment": "None",
+         "safety_cue": "Keep knees tracking over toes.", "est_calories": "Est: 0 Cal (MET: 0.0)"},
+        {"name": "Wall Push-ups", "benefit": "Targets chest and arms (Horizontal Push).", "steps": ["Hands on the wall.", "Lower chest toward wall.", "Press back."],
+         "sets": "3", "reps": "10-12", "intensity_rpe": "RPE 5-6", "rest": "60 seconds", "equipment": "Wall",
+         "safety_cue": "Keep a straight line from head to heels.", "est_calories": "Est: 0 Cal (MET: 0.0)"},
+        {"name": "Plank", "benefit": "Core stability.", "steps": ["Forearms under shoulders.", "Brace the core.", "Hold the position."],
+         "sets": "2", "reps": "20-30 seconds", "intensity_rpe": "RPE 6", "rest": "45 seconds", "equipment": "Mat",
+         "safety_cue": "Do not let your hips sag.", "est_calories": "Est: 0 Cal (MET: 0.0)"}
+    ],
+    "cooldown_duration": "5 minutes",
+    "cooldown": [
+        {"name": "Hamstring Stretch", "benefit": "Releases the posterior chain.", "steps": ["Sit tall.", "Reach toward toes.", "Breathe slowly."],
+         "hold": "30 seconds", "rest": "10 seconds", "equipment": "Mat", "safety_cue": "Avoid bouncing.", "est_calories": "Est: 0 Cal (MET: 0.0)"}
+    ],
+    "safety_notes": ["Stop if you feel sharp pain.", "Progression Tip: Add one rep per set next week."]
+}
+
+
+def plan_to_completion_text(plan: Dict) -> str:
+    """Wraps the plan the way the model answers (fenced ```json block)."""
+    return "```json\n" + json.dumps(plan, indent=2, ensure_ascii=False) + "\n```"
+
+
+def project_to_schema(value, schema: Dict):
+    """Keeps only what a JSON Schema allows (object properties, recursively through arrays)."""
+    if isinstance(value, dict) and "properties" in schema:
+        return {key: project_to_schema(item, schema["properties"][key]) for key, item in value.items() if key in schema["properties"]}
+    if isinstance(value, list) and "items" in schema:
+        return [project_to_schema(item, schema["items"]) for item in value]
+    return value
+
+
+def schema_completion_text(plan: Dict, payload: Dict) -> Optional[str]:
+    """The completion for a request with a json_schema response_format (None for any other request)."""
+    output_format = payload.get("response_format") or {}
+    if output_format.get("type") != "json_schema":
+        return None
+    return json.dumps(project_to_schema(plan, output_format["json_schema"]["schema"]), indent=2, ensure_ascii=False)
+
+
+def build_sse_events(content: str, chunk_chars: int = DEFAULT_CHUNK_CHARS, model: str = "mistral-small") -> List[str]:
+    """Splits a completion into chat-completions SSE 'data:' events, ending with [DONE]."""
+    events = []
+    base = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+    events.append("data: " + json.dumps({**base, "choices": [{"index": 0, "delta": {"role": "assistant"}, "finish_reason": None}]}) + "\n\n")
+    for start in range(0, len(content), chunk_chars):
+        delta = {"content": content[start:start + chunk_chars]}
+        events.append("data: " + json.dumps({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}) + "\n\n")
+    events.append("data: " + json.dumps({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}) + "\n\n")
+    events.append("data: [DONE]\n\n")
+    return events
+
+
+def split_recorded_sse(raw: str) -> List[str]:
+    """Splits a recorded SSE capture into events (blank-line separated), keeping the separators."""
+    return [block.strip("\n") + "\n\n" for block in raw.replace("\r\n", "\n").split("\n\n") if block.strip()]
+
+
+def make_handler(plan: Dict, content: str, sse_events: List[str], chunk_chars: int, chunk_delay: float, response_delay: float,
+                 replay_recorded: bool = False):
+    class CompletionsHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1" # Keep-alive, like the real endpoint
+        disable_nagle_algorithm = True # Headers and body are separate writes; avoid the 40ms delayed-ACK stall
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                payload = {}
+
+            if response_delay:
+                time.sleep(response_delay)
+
+            completion = content
+            events = sse_events
+            schema_content = schema_completion_text(plan, payload)
+            if schema_content is not None:
+                completion = schema_content
+                if not replay_recorded:
+                    events = build_sse_events(schema_content, chunk_chars)
+
+            if payload.get("stream"):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for event in events:
+                    data = event.encode("utf-8")
+                    self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                    self.wfile.flush()
+                    if chunk_delay:
+                        time.sleep(chunk_delay)
+                self.wfile.write(b"0\r\n\r\n")
+                return
+
+            body = json.dumps({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "model": payload.get("model", "mistral-small"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": completion}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass # Keep benchmark and app output clean
+
+    return CompletionsHandler
+
+
+def start_server(port: int = 0, plan: Optional[Dict] = None, recorded_sse: Optional[str] = None,
+                 chunk_chars: int = DEFAULT_CHUNK_CHARS, chunk_delay: float = 0.0, response_delay: float = 0.0) -> ThreadingHTTPServer:
+    """
+    Starts the stub on a background thread and returns the server (port 0 picks a free port;
+    see server.server_address). A recorded SSE capture is replayed verbatim for streaming requests.
+    """
+    plan = plan or SAMPLE_PLAN
+    content = plan_to_completion_text(plan)
+    sse_events = split_recorded_sse(recorded_sse) if recorded_sse else build_sse_events(content, chunk_chars)
+
+    handler = make_handler(plan, content, sse_events, chunk_chars, chunk_delay, response_delay, replay_recorded=bool(recorded_sse))
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def endpoint_url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/chat/completions"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local chat-completions stub (JSON and SSE).")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--plan", help="Plan JSON file to serve (default: built-in sample plan)")
+    parser.add_argument("--sse", help="Recorded SSE capture to replay for streaming requests")
+    parser.add_argument("--chunk-chars", type=int, default=DEFAULT_CHUNK_CHARS)
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Seconds between SSE events")
+    parser.add_argument("--response-delay", type=float, default=0.0, help="Seconds before responding (simulated latency)")
+    args = parser.parse_args()
+
+    plan = None
+    if args.plan:
+        with open(args.plan, encoding="utf-8") as f:
+            plan = json.load(f)
+    recorded_sse = None
+    if args.sse:
+        with open(args.sse, encoding="utf-8") as f:
+            recorded_sse = f.read()
+
+    server = start_server(args.port, plan, recorded_sse, args.chunk_chars, args.chunk_delay, args.response_delay)
+    print(f"Stub listening on {endpoint_url(server)} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
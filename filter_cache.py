@@ -0,0 +1,86 @@
+"""
+Filter Stage Mask Cache
+Memoizes the boolean row mask produced by each stage of filter_and_select_exercises
+(safety, level, equipment, location, goal, hypertrophy), keyed on the exercise dataset plus
+only the profile fields that stage reads. When one form field changes, the stages that do not
+read it (directly or through an upstream stage) are served from the cache.
+
+The dataset is identified by a content fingerprint stored in DataFrame.attrs by the loader, so
+the copies st.cache_data hands out on every rerun share one set of masks. DataFrames without a
+fingerprint (or row subsets of a fingerprinted one) bypass the cache.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+STAGE_CACHE_MAX_ENTRIES = 512 # Masks are one byte per exercise row, so this stays well under a megabyte
+
+_FINGERPRINT_ATTR = "dataset_fingerprint"
+_ROWS_ATTR = "dataset_rows"
+
+
+def tag_dataset(df: pd.DataFrame) -> pd.DataFrame:
+    """Stores a content fingerprint of the loaded exercise data in df.attrs (call once, at load time)."""
+    row_hashes = pd.util.hash_pandas_object(df.astype(str), index=True).to_numpy()
+    df.attrs[_FINGERPRINT_ATTR] = hashlib.sha1(row_hashes.tobytes() + "|".join(map(str, df.columns)).encode("utf-8")).hexdigest()
+    df.attrs[_ROWS_ATTR] = len(df)
+    return df
+
+
+def dataset_key(df: pd.DataFrame) -> Optional[str]:
+    """The fingerprint if df is the full tagged dataset, else None (filtered slices inherit attrs)."""
+    fingerprint = df.attrs.get(_FINGERPRINT_ATTR)
+    if fingerprint is None or df.attrs.get(_ROWS_ATTR) != len(df):
+        return None
+    return fingerprint
+
+
+class StageMaskCache:
+    """Thread-safe LRU of read-only row masks keyed by (dataset, stage, stage inputs)."""
+
+    def __init__(self, max_entries: int = STAGE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._masks = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, df: pd.DataFrame, stage: str, key: Hashable, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        """
+        The stage's mask for these inputs, computed at most once per dataset. The returned array is
+        read-only (shared between sessions): combine it with `&`/`|`, never in place.
+        """
+        dataset = dataset_key(df)
+        if dataset is None:
+            return np.asarray(compute(), dtype=bool)
+
+        cache_key = (dataset, stage, key)
+        with self._lock:
+            mask = self._masks.get(cache_key)
+            if mask is not None:
+                self._masks.move_to_end(cache_key)
+                self.hits += 1
+                return mask
+
+        mask = np.array(compute(), dtype=bool)
+        mask.setflags(write=False)
+        with self._lock:
+            self.misses += 1
+            self._masks[cache_key] = mask
+            while len(self._masks) > self.max_entries:
+                self._masks.popitem(last=False)
+        return mask
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._masks)}
+
+    def clear(self):
+        with self._lock:
+            self._masks.clear()
+            self.hits = self.misses = 0
@@ -0,0 +1,83 @@
+"""
+Generation Metrics
+Per output-mode counters for LLM plan generation: calls, attempts (so retries), fallbacks to the
+canned plan, repaired truncations, and prompt/completion tokens summed over every attempt.
+Token counts come from the response `usage` block; when the endpoint reports none (streamed
+completions) they are estimated from the text. compare() sets two modes side by side, e.g. the
+free-text prompt ("off") against schema-constrained output ("json_schema").
+"""
+
+import threading
+from typing import Dict
+
+
+class ModeStats:
+    """Running totals for one output mode."""
+    __slots__ = ("calls", "attempts", "failures", "repaired", "prompt_tokens", "completion_tokens")
+
+    def __init__(self):
+        self.calls = 0
+        self.attempts = 0
+        self.failures = 0
+        self.repaired = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def as_dict(self) -> Dict[str, float]:
+        calls = self.calls or 1
+        return {
+            "calls": self.calls,
+            "attempts": self.attempts,
+            "retry_rate": round((self.attempts - self.calls) / calls, 4), # Extra attempts per call
+            "failure_rate": round(self.failures / calls, 4), # Calls that ended on the fallback plan
+            "repaired_rate": round(self.repaired / calls, 4),
+            "prompt_tokens_per_call": round(self.prompt_tokens / calls, 1),
+            "completion_tokens_per_call": round(self.completion_tokens / calls, 1)
+        }
+
+
+class GenerationMetrics:
+    """Thread-safe; one instance is shared by every advisor in the process (GENERATION_METRICS)."""
+
+    def __init__(self):
+        self._modes: Dict[str, ModeStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, mode: str, attempts: int, success: bool, repaired: bool, prompt_tokens: int, completion_tokens: int):
+        """One generate_workout_plan call that reached the endpoint (cache hits are not recorded)."""
+        with self._lock:
+            stats = self._modes.setdefault(mode, ModeStats())
+            stats.calls += 1
+            stats.attempts += attempts
+            stats.failures += 0 if success else 1
+            stats.repaired += 1 if repaired else 0
+            stats.prompt_tokens += prompt_tokens
+            stats.completion_tokens += completion_tokens
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {mode: stats.as_dict() for mode, stats in self._modes.items()}
+
+    def compare(self, before: str, after: str) -> Dict[str, float]:
+        """Relative token change and retry/failure rate change (in points) from mode `before` to `after`."""
+        stats = self.stats()
+        old, new = stats.get(before), stats.get(after)
+        if not old or not new:
+            return {}
+
+        def change(field: str) -> float:
+            return round(100.0 * (new[field] / old[field] - 1), 2) if old[field] else 0.0
+
+        return {
+            "completion_tokens_change_pct": change("completion_tokens_per_call"),
+            "prompt_tokens_change_pct": change("prompt_tokens_per_call"),
+            "retry_rate_change": round(new["retry_rate"] - old["retry_rate"], 4),
+            "failure_rate_change": round(new["failure_rate"] - old["failure_rate"], 4)
+        }
+
+    def clear(self):
+        with self._lock:
+            self._modes.clear()
+
+
+GENERATION_METRICS = GenerationMetrics()
@@ -0,0 +1,97 @@
+"""
+Indexed MET Lookup
+Precomputed index over the exercise_mets.json keys that resolves a cleaned exercise name
+to its MET entry with exactly the same precedence as the original linear scan:
+  1. The first key (in file order) that the name starts with.
+  2. difflib.get_close_matches(name, keys, n=1, cutoff=0.7).
+Resolved names are memoized for the lifetime of the process.
+"""
+
+import difflib
+import re
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+
+FUZZY_CUTOFF = 0.7
+
+_NAME_SEPARATORS_RE = re.compile(r'[\s\(\)-]+')
+
+
+def clean_exercise_name(exercise_name: str) -> str:
+    """'Wall Push-ups (Standard)' -> 'wall_push_ups_standard' (same rule the MET keys follow)."""
+    return _NAME_SEPARATORS_RE.sub('_', exercise_name.lower()).strip('_')
+
+
+class MetIndex:
+    """Prefix map + character-count index over the MET database keys."""
+
+    def __init__(self, met_database: Dict[str, Dict]):
+        self.met_database = met_database
+        self.keys = list(met_database.keys())
+
+        # Prefix rule: key -> position in file order (earliest matching key wins)
+        self.key_order = {key: position for position, key in enumerate(self.keys)}
+        self.max_key_length = max((len(key) for key in self.keys), default=0)
+
+        # Fuzzy rule: unigram count matrix (one row per key) used to compute difflib's
+        # quick_ratio() upper bound for all keys in one vectorized pass
+        self.alphabet = {char: column for column, char in enumerate(sorted(set(''.join(self.keys))))}
+        self.char_counts = np.zeros((len(self.keys), len(self.alphabet)), dtype=np.int32)
+        for row, key in enumerate(self.keys):
+            for char in key:
+                self.char_counts[row, self.alphabet[char]] += 1
+        self.key_lengths = np.array([len(key) for key in self.keys], dtype=np.float64)
+
+        self._resolved = {}
+        self._lock = threading.Lock()
+
+    def _prefix_match(self, clean_name: str) -> Optional[str]:
+        best_position = None
+        for length in range(1, min(len(clean_name), self.max_key_length) + 1):
+            position = self.key_order.get(clean_name[:length])
+            if position is not None and (best_position is None or position < best_position):
+                best_position = position
+        return self.keys[best_position] if best_position is not None else None
+
+    def _fuzzy_match(self, clean_name: str) -> Optional[str]:
+        if not self.keys or not clean_name:
+            return None
+
+        query_counts = np.zeros(len(self.alphabet), dtype=np.int32)
+        for char in clean_name:
+            column = self.alphabet.get(char)
+            if column is not None:
+                query_counts[column] += 1
+
+        # quick_ratio() >= ratio(), so keys below the cutoff here can never match
+        shared_chars = np.minimum(self.char_counts, query_counts).sum(axis=1)
+        quick_ratios = 2.0 * shared_chars / (self.key_lengths + len(clean_name))
+        candidate_rows = np.nonzero(quick_ratios >= FUZZY_CUTOFF - 1e-9)[0]
+
+        # Exact difflib scoring on the survivors; ties resolve like get_close_matches (max of (score, key))
+        best = None
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(clean_name)
+        for row in candidate_rows:
+            key = self.keys[row]
+            matcher.set_seq1(key)
+            if matcher.real_quick_ratio() >= FUZZY_CUTOFF and matcher.quick_ratio() >= FUZZY_CUTOFF and matcher.ratio() >= FUZZY_CUTOFF:
+                scored = (matcher.ratio(), key)
+                if best is None or scored > best:
+                    best = scored
+        return best[1] if best else None
+
+    def resolve(self, clean_name: str) -> Optional[str]:
+        """Returns the MET database key for a cleaned name, or None if neither rule matches."""
+        if clean_name in self._resolved:
+            return self._resolved[clean_name]
+
+        key = self._prefix_match(clean_name)
+        if key is None:
+            key = self._fuzzy_match(clean_name)
+
+        with self._lock:
+            self._resolved[clean_name] = key
+        return key
@@ -7,6 +7,8 @@ from typing import Dict, List, Optional
 import re
 import random
 
+from exercise_catalog import CATALOG
+
 
 condition_data = pd.read_excel("Top Lifestyle Disorders and Medical Conditions & ExerciseTags.xlsx")
 condition_data.fillna("", inplace=True)
@@ -49,169 +51,8 @@ MEDICAL_CONDITIONS = [
 # ---------------- EXERCISE DATABASE ----------------
 class ExerciseDatabase:
     def __init__(self):
-        self.exercises = {
-            "supine_dead_bug": {
-                "name": "Supine Dead Bug",
-                "type": "Core Stability",
-                "equipment": ["Mat"],
-                "level": "Beginner",
-                "reps": "10-12 reps/side",
-                "intensity": "RPE 3-4",
-                "rest": "30-45 sec",
-                "benefits": "Improves core control & lumbar stability",
-                "target_areas": ["Core", "Stomach"],
-                "rating": 4.5,
-                "safety": "Keep a neutral spine and avoid excessive lumbar extension. Stop if you feel sharp back pain.",
-                "contraindications": ["acute lower back pain", "recent spinal surgery", "severe disc herniation"],
-                "steps": [
-                    "Lie on your back with knees bent at 90 degrees",
-                    "Extend opposite arm and leg slowly",
-                    "Hold for 2-3 seconds",
-                    "Return to starting position",
-                    "Repeat on other side"
-                ],
-                "demo_video": "Core Exercise_ Dead Bug 1.mp4",
-                "common_mistakes": ["Arching back", "Moving too fast", "Not engaging core"]
-            },
-            "supine_rotator_cuff": {
-                "name": "Supine Rotator Cuff",
-                "type": "Shoulder Stability",
-                "equipment": ["Mat", "Small Cushion"],
-                "level": "Beginner",
-                "reps": "10-12 reps/arm",
-                "intensity": "RPE 3-4",
-                "rest": "30-45 sec",
-                "benefits": "Strengthens rotator cuff & improves posture",
-                "target_areas": ["Arms", "Back"],
-                "rating": 4.2,
-                "safety": "Move slowly and keep range small if you have shoulder pain.",
-                "contraindications": ["acute rotator cuff tear", "recent shoulder surgery", "severe shoulder impingement"],
-                "steps": [
-                    "Lie on your side with arm at 90 degrees",
-                    "Place cushion under head for support",
-                    "Rotate forearm up slowly",
-                    "Hold briefly, then lower",
-                    "Complete all reps before switching sides"
-                ],
-                "demo_video": "4 Supine Rotator Cuff Movements 1.mp4",
-                "common_mistakes": ["Using momentum", "Rotating too far", "Not supporting head"]
-            },
-            "upward_facing_dog": {
-                "name": "Upward Facing Dog",
-                "type": "Spinal Extension",
-                "equipment": ["Mat"],
-                "level": "Intermediate",
-                "reps": "6-8 reps / 15-30 sec holds",
-                "intensity": "RPE 4-6",
-                "rest": "30-60 sec",
-                "benefits": "Opens chest & improves spinal flexibility",
-                "target_areas": ["Back", "Chest"],
-                "rating": 4.7,
-                "safety": "Avoid if you have acute low back pain or recent spinal injury.",
-                "contraindications": ["acute lower back pain", "recent spinal surgery"],
-                "steps": [
-                    "Start in plank position",
-                    "Lower hips while lifting chest",
-                    "Straighten arms and lift thighs off ground",
-                    "Hold for 15-30 seconds",
-                    "Lower back to starting position"
-                ],
-                "demo_video": "How to Do Upward-Facing Dog Pose in Yoga 1.mp4",
-                "common_mistakes": ["Sinking shoulders", "Overarching neck", "Not engaging legs"]
-            },
-            "v_ups": {
-                "name": "V-Ups",
-                "type": "Core Strength",
-                "equipment": ["Mat"],
-                "level": "Intermediate",
-                "reps": "AMRAP or 8-12 reps",
-                "intensity": "RPE 6-7",
-                "rest": "60-90 sec",
-                "benefits": "Builds core strength & coordination",
-                "target_areas": ["Core", "Stomach"],
-                "rating": 4.3,
-                "safety": "Keep neck neutral and avoid jerking.",
-                "contraindications": ["acute lower back pain", "hernia"],
-                "steps": [
-                    "Lie flat with arms overhead",
-                    "Simultaneously lift legs and torso",
-                    "Try to touch toes at the top",
-                    "Lower slowly with control",
-                    "Keep core engaged throughout"
-                ],
-                "demo_video": "v_ups_demo.mp4",
-                "common_mistakes": ["Using momentum", "Not controlling descent", "Straining neck"]
-            },
-            "dirty_dog": {
-                "name": "Dirty Dog",
-                "type": "Glute Strength",
-                "equipment": ["Mat"],
-                "level": "Beginner",
-                "reps": "10-12 reps/side",
-                "intensity": "RPE 4-5",
-                "rest": "45-60 sec",
-                "benefits": "Strengthens glutes & improves hip mobility",
-                "target_areas": ["Glutes", "Legs"],
-                "rating": 4.4,
-                "safety": "Keep core braced and avoid excessive lumbar rotation.",
-                "contraindications": ["acute lower back pain"],
-                "steps": [
-                    "Start on hands and knees",
-                    "Keep knee bent and lift leg to side",
-                    "Lift until thigh is parallel to ground",
-                    "Lower slowly without touching ground",
-                    "Complete all reps before switching"
-                ],
-                "demo_video": "dirty_dog_demo.mp4",
-                "common_mistakes": ["Lifting too high", "Rotating hips", "Not keeping core stable"]
-            },
-            "barbell_squat": {
-                "name": "Barbell Squat",
-                "type": "Compound Strength",
-                "equipment": ["Barbell", "Squat Rack"],
-                "level": "Intermediate",
-                "reps": "8-12 reps",
-                "intensity": "70-75% 1RM",
-                "rest": "90-120 sec",
-                "benefits": "Builds overall leg strength and power",
-                "target_areas": ["Legs", "Glutes", "Core"],
-                "rating": 4.8,
-                "safety": "Use proper set-up and avoid deep squats if you have knee pain.",
-                "contraindications": ["acute knee injury", "recent knee surgery", "severe lower back pain"],
-                "steps": [
-                    "Position bar on upper traps",
-                    "Stand with feet shoulder-width apart",
-                    "Lower by pushing hips back and bending knees",
-                    "Descend until thighs parallel to floor",
-                    "Drive through heels to return to start"
-                ],
-                "demo_video": "barbell_squat_demo.mp4",
-                "common_mistakes": ["Knee valgus", "Forward lean", "Partial range of motion"]
-            },
-            "bench_press": {
-                "name": "Bench Press",
-                "type": "Upper Body Strength",
-                "equipment": ["Barbell", "Bench"],
-                "level": "Intermediate",
-                "reps": "6-10 reps",
-                "intensity": "70-80% 1RM",
-                "rest": "90-180 sec",
-                "benefits": "Develops chest, shoulders, and triceps strength",
-                "target_areas": ["Chest", "Arms", "Shoulders"],
-                "rating": 4.7,
-                "safety": "Use a spotter for heavy loads.",
-                "contraindications": ["acute shoulder injury", "recent shoulder surgery"],
-                "steps": [
-                    "Lie flat on bench with feet planted",
-                    "Grip bar slightly wider than shoulders",
-                    "Lower bar to chest with control",
-                    "Press bar up in straight line",
-                    "Lock out arms at the top"
-                ],
-                "demo_video": "bench_press_demo.mp4",
-                "common_mistakes": ["Bouncing off chest", "Uneven grip", "Arched back"]
-            }
-        }
+        # Curated library, served (and snapshotted) by the shared exercise catalog
+        self.exercises = CATALOG.source_table('curated')
     
     def get_exercises_by_target_area(self, target_areas: List[str], workout_location: str = "Home") -> Dict:
         """Filter exercises by target body areas and location"""
@@ -0,0 +1,92 @@
+"""
+Structured Plan Output
+JSON Schema for the part of a day plan the model writes, the chat-completions `response_format`
+that requests it, and the exercise fields Python fills in afterwards.
+
+Sets, RPE and rest are per-user targets the prompt would otherwise ask the model to copy back,
+and est_calories is always recomputed from the MET table, so in structured mode none of them
+are generated: fewer output tokens, and no malformed copies to retry on.
+"""
+
+import copy
+from typing import Dict, Optional
+
+OUTPUT_MODES = ("off", "json_object", "json_schema") # Free text, JSON mode, schema-constrained
+PYTHON_OWNED_FIELDS = ("sets", "intensity_rpe", "rest", "est_calories") # Per exercise, filled by fill_python_owned()
+SCHEMA_NAME = "workout_day_plan"
+DUMMY_CALORIES = "Est: 0 Cal (MET: 0.0)" # Placeholder until the markdown conversion computes the real value
+
+PLAN_FIELDS = ("day_name", "warmup_duration", "main_workout_category", "cooldown_duration")
+EXERCISE_FIELDS = {
+    "warmup": ("name", "benefit", "steps", "reps", "equipment", "safety_cue"),
+    "main_workout": ("name", "benefit", "steps", "reps", "equipment", "safety_cue"),
+    "cooldown": ("name", "benefit", "steps", "hold", "equipment", "safety_cue"),
+}
+_STRING_LISTS = ("steps", "safety_notes")
+
+
+def _property(field: str) -> Dict:
+    if field in _STRING_LISTS:
+        return {"type": "array", "items": {"type": "string"}}
+    return {"type": "string"}
+
+
+def _object(fields, extra: Optional[Dict] = None) -> Dict:
+    properties = {field: _property(field) for field in fields}
+    properties.update(extra or {})
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+
+def plan_json_schema() -> Dict:
+    """Strict schema of the model-owned plan: every property required, nothing else allowed."""
+    sections = {section: {"type": "array", "items": _object(fields)} for section, fields in EXERCISE_FIELDS.items()}
+    return _object(PLAN_FIELDS, {**sections, "safety_notes": _property("safety_notes")})
+
+
+PLAN_JSON_SCHEMA = plan_json_schema()
+
+
+def response_format(mode: str) -> Optional[Dict]:
+    """The `response_format` request field for an OUTPUT_MODES entry (None for free text)."""
+    if mode == "json_schema":
+        return {"type": "json_schema", "json_schema": {"name": SCHEMA_NAME, "schema": PLAN_JSON_SCHEMA, "strict": True}}
+    if mode == "json_object":
+        return {"type": "json_object"}
+    if mode == "off":
+        return None
+    raise ValueError(f"Unknown structured output mode {mode!r} (expected one of {', '.join(OUTPUT_MODES)})")
+
+
+def without_python_owned(schema_example: Dict) -> Dict:
+    """Copy of a prompt schema example with PYTHON_OWNED_FIELDS removed from every exercise."""
+    example = copy.deepcopy(schema_example)
+    for section in EXERCISE_FIELDS:
+        for exercise in example.get(section, []):
+            for field in PYTHON_OWNED_FIELDS:
+                exercise.pop(field, None)
+    return example
+
+
+def section_targets(main_sets: str, main_rpe: str, main_rest: str) -> Dict[str, Dict[str, str]]:
+    """Python-owned values per section: the day's main-workout targets, fixed light values otherwise."""
+    light = {"sets": "1", "intensity_rpe": "RPE 1-3", "rest": "15 seconds", "est_calories": DUMMY_CALORIES}
+    return {
+        "warmup": light,
+        "main_workout": {"sets": main_sets, "intensity_rpe": f"RPE {main_rpe}", "rest": main_rest, "est_calories": DUMMY_CALORIES},
+        "cooldown": light,
+    }
+
+
+def fill_python_owned(exercise: Dict, section: str, targets: Dict[str, Dict[str, str]]) -> Dict:
+    """Sets the Python-owned fields of one exercise in place (overriding anything the model sent)."""
+    exercise.update(targets.get(section, {}))
+    return exercise
+
+
+def fill_plan(plan_json: Dict, targets: Dict[str, Dict[str, str]]) -> Dict:
+    """fill_python_owned() for every exercise of a plan, in place."""
+    for section in EXERCISE_FIELDS:
+        for exercise in plan_json.get(section, []) or []:
+            if isinstance(exercise, dict):
+                fill_python_owned(exercise, section, targets)
+    return plan_json
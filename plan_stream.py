@@ -0,0 +1,216 @@
+"""
+Streaming Plan Parser
+Consumes a chat-completions SSE stream and parses the JSON workout plan incrementally,
+emitting every exercise object in "warmup", "main_workout" and "cooldown" as soon as its
+closing brace arrives, so the UI can render the warm-up while the rest is still generating.
+
+extract_json_object() recovers the plan object from a finished completion in one pass,
+repairing the usual LLM damage (trailing commas, output cut off at max_tokens).
+"""
+
+import json
+import re
+from collections import deque
+from typing import Dict, Iterator, List, Tuple
+
+STREAMED_SECTIONS = ("warmup", "main_workout", "cooldown")
+REPAIR_ATTEMPTS = 3 # Cut points tried (latest first) when closing a truncated object
+REPAIR_MAX_DEPTH = 2 # Cut only between members of the top-level object or of its arrays (whole exercises)
+
+_DECODER = json.JSONDecoder()
+_JSON_FENCE_RE = re.compile(r"```json", re.IGNORECASE)
+# Structural tokens of a JSON text: a string (group 1 is its closing quote, absent if the text ends
+# inside it) or a bracket/comma. Numbers, literals and whitespace are skipped at C speed.
+_JSON_TOKEN_RE = re.compile(r'"(?:[^"\\]|\\.)*(?:(")|\\?\Z)|[{}\[\],]', re.DOTALL)
+
+
+def iter_sse_content(response) -> Iterator[str]:
+    """Yields the text deltas of a streaming chat-completions response ('data: {...}' lines)."""
+    # SSE is always UTF-8; without a charset requests would decode text/event-stream as ISO-8859-1
+    response.encoding = "utf-8"
+
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue # Blank separators, comments and event/id fields
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+
+        try:
+            chunk = json.loads(data)
+        except json.JSONDecodeError:
+            continue
+
+        choices = chunk.get("choices") or []
+        if choices:
+            content = (choices[0].get("delta") or {}).get("content")
+            if content:
+                yield content
+
+
+class IncrementalPlanParser:
+    """
+    Single-pass scanner over the streamed plan text. Tracks string/escape state and the
+    container stack, so it never re-scans text it has already seen, and json-decodes each
+    exercise object exactly once when it closes. Text before the first '{' (e.g. a ```json
+    fence) is ignored.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._stack = [] # Open containers: '{' or '['
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_top_level_string = None # The key preceding a top-level value
+        self._array_key = None # Section whose array is currently open
+        self._object_start = None
+        self._counts = {section: 0 for section in STREAMED_SECTIONS}
+
+    def feed(self, chunk: str) -> List[Tuple[str, int, Dict]]:
+        """Adds a text delta and returns the newly completed (section, index, exercise) items."""
+        self.text += chunk
+        completed = []
+        text = self.text
+
+        for i in range(self._pos, len(text)):
+            char = text[i]
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_top_level_string = text[self._string_start + 1:i]
+                continue
+
+            if not self._stack and char != "{":
+                continue # Preamble before the plan object
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char == "{":
+                if self._array_key and self._stack == ["{", "["]:
+                    self._object_start = i
+                self._stack.append("{")
+            elif char == "[":
+                if self._stack == ["{"] and self._last_top_level_string in STREAMED_SECTIONS:
+                    self._array_key = self._last_top_level_string
+                self._stack.append("[")
+            elif char in "}]" and self._stack:
+                self._stack.pop()
+                if char == "}" and self._object_start is not None and self._stack == ["{", "["]:
+                    item = self._decode(text[self._object_start:i + 1])
+                    self._object_start = None
+                    if item is not None:
+                        completed.append((self._array_key, self._counts[self._array_key], item))
+                        self._counts[self._array_key] += 1
+                elif char == "]" and self._stack == ["{"]:
+                    self._array_key = None
+
+        self._pos = len(text)
+        return completed
+
+    @staticmethod
+    def _decode(fragment: str):
+        try:
+            item = json.loads(fragment)
+        except json.JSONDecodeError:
+            return None
+        return item if isinstance(item, dict) else None
+
+
+def extract_json_object(text: str, max_repair_depth: int = REPAIR_MAX_DEPTH) -> Tuple[Dict, bool]:
+    """
+    The outermost JSON object of an LLM completion (inside a ```json fence if there is one,
+    otherwise from the first '{'); text after it is ignored. Returns (object, repaired).
+    Well-formed objects are read by the C decoder directly; only when that fails does a single
+    brace-balancing pass over the structural tokens locate and repair the object.
+
+    Repairs: trailing commas before a closing bracket are dropped, and an object cut off mid-way
+    (max_tokens) is cut back to the last complete member at depth <= max_repair_depth and its
+    open brackets are closed, so a partial last exercise is discarded rather than half-kept.
+    Raises ValueError (json.JSONDecodeError for malformed complete objects) if nothing parses.
+    """
+    fence = _JSON_FENCE_RE.search(text)
+    start = text.find("{", fence.end()) if fence else -1
+    if start < 0:
+        start = text.find("{")
+    if start < 0:
+        raise ValueError("No JSON object found in the API response.")
+
+    # Well-formed responses: the C decoder reads exactly one object and ignores the text after it
+    try:
+        item, _ = _DECODER.raw_decode(text, start)
+        if isinstance(item, dict):
+            return item, False
+    except json.JSONDecodeError:
+        pass
+
+    stack = []
+    cut_points = deque(maxlen=REPAIR_ATTEMPTS) # (end of the kept text, closing brackets it needs)
+    trailing_commas = []
+    last_comma = -1
+    end = None
+
+    for match in _JSON_TOKEN_RE.finditer(text, start):
+        token = match.group()
+        if token[0] == '"':
+            if match.group(1) is None:
+                break # Cut off inside a string
+            continue
+        if token in "{[":
+            stack.append(token)
+        elif token in "}]":
+            if last_comma >= 0 and not text[last_comma + 1:match.start()].strip():
+                trailing_commas.append(last_comma)
+            stack.pop()
+            if not stack:
+                end = match.end()
+                break
+            if len(stack) <= max_repair_depth:
+                cut_points.append((match.end(), _closing_brackets(stack)))
+        else: # ','
+            last_comma = match.start()
+            if len(stack) <= max_repair_depth:
+                cut_points.append((match.start(), _closing_brackets(stack)))
+
+    if end is not None:
+        item = json.loads(_without_positions(text, start, end, trailing_commas))
+        repaired = bool(trailing_commas)
+    else:
+        item = None
+        for cut, closing in reversed(cut_points):
+            try:
+                item = json.loads(_without_positions(text, start, cut, trailing_commas) + closing)
+                break
+            except json.JSONDecodeError:
+                continue
+        if item is None:
+            raise ValueError("The API response was truncated and its JSON object could not be repaired.")
+        repaired = True
+
+    if not isinstance(item, dict):
+        raise ValueError("The API response does not contain a JSON object.")
+    return item, repaired
+
+
+def _closing_brackets(stack: List[str]) -> str:
+    return "".join("}" if opener == "{" else "]" for opener in reversed(stack))
+
+
+def _without_positions(text: str, start: int, end: int, positions: List[int]) -> str:
+    """text[start:end] minus the characters at `positions` (sorted ascending)."""
+    parts = []
+    for position in positions:
+        if position >= end:
+            break
+        parts.append(text[start:position])
+        start = position + 1
+    parts.append(text[start:end])
+    return "".join(parts)
@@ -0,0 +1,110 @@
+"""
+Exercise Prescription Parser
+Single-pass tokenizer that turns the free-text sets/reps/hold strings produced by the LLM
+("10-12 reps/side", "30-45 seconds (or max hold)", "2 minutes") into a typed record.
+Results are memoized, so re-rendering the same plan never re-parses a string.
+"""
+
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+DEFAULT_REPS_PER_SET = 10
+
+# One alternation, scanned once left to right. Ranges are tried before single numbers.
+_TOKEN_RE = re.compile(
+    r"""
+      (?P<range>(?P<low>\d+(?:\.\d+)?)\s*(?:-|–|to)\s*(?P<high>\d+(?:\.\d+)?))
+    | (?P<number>\d+(?:\.\d+)?)
+    | (?P<minutes>\bmin(?:ute)?s?\b(?!\.?\s*equiv))
+    | (?P<seconds>\bsec(?:ond)?s?\b|(?<=\d)s\b)
+    | (?P<hold>hold)
+    | (?P<reps>\b(?:reps?|repetitions?)\b)
+    | (?P<side>side|each)
+    """,
+    re.IGNORECASE | re.VERBOSE
+)
+
+
+class Prescription(NamedTuple):
+    sets: int
+    low: Optional[float] # None when the text carries no number (e.g. "max hold")
+    high: Optional[float]
+    unit: str # "reps" or "seconds" (minutes are converted to seconds)
+    per_side: bool
+    timed: bool # Time-based: a time unit after the quantity, or a hold with no number at all ("max hold", 0 s)
+
+    @property
+    def average(self) -> Optional[float]:
+        if self.low is None:
+            return None
+        return (self.low + self.high) / 2.0
+
+    @property
+    def is_range(self) -> bool:
+        return self.low is not None and self.low != self.high
+
+    @property
+    def seconds_per_set(self) -> float:
+        """Average duration of one set in seconds (0.0 if the prescription is not time-based)."""
+        if self.unit != "seconds" or self.low is None:
+            return 0.0
+        return self.average
+
+    def reps_per_set(self, default: float = DEFAULT_REPS_PER_SET) -> float:
+        """Average reps in one set, doubled for unilateral work (both sides are performed)."""
+        reps = self.average if self.low is not None else default
+        return reps * 2 if self.per_side else reps
+
+
+def _parse_sets(sets_text: str) -> int:
+    """'2-3' -> 3 (plan for the upper bound), '3' -> 3, anything unparsable -> 1."""
+    match = _TOKEN_RE.search(sets_text)
+    while match and not (match.group('range') or match.group('number')):
+        match = _TOKEN_RE.search(sets_text, match.end())
+    if not match:
+        return 1
+    value = match.group('high') if match.group('range') else match.group('number')
+    return max(1, int(float(value)))
+
+
+@lru_cache(maxsize=4096)
+def _parse(text: str, sets_text: str) -> Prescription:
+    low = high = None
+    unit = "reps"
+    per_side = False
+    names_time = False # "hold"/"minutes"/"seconds" anywhere in the text
+    unit_pending = False # The unit is the token right after the first quantity
+
+    for match in _TOKEN_RE.finditer(text):
+        kind = match.lastgroup # Outer group name ("range" for a range match)
+
+        if kind == 'side':
+            per_side = True
+            continue
+        if kind in ('minutes', 'seconds', 'hold'):
+            names_time = True
+
+        if low is None and kind in ('range', 'number'):
+            if kind == 'range':
+                low, high = float(match.group('low')), float(match.group('high'))
+            else:
+                low = high = float(match.group('number'))
+            unit_pending = True
+            continue
+
+        if unit_pending:
+            unit_pending = False
+            if kind == 'minutes':
+                unit = "seconds"
+                low, high = low * 60.0, high * 60.0
+            elif kind == 'seconds':
+                unit = "seconds"
+
+    timed = unit == "seconds" or (low is None and names_time)
+    return Prescription(_parse_sets(sets_text), low, high, unit, per_side, timed)
+
+
+def parse_prescription(text, sets="1") -> Prescription:
+    """Parses a reps/hold string (and optionally the sets string) into a Prescription."""
+    return _parse(str(text or "").strip().lower(), str(sets or "1").strip())
@@ -0,0 +1,201 @@
+"""
+Prompt Token Budget
+Measures a PromptTemplate render per section and keeps it under a token budget by compressing
+the list-valued fields (e.g. the exercise-avoidance names, which grow with every earlier day).
+
+Token counts come from estimate_tokens(), a local approximation of a BPE tokenizer (no model
+files or network needed); pass a real tokenizer's length function as `count_tokens` for exact
+numbers. Section counts are memoized, so static sections (and dynamic ones that repeat
+across a week's days) are only measured once.
+
+Trimming, applied only while the prompt is over budget:
+  1. near-duplicate names are collapsed ('Push-ups', 'Push Ups (Standard)' -> one entry)
+  2. the oldest names are dropped, always keeping the `min_items` most recent ones
+"""
+
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from prompt_template import PromptTemplate
+
+DEFAULT_TOKEN_BUDGET = 3200 # Whole user prompt: ~2900 on day 1, ~110 more per earlier day of avoidance names
+MIN_KEPT_ITEMS = 12 # Most recent list entries that are never trimmed (about the previous day's plan)
+TOKEN_MEMO_MAX_ENTRIES = 256 # Memoized section token counts
+
+logger = logging.getLogger(__name__)
+
+# One match per estimated token: up to 5 letters, up to 3 digits, a punctuation mark, or a line break
+# (with the indentation after it); other whitespace is free
+_TOKEN_RE = re.compile(r"[A-Za-z]{1,5}|\d{1,3}|[^\sA-Za-z\d]|\n\s*")
+_VARIANT_SUFFIX_RE = re.compile(r"\s*\([^)]*\)\s*$")
+_NAME_NOISE_RE = re.compile(r"[^a-z0-9]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate BPE token count: a letter run costs one token per 5 letters, digits group in
+    threes, each punctuation mark is one token, spaces are free and a line break (with the
+    indentation after it) is one token.
+    """
+    return len(_TOKEN_RE.findall(text))
+
+
+def name_variant_key(name: str) -> str:
+    """'Wall Push-ups (Standard)' -> 'wall push ups' (names that only differ in these ways count as one)."""
+    return _NAME_NOISE_RE.sub(" ", _VARIANT_SUFFIX_RE.sub("", name).lower()).strip()
+
+
+class TrimmableList:
+    """A list-valued prompt field: joined with `separator`, or `empty` when nothing is left."""
+    __slots__ = ("items", "empty", "separator")
+
+    def __init__(self, items: Sequence[str], empty: str = "None", separator: str = ", "):
+        self.items = list(items)
+        self.empty = empty
+        self.separator = separator
+
+    def render(self) -> str:
+        return self.separator.join(self.items) if self.items else self.empty
+
+    def __str__(self) -> str:
+        return self.render()
+
+
+class ListLabel:
+    """
+    Prompt text that describes a TrimmableList field (e.g. its scope in a heading): `full` while the
+    list is complete, `truncated` once PromptBudget.render() has dropped its oldest entries.
+    """
+    __slots__ = ("field", "full", "truncated", "is_truncated")
+
+    def __init__(self, field: str, full: str, truncated: str, is_truncated: bool = False):
+        self.field = field
+        self.full = full
+        self.truncated = truncated
+        self.is_truncated = is_truncated
+
+    def render(self) -> str:
+        return self.truncated if self.is_truncated else self.full
+
+    def __str__(self) -> str:
+        return self.render()
+
+
+class PromptReport:
+    """Per-section token counts of one render, before and after trimming."""
+    __slots__ = ("sections", "total", "untrimmed_total", "budget", "dropped")
+
+    def __init__(self, sections: List[Tuple[str, int]], untrimmed_total: int, budget: int, dropped: Dict[str, int]):
+        self.sections = sections
+        self.total = sum(tokens for _, tokens in sections)
+        self.untrimmed_total = untrimmed_total
+        self.budget = budget
+        self.dropped = dropped
+
+    @property
+    def saved(self) -> int:
+        return self.untrimmed_total - self.total
+
+    @property
+    def over_budget(self) -> bool:
+        return self.total > self.budget
+
+    def summary(self) -> str:
+        sections = " ".join(f"{name}={tokens}" for name, tokens in self.sections)
+        dropped = ", ".join(f"{field}: -{count}" for field, count in self.dropped.items() if count) or "none"
+        return f"{self.total}/{self.budget} tokens (saved {self.saved}; trimmed {dropped}) | {sections}"
+
+
+class PromptBudget:
+    """Token budget for PromptTemplate renders; thread-safe (the token-count memo is the only state)."""
+
+    def __init__(self, max_tokens: int = DEFAULT_TOKEN_BUDGET, min_items: int = MIN_KEPT_ITEMS,
+                 count_tokens: Callable[[str], int] = estimate_tokens):
+        self.max_tokens = max_tokens
+        self.min_items = min_items
+        self.count_tokens = count_tokens
+        # Section text -> tokens: static sections, and dynamic ones that repeat across a week's days
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _tokens(self, text: str) -> int:
+        with self._lock:
+            tokens = self._counts.get(text)
+            if tokens is not None:
+                self._counts.move_to_end(text)
+                return tokens
+        tokens = self.count_tokens(text)
+        with self._lock:
+            self._counts[text] = tokens
+            while len(self._counts) > TOKEN_MEMO_MAX_ENTRIES:
+                self._counts.popitem(last=False)
+        return tokens
+
+    def _measure(self, template: PromptTemplate, values: Dict[str, object]) -> List[Tuple[str, str, int]]:
+        """(section name, text, tokens) in prompt order, separators counted with the section they follow."""
+        separator_tokens = self._tokens(template.separator)
+        sections = template.render_sections(**values)
+        return [
+            (name, text, self._tokens(text) + (separator_tokens if position < len(sections) - 1 else 0))
+            for position, (name, text) in enumerate(sections)
+        ]
+
+    def render(self, template: PromptTemplate, values: Dict[str, object]) -> Tuple[str, PromptReport]:
+        """
+        The prompt, with TrimmableList fields compressed as needed to fit the budget (the values
+        are not modified), plus its report. ListLabel fields switch to their `truncated` text when
+        their list lost its oldest entries. A prompt that still does not fit after trimming is
+        returned as is and logged as a warning.
+        """
+        measured = self._measure(template, values)
+        untrimmed_total = sum(tokens for _, _, tokens in measured)
+        lists = {field: value for field, value in values.items() if isinstance(value, TrimmableList)}
+        labels = {field: value for field, value in values.items() if isinstance(value, ListLabel)}
+        dropped = {field: 0 for field in lists}
+
+        excess = untrimmed_total - self.max_tokens
+        if excess > 0 and lists:
+            values = dict(values)
+            truncated = set()
+            for field, trimmable in lists.items():
+                if excess <= 0:
+                    break
+                # Dropping the oldest entries also switches this list's labels, which may cost a few tokens
+                label_cost = sum(max(0, self._tokens(label.truncated) - self._tokens(label.full))
+                                 for label in labels.values() if label.field == field)
+                items, excess, dropped_oldest = self._compress(trimmable.items, excess + label_cost, self._tokens(trimmable.separator))
+                dropped[field] = len(trimmable.items) - len(items)
+                values[field] = TrimmableList(items, trimmable.empty, trimmable.separator)
+                if dropped_oldest:
+                    truncated.add(field)
+                else:
+                    excess -= label_cost
+            for name, label in labels.items():
+                if label.field in truncated:
+                    values[name] = ListLabel(label.field, label.full, label.truncated, is_truncated=True)
+            measured = self._measure(template, values)
+
+        report = PromptReport([(name, tokens) for name, _, tokens in measured], untrimmed_total, self.max_tokens, dropped)
+        if report.over_budget:
+            logger.warning("Prompt over token budget: %s", report.summary())
+        else:
+            logger.debug("Prompt size: %s", report.summary())
+        return template.separator.join(text for _, text, _ in measured), report
+
+    def _compress(self, items: List[str], excess: int, separator_cost: int) -> Tuple[List[str], int, int]:
+        """Collapses name variants (keeping the latest spelling), then drops the oldest entries (returns how many)."""
+        latest_by_key = {}
+        for position, item in enumerate(items):
+            latest_by_key[name_variant_key(item)] = position
+        kept_positions = set(latest_by_key.values())
+        kept = [item for position, item in enumerate(items) if position in kept_positions]
+        excess -= sum(self.count_tokens(item) + separator_cost for position, item in enumerate(items) if position not in kept_positions)
+
+        drop = 0
+        while excess > 0 and len(kept) - drop > self.min_items:
+            excess -= self.count_tokens(kept[drop]) + separator_cost
+            drop += 1
+        return kept[drop:], excess, drop
@@ -0,0 +1,160 @@
+"""
+Prompt Token Budget Report
+Builds test26.py's system prompt for every day of every profile in a corpus, once untrimmed and
+once through the PromptBudget, and reports estimated tokens per prompt section and the savings.
+
+Earlier days are simulated with exercise names drawn (seeded per profile) from the exercise CSV,
+so the avoidance lists grow the way they do in a real week. The corpus is either a profiles JSONL
+(batch_generate.py's input format) or a built-in grid of levels x goals x 1-7 training days.
+
+Usage:
+    python prompt_budget_report.py
+    python prompt_budget_report.py --profiles profiles.jsonl --budget 2000 --json report.json
+"""
+
+import argparse
+import itertools
+import json
+import random
+from typing import Dict, List
+
+import numpy as np
+
+from cli_logging import quiet_streamlit_context_warnings
+quiet_streamlit_context_warnings() # Before the app imports below, which already call st.*
+
+import test26 as app
+from exercise_catalog import CATALOG
+from prompt_budget import PromptBudget
+
+WEEK_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+WARMUP_COOLDOWN_COUNT = 3 # Per section, as the prompt mandates
+
+BASE_PROFILE = {
+    "name": "Report", "age": 45, "gender": "Female", "weight_kg": 74.0, "height_cm": 166.0, "bmi": 26.9,
+    "secondary_goal": "None", "target_body_parts": ["Full Body"], "medical_conditions": ["None"],
+    "physical_limitation": "", "specific_avoidance": "None", "session_duration": "30-45 minutes",
+    "available_equipment": ["Dumbbells", "Resistance Bands"], "unit_system": "Metric", "workout_location": "Home"
+}
+
+
+def default_corpus() -> List[Dict]:
+    """Every fitness level x primary goal x 1-7 training days."""
+    return [
+        {**BASE_PROFILE, "fitness_level": level, "primary_goal": goal, "days_per_week": WEEK_DAYS[:day_count]}
+        for level, goal, day_count in itertools.product(app.TRAINING_LEVELS, app.PRIMARY_GOALS, range(1, 8))
+    ]
+
+
+def load_corpus(path: str) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        return [{**BASE_PROFILE, **json.loads(line)} for line in f if line.strip()]
+
+
+def simulated_day(rng: random.Random, names: List[str], main_count: int) -> Dict:
+    """A successful generate_workout_plan result with random (distinct) exercise names."""
+    picked = rng.sample(names, 2 * WARMUP_COOLDOWN_COUNT + main_count)
+    sections = {
+        "warmup": picked[:WARMUP_COOLDOWN_COUNT],
+        "cooldown": picked[WARMUP_COOLDOWN_COUNT:2 * WARMUP_COOLDOWN_COUNT],
+        "main_workout": picked[2 * WARMUP_COOLDOWN_COUNT:]
+    }
+    return {"success": True, "plan_json": {section: [{"name": name} for name in items] for section, items in sections.items()}}
+
+
+def measure_corpus(advisor, profiles: List[Dict], budget: PromptBudget, seed: int) -> List[Dict]:
+    """One record per (profile, day): day position, untrimmed and trimmed section tokens, trimmed counts."""
+    names = sorted({entry.name for entry in CATALOG.entries("csv") if entry.name})
+    unlimited = PromptBudget(max_tokens=10 ** 9, count_tokens=budget.count_tokens)
+    records = []
+    for profile_number, profile in enumerate(profiles):
+        rng = random.Random(seed + profile_number)
+        days = profile.get("days_per_week", [])
+        main_count = int(advisor._determine_exercise_count(profile.get("session_duration", "30-45 minutes"), profile.get("fitness_level", "Beginner (0–6 months)")))
+        avoidance = advisor.new_avoidance_index()
+        for day_index, day in enumerate(days):
+            values = advisor._prompt_values(profile, day, day_index, avoidance)
+            _, full = unlimited.render(advisor.prompt_template, values)
+            _, fitted = budget.render(advisor.prompt_template, values)
+            records.append({
+                "day_number": day_index + 1,
+                "untrimmed": dict(full.sections),
+                "trimmed": dict(fitted.sections),
+                "dropped": fitted.dropped,
+                "over_budget": fitted.over_budget
+            })
+            avoidance.add_day(day, simulated_day(rng, names, main_count))
+    return records
+
+
+def summarize(records: List[Dict]) -> Dict:
+    sections = list(records[0]["untrimmed"]) if records else []
+    untrimmed = np.array([sum(r["untrimmed"].values()) for r in records])
+    trimmed = np.array([sum(r["trimmed"].values()) for r in records])
+    by_day = {}
+    for day_number in sorted({r["day_number"] for r in records}):
+        day_records = [r for r in records if r["day_number"] == day_number]
+        by_day[day_number] = {
+            "prompts": len(day_records),
+            "untrimmed_mean": round(float(np.mean([sum(r["untrimmed"].values()) for r in day_records])), 1),
+            "trimmed_mean": round(float(np.mean([sum(r["trimmed"].values()) for r in day_records])), 1),
+            "names_dropped_mean": round(float(np.mean([sum(r["dropped"].values()) for r in day_records])), 1)
+        }
+    return {
+        "prompts": len(records),
+        "sections": {
+            name: {
+                "untrimmed_mean": round(float(np.mean([r["untrimmed"][name] for r in records])), 1),
+                "trimmed_mean": round(float(np.mean([r["trimmed"][name] for r in records])), 1),
+                "untrimmed_max": int(max(r["untrimmed"][name] for r in records))
+            }
+            for name in sections
+        },
+        "total": {
+            "untrimmed": int(untrimmed.sum()),
+            "trimmed": int(trimmed.sum()),
+            "saved_pct": round(float(100.0 * (1 - trimmed.sum() / untrimmed.sum())), 2) if len(records) else 0.0,
+            "trimmed_prompts": int(sum(1 for r in records if any(r["dropped"].values()))),
+            "still_over_budget": int(sum(1 for r in records if r["over_budget"]))
+        },
+        "by_day": by_day
+    }
+
+
+def print_report(summary: Dict, budget: int):
+    print(f"\nPrompt tokens per section ({summary['prompts']} prompts, budget {budget}, estimated tokens)")
+    print(f"  {'section':<16}{'untrimmed':>12}{'trimmed':>10}{'max':>8}")
+    for name, stats in summary["sections"].items():
+        print(f"  {name:<16}{stats['untrimmed_mean']:>12.1f}{stats['trimmed_mean']:>10.1f}{stats['untrimmed_max']:>8}")
+
+    print("\nBy training day")
+    print(f"  {'day':<6}{'prompts':>8}{'untrimmed':>12}{'trimmed':>10}{'names cut':>11}")
+    for day_number, stats in summary["by_day"].items():
+        print(f"  {day_number:<6}{stats['prompts']:>8}{stats['untrimmed_mean']:>12.1f}{stats['trimmed_mean']:>10.1f}{stats['names_dropped_mean']:>11.1f}")
+
+    total = summary["total"]
+    print(f"\nTotal: {total['untrimmed']} -> {total['trimmed']} tokens ({total['saved_pct']:.2f}% saved); "
+          f"{total['trimmed_prompts']} prompts trimmed, {total['still_over_budget']} still over budget")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report prompt token usage per section and the savings of the token budget.")
+    parser.add_argument("--profiles", help="Profiles JSONL (default: built-in level x goal x days grid)")
+    parser.add_argument("--budget", type=int, default=app.PROMPT_TOKEN_BUDGET, help="Token budget per prompt")
+    parser.add_argument("--seed", type=int, default=7, help="Seed for the simulated earlier days")
+    parser.add_argument("--json", metavar="PATH", help="Also write the summary as JSON")
+    args = parser.parse_args()
+
+    profiles = load_corpus(args.profiles) if args.profiles else default_corpus()
+    advisor = app.FitnessAdvisor("report-key", app.ENDPOINT_URL)
+    summary = summarize(measure_corpus(advisor, profiles, PromptBudget(args.budget), args.seed))
+    print_report(summary, args.budget)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nSummary written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Compiled Prompt Template
+A prompt as an ordered list of named sections. Static sections are plain text, joined once at
+compile time; dynamic sections are str.format-style templates ('{field}') parsed once into
+literal chunks and field names, so rendering is a single "".join over precomputed pieces.
+
+Static sections placed first form `static_prefix`, which is byte-identical on every render:
+providers that cache prompt prefixes reuse it across days and users.
+"""
+
+import string
+from typing import Dict, List, Optional, Sequence, Tuple
+
+SECTION_SEPARATOR = "\n\n" # Blank line between sections
+
+
+class PromptSection:
+    """One named block of the prompt: literal chunks interleaved with field names (None = no field)."""
+    __slots__ = ("name", "chunks", "fields")
+
+    def __init__(self, name: str, chunks: Sequence[Tuple[str, Optional[str]]]):
+        self.name = name
+        self.chunks = tuple(chunks)
+        self.fields = tuple(field for _, field in self.chunks if field is not None)
+
+    @classmethod
+    def static(cls, name: str, text: str) -> "PromptSection":
+        """Fixed text, used verbatim (braces need no escaping)."""
+        return cls(name, [(text, None)])
+
+    @classmethod
+    def template(cls, name: str, text: str) -> "PromptSection":
+        """'{field}' slots filled at render time ('{{' and '}}' are literal braces)."""
+        chunks = []
+        for literal, field, format_spec, conversion in string.Formatter().parse(text):
+            if field is not None and (not field or format_spec or conversion):
+                raise ValueError(f"Prompt section {name!r}: only plain named fields are supported, got {{{field}}}")
+            chunks.append((literal, field))
+        return cls(name, chunks)
+
+    @property
+    def is_static(self) -> bool:
+        return not self.fields
+
+    def render(self, values: Dict[str, object]) -> str:
+        if self.is_static:
+            return self.chunks[0][0]
+        parts = []
+        for literal, field in self.chunks:
+            parts.append(literal)
+            if field is not None:
+                parts.append(str(values[field]))
+        return "".join(parts)
+
+
+class PromptTemplate:
+    """Sections compiled once; render(**values) fills the dynamic ones and joins everything."""
+
+    def __init__(self, sections: Sequence[PromptSection], separator: str = SECTION_SEPARATOR):
+        self.sections = tuple(sections)
+        self.separator = separator
+        self.fields = frozenset(field for section in self.sections for field in section.fields)
+
+        # Leading static sections are joined into the prefix; the rest stay per-section
+        prefix_length = 0
+        while prefix_length < len(self.sections) and self.sections[prefix_length].is_static:
+            prefix_length += 1
+        self._prefix_sections = self.sections[:prefix_length]
+        self._tail_sections = self.sections[prefix_length:]
+        self.static_prefix = separator.join(section.render({}) for section in self._prefix_sections)
+
+    def render_sections(self, **values) -> List[Tuple[str, str]]:
+        """(section name, rendered text) in prompt order."""
+        missing = self.fields.difference(values)
+        if missing:
+            raise KeyError(f"Missing prompt fields: {', '.join(sorted(missing))}")
+        return [(section.name, section.render(values)) for section in self.sections]
+
+    def render(self, **values) -> str:
+        missing = self.fields.difference(values)
+        if missing:
+            raise KeyError(f"Missing prompt fields: {', '.join(sorted(missing))}")
+        tail = [section.render(values) for section in self._tail_sections]
+        if not self._prefix_sections:
+            return self.separator.join(tail)
+        return self.separator.join([self.static_prefix] + tail)
@@ -0,0 +1,105 @@
+"""
+Streaming Replay Check
+Replays a recorded chat-completions SSE stream (default: fixtures/plan_stream.sse, whose chunk
+boundaries split JSON strings and escape sequences) through the stub and test26.py's streaming
+path, and checks that:
+  - every exercise arrives through on_exercise, in plan order, exactly as in the final plan
+  - the streamed plan equals the non-streamed parse of the same completion
+  - IncrementalPlanParser gives the same result when fed one character at a time
+Exits with status 1 on any mismatch.
+
+Usage:
+    python stream_replay_check.py
+    python stream_replay_check.py --sse my_capture.sse
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List, Tuple
+
+from cli_logging import quiet_streamlit_context_warnings
+quiet_streamlit_context_warnings() # Before the app imports below, which already call st.*
+
+import fake_llm_server
+import test26 as app
+from plan_stream import STREAMED_SECTIONS, IncrementalPlanParser, extract_json_object
+
+DEFAULT_SSE_PATH = os.path.join("fixtures", "plan_stream.sse")
+
+
+def recorded_deltas(raw: str) -> List[str]:
+    """The content deltas of a recorded stream, in order (same rules as plan_stream.iter_sse_content)."""
+    deltas = []
+    for event in fake_llm_server.split_recorded_sse(raw):
+        for line in event.splitlines():
+            data = line[len("data:"):].strip() if line.startswith("data:") else None
+            if not data or data == "[DONE]":
+                continue
+            choices = json.loads(data).get("choices") or []
+            content = (choices[0].get("delta") or {}).get("content") if choices else None
+            if content:
+                deltas.append(content)
+    return deltas
+
+
+def expected_order(plan: Dict) -> List[Tuple[str, int]]:
+    return [(section, index) for section in STREAMED_SECTIONS for index in range(len(plan.get(section, [])))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded SSE stream through the streaming plan parser.")
+    parser.add_argument("--sse", default=DEFAULT_SSE_PATH, help="Recorded SSE capture")
+    args = parser.parse_args()
+
+    with open(args.sse, encoding="utf-8", newline="") as f:
+        raw = f.read()
+    deltas = recorded_deltas(raw)
+    completion = "".join(deltas)
+    plan, _ = extract_json_object(completion)
+    split_escapes = sum(1 for delta in deltas if delta.endswith("\\"))
+    print(f"{args.sse}: {len(deltas)} deltas, {split_escapes} cut inside an escape sequence")
+
+    # The stub replays the capture verbatim when streaming and answers with the same plan otherwise
+    server = fake_llm_server.start_server(plan=plan, recorded_sse=raw)
+    advisor = app.FitnessAdvisor("replay-key", fake_llm_server.endpoint_url(server))
+    payload = {"model": "mistral-small", "messages": [{"role": "user", "content": "replay"}], "temperature": 0.8, "max_tokens": 4096}
+    headers = {"Content-Type": "application/json"}
+
+    streamed = []
+    streamed_text = advisor._stream_plan_text(headers, payload, lambda section, index, exercise: streamed.append((section, index, exercise)))
+    response = advisor.http_session.post(advisor.endpoint_url, json=payload, timeout=(app.HTTP_CONNECT_TIMEOUT, app.HTTP_READ_TIMEOUT))
+    non_streamed_plan, _ = advisor._parse_plan_text(response.json()["choices"][0]["message"]["content"])
+    server.shutdown()
+
+    streamed_plan, repaired = advisor._parse_plan_text(streamed_text)
+    per_char = IncrementalPlanParser()
+    per_char_items = [item for char in completion for item in per_char.feed(char)]
+
+    failures = []
+    if split_escapes == 0:
+        failures.append("the capture never cuts a delta inside an escape sequence")
+    if streamed_text != completion:
+        failures.append("streamed text differs from the recorded deltas")
+    if repaired:
+        failures.append("the streamed completion needed repair")
+    if [(section, index) for section, index, _ in streamed] != expected_order(streamed_plan):
+        failures.append("exercises arrived out of order or incomplete")
+    mismatched = [(section, index) for section, index, exercise in streamed if streamed_plan[section][index] != exercise]
+    if mismatched:
+        failures.append(f"streamed exercises differ from the final plan: {mismatched}")
+    if streamed_plan != non_streamed_plan:
+        failures.append("streamed plan differs from the non-streamed parse")
+    if per_char_items != streamed:
+        failures.append("one-character feeding gives different exercises")
+
+    print(f"{len(streamed)} exercises streamed ({', '.join(f'{section}: {len(streamed_plan.get(section, []))}' for section in STREAMED_SECTIONS)})")
+    for failure in failures:
+        print(f"  FAILED {failure}")
+    print("OK" if not failures else f"{len(failures)} check(s) failed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
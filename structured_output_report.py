@@ -0,0 +1,99 @@
+"""
+Structured Output Report
+Generates the same plans once per output mode (the free-text prompt "off" against structured
+output) and compares GENERATION_METRICS: prompt/completion tokens per day plan and retry and
+fallback rates.
+
+By default it runs against the local stub (fake_llm_server.py), which honours json_schema
+response formats, so the token savings can be measured offline. Retry rates only mean something
+against the real endpoint (--endpoint/--api-key), where every mode costs one call per training day.
+
+Usage:
+    python structured_output_report.py
+    python structured_output_report.py --endpoint https://.../chat/completions --api-key KEY --limit 4 --json report.json
+"""
+
+import argparse
+import json
+from typing import Dict, List
+
+from cli_logging import quiet_streamlit_context_warnings
+quiet_streamlit_context_warnings() # Before the app imports below, which already call st.*
+
+import fake_llm_server
+import test26 as app
+from generation_metrics import GENERATION_METRICS
+from plan_schema import OUTPUT_MODES
+from prompt_budget_report import default_corpus, load_corpus
+
+DEFAULT_MODES = ["off", "json_schema"]
+
+
+def run_mode(advisor, profiles: List[Dict], mode: str):
+    """Every profile's week in one output mode, through the app's own generation path."""
+    advisor.structured_output = mode
+    advisor.response_format_supported = True
+    for profile in profiles:
+        if app.CONCURRENT_GENERATION and len(profile.get("days_per_week", [])) > 1:
+            advisor.generate_workout_plans_concurrently(profile)
+        else:
+            previous = advisor.new_avoidance_index()
+            for day_index, day in enumerate(profile.get("days_per_week", [])):
+                previous.add_day(day, advisor.generate_workout_plan(profile, day, day_index, previous, "Full Body"))
+
+
+def print_report(stats: Dict[str, Dict], comparisons: Dict[str, Dict], baseline: str):
+    print("\nGeneration metrics per output mode (tokens per day plan, summed over retries)")
+    print(f"  {'mode':<14}{'calls':>7}{'attempts':>10}{'retry':>8}{'fallback':>10}{'prompt tok':>12}{'output tok':>12}")
+    for mode, mode_stats in stats.items():
+        print(f"  {mode:<14}{mode_stats['calls']:>7}{mode_stats['attempts']:>10}{mode_stats['retry_rate']:>8.1%}"
+              f"{mode_stats['failure_rate']:>10.1%}{mode_stats['prompt_tokens_per_call']:>12.1f}{mode_stats['completion_tokens_per_call']:>12.1f}")
+
+    for mode, change in comparisons.items():
+        print(f"\n{baseline} -> {mode}: output tokens {change['completion_tokens_change_pct']:+.2f}%, "
+              f"prompt tokens {change['prompt_tokens_change_pct']:+.2f}%, retry rate {change['retry_rate_change']:+.1%}, "
+              f"fallback rate {change['failure_rate_change']:+.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare output tokens and retry rates of free-text vs structured plan output.")
+    parser.add_argument("--modes", nargs="+", choices=OUTPUT_MODES, default=DEFAULT_MODES, help="Modes to run; the first is the baseline")
+    parser.add_argument("--profiles", help="Profiles JSONL (default: built-in level x goal x days grid)")
+    parser.add_argument("--limit", type=int, default=0, help="Only the first N profiles (0 = all)")
+    parser.add_argument("--endpoint", help="Chat-completions URL (default: local stub)")
+    parser.add_argument("--api-key", default="report-key")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated stub latency in seconds")
+    parser.add_argument("--json", metavar="PATH", help="Also write the metrics as JSON")
+    args = parser.parse_args()
+
+    profiles = load_corpus(args.profiles) if args.profiles else default_corpus()
+    if args.limit:
+        profiles = profiles[:args.limit]
+
+    server = None
+    endpoint = args.endpoint
+    if not endpoint:
+        server = fake_llm_server.start_server(response_delay=args.latency)
+        endpoint = fake_llm_server.endpoint_url(server)
+
+    advisor = app.FitnessAdvisor(args.api_key, endpoint)
+    advisor.response_cache = None # Every call must reach the endpoint
+    GENERATION_METRICS.clear()
+    for mode in args.modes:
+        run_mode(advisor, profiles, mode)
+    if server:
+        server.shutdown()
+
+    stats = GENERATION_METRICS.stats()
+    baseline = args.modes[0]
+    comparisons = {mode: GENERATION_METRICS.compare(baseline, mode) for mode in stats if mode != baseline}
+    print_report(stats, {mode: change for mode, change in comparisons.items() if change}, baseline)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"modes": stats, "compared_to": baseline, "changes": comparisons}, f, indent=2)
+        print(f"\nMetrics written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
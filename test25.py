@@ -3,13 +3,12 @@ import requests
 from typing import Dict, List, Optional, Set, Any
 import re
 from datetime import datetime
-import pandas as pd
 import json
-import numpy as np
 import time
 import os # Import os for path handling
  # New import
 import difflib # Import for fuzzy matching
+from condition_db import load_condition_records
  # Load environment variables immediately
 
 # ============ CONFIGURATION ============
@@ -80,28 +79,9 @@ def load_condition_database():
     Load condition database from Excel file. Uses fallback data if the file is not found,
     ensuring the medical condition list remains populated.
     """
-    condition_db = {}
-    
     try:
-        df = pd.read_excel(EXCEL_FILENAME) 
-        
-        if 'Condition' in df.columns:
-            for _, row in df.iterrows():
-                condition_name = row['Condition']
-                if pd.isna(condition_name) or str(condition_name).lower() == "none":
-                    continue
-                    
-                condition_db[condition_name] = {
-                    'medications': row.get('Medication(s)', np.nan),
-                    'direct_impact': row.get('Direct Exercise Impact', np.nan),
-                    'indirect_impact': row.get('Indirect Exercise Impacts', np.nan),
-                    'contraindicated': row.get('Contraindicated Exercises', np.nan),
-                    'modified_safer': row.get('Modified / Safer Exercises', np.nan)
-                }
-                # Replace NaN with empty string for clean output in prompt
-                for key in condition_db[condition_name]:
-                    if pd.isna(condition_db[condition_name][key]):
-                        condition_db[condition_name][key] = ""
+        # Shared vectorized loader; served from the pickle sidecar when the workbook is unchanged
+        condition_db = load_condition_records(EXCEL_FILENAME)
     
     except (FileNotFoundError, Exception) as e:
         # If file not found or another error, print error and load fallback
@@ -1,15 +1,30 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Dict, List, Optional, Set, Any
 import re
 from datetime import datetime
-import pandas as pd
 import json
-import numpy as np
+import inspect
 import time
 import os # Import os for path handling
  # New import
-import difflib # Import for fuzzy matching
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from response_cache import ResponseCache, make_cache_key
+from met_index import MetIndex, clean_exercise_name
+from condition_db import load_condition_records
+from prescription import parse_prescription
+from calorie_engine import PlanCalorieTable, SECONDS_PER_REP, iter_plan_exercises
+from plan_stream import IncrementalPlanParser, STREAMED_SECTIONS, extract_json_object, iter_sse_content
+from exercise_media import MEDIA, display_width_for
+from avoidance_index import AvoidanceIndex
+from prompt_template import PromptSection, PromptTemplate
+from prompt_budget import ListLabel, PromptBudget, TrimmableList, estimate_tokens
+from plan_schema import fill_plan, fill_python_owned, response_format, section_targets, without_python_owned
+from generation_metrics import GENERATION_METRICS
 
 # Load environment variables immediately
 
@@ -23,8 +38,22 @@ if API_KEY == "ERROR_KEY_MISSING" or ENDPOINT_URL == "ERROR_URL_MISSING":
     st.error("Configuration Error: API Key or Endpoint URL not found. Please ensure your .env file is set up correctly.")
     
 MAX_RETRIES = 3 
+CONCURRENT_GENERATION = True # Generate independent training days in parallel (dependency waves; same-wave days may share names)
+MAX_PARALLEL_DAYS = 4 # Upper bound on simultaneous LLM calls per plan
+STREAMING_ENABLED = True # Stream tokens (SSE) and render each exercise as soon as its JSON object completes
+HTTP_CONNECT_TIMEOUT = 5 # Seconds to establish the TCP/TLS connection
+HTTP_READ_TIMEOUT = 120 # Seconds to wait for the completion body
+HTTP_POOL_SIZE = 16 # Max keep-alive connections shared by all sessions in this process
+RESPONSE_CACHE_ENABLED = True # Serve repeat prompts (same profile/day/prior plans) from disk
+RESPONSE_CACHE_PATH = os.path.join(".plan_cache", "llm_responses.sqlite3")
+RESPONSE_CACHE_TTL_SECONDS = 7 * 24 * 3600
+RESPONSE_CACHE_MAX_ENTRIES = 5000
 EXCEL_FILENAME = "Top Lifestyle Disorders and Medical Conditions & ExerciseTags.xlsx" # Standard filename
 MET_FILENAME = "exercise_mets.json" # New JSON file
+PROMPT_TOKEN_BUDGET = 3200 # Estimated tokens per user prompt; the oldest avoidance names are trimmed beyond this
+DEMO_GIF_WIDTH = 320 # CSS px of the exercisedb demo GIF inside "Show Detailed Steps"
+EXPANDER_RERUNS_ON_TOGGLE = "on_change" in inspect.signature(st.expander).parameters # Keyed expanders with .open (recent Streamlit); older releases show no demo GIF
+STRUCTURED_OUTPUT_MODE = "json_schema" # "json_schema" | "json_object" | "off" (free-text JSON, model also writes sets/RPE/rest/calories)
 
 st.set_page_config(
     page_title="FriskaAI Fitness Coach",
@@ -74,6 +103,30 @@ FALLBACK_MEDICAL_CONDITIONS_DATA = {
 }
 
 
+# ============ SHARED HTTP CLIENT ============
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """
+    Process-wide keep-alive session for the LLM endpoint. Cached as a resource so every day,
+    rerun and Streamlit session reuses the same connection pool (no TLS handshake per call).
+    The pool blocks instead of opening extra sockets once HTTP_POOL_SIZE connections are busy.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1, # Single host (the Azure endpoint)
+        pool_maxsize=HTTP_POOL_SIZE,
+        pool_block=True
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    """Process-wide on-disk plan cache (shared across Streamlit sessions)."""
+    return ResponseCache(RESPONSE_CACHE_PATH, RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_MAX_ENTRIES)
+
+
 # ============ LOAD EXCEL CONDITION DATABASE ============
 @st.cache_data
 def load_condition_database():
@@ -81,28 +134,9 @@ def load_condition_database():
     Load condition database from Excel file. Uses fallback data if the file is not found,
     ensuring the medical condition list remains populated.
     """
-    condition_db = {}
-    
     try:
-        df = pd.read_excel(EXCEL_FILENAME) 
-        
-        if 'Condition' in df.columns:
-            for _, row in df.iterrows():
-                condition_name = row['Condition']
-                if pd.isna(condition_name) or str(condition_name).lower() == "none":
-                    continue
-                    
-                condition_db[condition_name] = {
-                    'medications': row.get('Medication(s)', np.nan),
-                    'direct_impact': row.get('Direct Exercise Impact', np.nan),
-                    'indirect_impact': row.get('Indirect Exercise Impacts', np.nan),
-                    'contraindicated': row.get('Contraindicated Exercises', np.nan),
-                    'modified_safer': row.get('Modified / Safer Exercises', np.nan)
-                }
-                # Replace NaN with empty string for clean output in prompt
-                for key in condition_db[condition_name]:
-                    if pd.isna(condition_db[condition_name][key]):
-                        condition_db[condition_name][key] = ""
+        # Shared vectorized loader; served from the pickle sidecar when the workbook is unchanged
+        condition_db = load_condition_records(EXCEL_FILENAME)
     
     except (FileNotFoundError, Exception) as e:
         # If file not found or another error, print error and load fallback
@@ -131,9 +165,16 @@ def load_met_database():
         return {}
 
 
+@st.cache_resource
+def get_met_index() -> MetIndex:
+    """Builds the MET lookup index once per process (memoized name resolutions survive reruns)."""
+    return MetIndex(load_met_database())
+
+
 # Load databases
 CONDITION_DATABASE = load_condition_database()
 MET_DATABASE = load_met_database()
+MET_INDEX = get_met_index()
 
 # ============ MEDICAL CONDITIONS LIST (Dynamically Generated) ============
 # List for the UI multiselect: includes 'None' plus all conditions from the loaded Excel data OR fallback data.
@@ -193,6 +234,153 @@ STATIC_HOLD_SCALING = {
     "Advanced (2+ years)": "60-90 seconds",
 }
 
+# ============ SYSTEM PROMPT TEMPLATE ============
+# Compiled once per process. Everything that is the same for every day and user comes first and is
+# byte-identical across calls (PROMPT_TEMPLATE.static_prefix), so provider-side prefix caching can
+# reuse it; the per-user/per-day sections follow.
+PROMPT_OUTPUT_SCHEMA = {
+    "day_name": "string",
+    "warmup_duration": "5-7 minutes",
+    # [UPDATE 1]: Changed description to encourage clearer non-jargon titles.
+    "main_workout_category": "string (Example: Upper Body Strength, Full Body Circuit, Lower Body Endurance, Core Stability. Use clear, descriptive non-jargon terms)",
+    "cooldown_duration": "5-7 minutes",
+    "warmup": [
+        {
+            "name": "string",
+            "benefit": "string",
+            "steps": ["3-5 sequential, descriptive step strings"],
+            "sets": "1",
+            "reps": "string (e.g., 10-15)",
+            "intensity_rpe": "RPE 1-3",
+            "rest": "15 seconds",
+            "equipment": "string",
+            # LLM MUST ONLY PROVIDE A DUMMY VALUE/FORMAT. PYTHON WILL REPLACE THIS WITH ACCURATE CALCULATION.
+            "est_calories": "Est: 0 Cal (MET: 0.0)",
+            "safety_cue": "string (Mandatory: Provide a specific form tip or safety point for THIS exercise)" # REINFORCED MANDATE
+        }
+    ],
+    "main_workout": [
+        {
+            "name": "string",
+            "benefit": "string",
+            "steps": ["3-5 sequential, descriptive step strings"],
+            # Per-user targets are stated in section 6, keeping the schema identical for every prompt
+            "sets": "string (the Sets target in section 6)",
+            "reps": "string (the Reps target in section 6)",
+            "intensity_rpe": "string (RPE <section 6 main workout RPE>)",
+            "rest": "string (the Rest target in section 6)",
+            "equipment": "string",
+            # LLM MUST ONLY PROVIDE A DUMMY VALUE/FORMAT. PYTHON WILL REPLACE THIS WITH ACCURATE CALCULATION.
+            "est_calories": "Est: 0 Cal (MET: 0.0)",
+            "safety_cue": "string (Mandatory: Provide a specific form tip or safety point for THIS exercise)" # REINFORCED MANDATE
+        }
+    ],
+    "cooldown": [
+        {
+            "name": "string",
+            "benefit": "string",
+            "steps": ["3-5 sequential, descriptive step strings"],
+            "sets": "1",
+            "hold": "string (e.g., 30-60 seconds / side)",
+            "intensity_rpe": "RPE 1-3",
+            "rest": "15 seconds",
+            # LLM MUST ONLY PROVIDE A DUMMY VALUE/FORMAT. PYTHON WILL REPLACE THIS WITH ACCURATE CALCULATION.
+            "equipment": "string",
+            "est_calories": "Est: 0 Cal (MET: 0.0)",
+            "safety_cue": "string (Mandatory: Provide a specific form tip or safety point for THIS exercise)" # REINFORCED MANDATE
+        }
+    ],
+    "safety_notes": ["3-5 strings"]
+}
+
+
+def build_prompt_template(structured_output: bool = False) -> PromptTemplate:
+    """
+    The user prompt. With structured output the model no longer writes the fields Python sets
+    (sets, intensity_rpe, rest, est_calories): they leave the schema and the rules that asked for them.
+    """
+    schema = without_python_owned(PROMPT_OUTPUT_SCHEMA) if structured_output else PROMPT_OUTPUT_SCHEMA
+    calorie_rule = (
+        "- **IMPORTANT:** Sets, RPE, rest and calories are filled in externally by a Python function. Do NOT output the `sets`, `intensity_rpe`, `rest` or `est_calories` fields. Focus solely on generating highly relevant and safe exercise routines according to the rules above."
+        if structured_output else
+        "- **IMPORTANT:** The Calorie (MET) calculation is handled externally by a Python function. Focus solely on generating highly relevant and safe exercise routines according to the rules above. Use a default 'Est: 0 Cal (MET: 0.0)' in your JSON output for the `est_calories` field."
+    )
+    target_lines = [
+        "# 6. TODAY'S MAIN WORKOUT TARGETS (DYNAMICALLY INJECTED)",
+        "- Main workout: exactly {max_main_exercises} exercises.",
+        "- **Movement Focus Mandate:** {required_structure}", # UPDATED: Use dynamic structure based on body parts
+        "- Intensity: Main workout RPE must be **{target_rpe}**.",
+        "- **STRICT MAIN WORKOUT REPS RULE (Standard):** All Main workout exercises MUST be in **Reps: {target_reps}** (e.g., 10-15). **DO NOT** use a 'duration' or 'hold' field in the 'main_workout' section for non-isometric exercises.",
+        "- **STATIC HOLD SCALING:** All static holds (planks, stretches, stability drills) MUST use a hold time appropriate for the user's level, which is a maximum of **{static_hold}** total duration. For exercises requiring two sides (e.g., side plank, stretches), split the duration evenly.",
+    ]
+    if not structured_output:
+        target_lines.append("- Reps/Sets: Main workout sets/reps must be **Sets: {target_sets}, Reps: {target_reps}** | Rest: **{target_rest}**.")
+
+    return PromptTemplate([
+        # --- STATIC PREFIX (same for every call) ---
+        PromptSection.static("role", "\n".join([
+            "You are FriskaAI, an ACSM ,You are a certified fitness coach and corrective exercise specialist.. You MUST prioritize **maximum exercise variety** and **avoiding consecutive-day muscle group work**.",
+            "Your ONLY output must be a single JSON object following the schema provided below.",
+            "Never include text outside the JSON. Never add comments.",
+        ])),
+        PromptSection.static("schema", "\n".join([
+            "# 1. JSON OUTPUT SCHEMA (MANDATORY)",
+            json.dumps(schema, indent=2).replace('"', '`'),
+        ])),
+        PromptSection.static("standing_rules", "\n".join([
+            "# 2. EXERCISE STRUCTURE & SAFETY MANDATES (EVERY PLAN)",
+            "- Session Duration Breakdown: **Warm-up: 10–15% | Main workout: 70–75% | Cooldown: 10–15%** (For pacing guidance)",
+            "- Warmup: exactly 3 exercises. MUST use the **'reps'** field for dynamic movements, not 'duration'.",
+            "- **Warmup Structure Mandate (CRITICAL VARIATION):** The 3 exercises MUST follow this order and focus.If any exercises are performed in both side (left/right) then it should show either sec/side or rep/side in reps. Exercise names MUST be varied across different training days (e.g., use Cat-Cow Stretch, Seated Glute Stretch, or Wall Chest Stretch instead of generic 'Stretch'). **AVOID repeating:** Arm Circles, Standing Hip Swings, Low-Impact High Knees, Scapular Push-Ups, Thoracic Rotations.",
+            "   1. Cardio Type Exercise (e.g., Low-Impact High Knees, Modified Jumping Jacks, Spot Walking/Marching). This exercise MUST account for **90 seconds (1.5 minutes)** of the total duration. The duration MUST be used in the calorie calculation.",
+            "   2. Upper Body Dynamic Stretch/Mobility. The duration for this should be treated as **10-15 reps** for calculation.",
+            "   3. Lower Body Dynamic Stretch/Mobility. The duration for this should be treated as **10-15 reps** for calculation.",
+            "- Cooldown: exactly 3 static stretches/exercises.Exercises/Static Stretches MUST related to the main workout.The duration for this should be treated as **15-30 sec**.If any exercises are performed in both side (left/right) then it should show either sec/side or rep/side in reps. Exercise names MUST be varied across different training days. **AVOID repeating:** (same exercises) (eg.Seated Glute Stretch, Wall Chest Stretch, Deep Diaphragmatic Breathing, Standing Quad Stretch, Hamstring Floor Stretch, shoulder static stretch)",
+            "- Main workout: **All main exercises must be unique from each other and the warm-up/cool-down.All exercises are standerd not modified.**",
+            "- Intensity: Warmup/Cooldown RPE must be **RPE 1-3**.",
+            calorie_rule,
+            "- **CRITICAL MANDATE: SAFETY CUE:** Every single exercise object (warmup, main, cooldown) MUST include a specific and concise instruction in the `safety_cue` field related to form, balance, or injury prevention for that particular exercise. DO NOT leave it blank.", # STRONGER MANDATE
+            "- **SPECIAL ISOMETRIC REPS RULE (Plank/Wall Sit):** For static holds (like Plank, Wall Sit) in the **main_workout** section, the 'reps' field MUST represent the hold time, for example: '**30-45 seconds (or max hold)**'.",
+            "- **BI-LATERAL REPS CLARIFICATION:** For any exercise performed one side at a time (e.g., Lunges, Single-Arm Row, Side Plank), the 'reps' value MUST clearly indicate per side (e.g., '10-12 / side' or '10-12 each leg').",
+            "- Never exceed user equipment.",
+            "- Prioritize stability for Beginner level users and BMI > 30.",
+            "- Safety Notes must include:",
+            "   1. One top-priority safety tip for conditions/limitation.",
+            "   2. One 'Progression Tip: ...' (Mandatory for next week's plan).",
+            "   3. One or two general wellness tips.",
+        ])),
+        PromptSection.static("output_rules", "\n".join([
+            "# 3. OUTPUT RULES",
+            "- Output **only** valid JSON.",
+            "- **NO** markdown outside the single ```json block.",
+            "- **NO** text, explanation, or commentary.",
+        ])),
+        # --- DYNAMIC SECTIONS (per user / per day) ---
+        PromptSection.template("profile", "\n".join([
+            "# 4. USER PROFILE (DYNAMICALLY INJECTED)",
+            "{profile_json}",
+            "- Targeted Body Parts: **{target_body_parts}**", # NEW: Target body part instruction
+        ])),
+        PromptSection.template("restrictions", "\n".join([
+            "# 5. RESTRICTION RULES (DYNAMICALLY INJECTED)",
+            "- Current Day: **{day_name}** | Fitness Level/Experience: **{fitness_level}**", # Updated level reference
+            "- Fitness Level Constraints: **{level_rules}**",
+            "- Training Consistency Rule: **{repetition_rule}**",
+            "- Equipment & Location Rule: **{equipment_rule}**. Strictly use only these equipment options: **{allowed_equipment}**",
+            "- **STRICT EXERCISE NAME AVOIDANCE ({exercises_to_avoid_scope}):** DO NOT use these specific exercise names in ANY section: **{exercises_to_avoid}**",
+            "- **STRICT PATTERN AVOIDANCE ({patterns_to_avoid_scope}):** To ensure muscle group recovery and maximize variety, prioritize movements NOT listed here: **{patterns_to_avoid}**",
+            "- Medical and Safety Restrictions: **{medical_restrictions}**",
+            "- Physical limitations: **{physical_limitation}**",
+        ])),
+        PromptSection.template("targets", "\n".join(target_lines)),
+        PromptSection.static("response_start", "```json"),
+    ])
+
+
+PROMPT_TEMPLATE = build_prompt_template() # Free-text output (STRUCTURED_OUTPUT_MODE = "off")
+STRUCTURED_PROMPT_TEMPLATE = build_prompt_template(structured_output=True)
+PROMPT_BUDGET = PromptBudget(PROMPT_TOKEN_BUDGET)
+
 # ============ GOAL OPTIONS ============
 PRIMARY_GOALS = ["Weight Loss", "Muscle Gain", "Weight Maintenance"]
 SECONDARY_GOALS = ["Increase Overall Strength", "Improve Cardiovascular Fitness", "Improve Flexibility & Mobility", "Rehabilitation & Injury Prevention", "Improve Posture & Balance"]
@@ -237,23 +425,8 @@ def _get_cal_reference(weight_kg: float) -> Dict[str, str]:
 def parse_time_to_seconds(time_str: str) -> float:
     """Helper to parse time strings like '60-90 seconds' or '2 minutes' into average seconds."""
     if not time_str: return 0.0
-    time_str = time_str.lower().strip()
-    
-    # Match seconds (e.g., 60-90 seconds or 45 seconds)
-    sec_match = re.search(r'(\d+)\s*seconds', time_str)
-    if sec_match:
-        if '-' in time_str and len(time_str.split('-')[0]) < 4:
-            low = int(re.search(r'(\d+)', time_str.split('-')[0]).group(1))
-            high = int(re.search(r'(\d+)', time_str.split('-')[1]).group(1))
-            return (low + high) / 2.0
-        return int(sec_match.group(1))
-    
-    # Match minutes (e.g., 2 minutes)
-    min_match = re.search(r'(\d+)\s*minutes', time_str)
-    if min_match:
-        return int(min_match.group(1)) * 60.0
-    
-    return 0.0
+    # Memoized single-pass parser (see prescription.py); 0.0 if the string is not time-based
+    return parse_prescription(time_str).seconds_per_set
 
 # Removed parse_llm_calories as it is no longer used.
 # def parse_llm_calories(calorie_str: str) -> int:
@@ -262,12 +435,27 @@ def parse_time_to_seconds(time_str: str) -> float:
 #     match = re.search(r'Est: (\d+) Cal', calorie_str)
 #     return int(match.group(1)) if match else 0
 
+# Error text of a request refused because of its response_format (structured output unsupported)
+RESPONSE_FORMAT_ERROR_RE = re.compile(r"response[_ ]?format|json[_ ]?schema|json[_ ]?object|structured output", re.IGNORECASE)
+
+
+class ResponseFormatRejected(requests.HTTPError):
+    """The endpoint refused the request's response_format (structured output unsupported)."""
+
+
 class FitnessAdvisor:
     """Enhanced fitness planning engine with proper API integration"""
     
-    def __init__(self, api_key: str, endpoint_url: str):
+    def __init__(self, api_key: str, endpoint_url: str, http_session: Optional[requests.Session] = None, response_cache: Optional[ResponseCache] = None):
         self.api_key = api_key
         self.endpoint_url = endpoint_url
+        # Shared pooled client (falls back to the process-wide session)
+        self.http_session = http_session or get_http_session()
+        # Content-addressed plan cache (None disables caching)
+        self.response_cache = response_cache or (get_response_cache() if RESPONSE_CACHE_ENABLED else None)
+        # Output mode (see plan_schema.OUTPUT_MODES); response_format is dropped if the endpoint rejects it
+        self.structured_output = STRUCTURED_OUTPUT_MODE
+        self.response_format_supported = True
         
         self.goal_programming_guidelines = {
             "Weight Loss": {
@@ -346,23 +534,12 @@ class FitnessAdvisor:
         met_col_key = TRAINING_LEVELS.get(fitness_level, TRAINING_LEVELS["Beginner (0–6 months)"])['met_key']
         
         # Clean the exercise name to find a match in the MET database keys (e.g., "Wall Push-ups (Standard)" -> "wall_push_up")
-        clean_name_base = re.sub(r'[\s\(\)-]+', '_', exercise_name.lower()).strip('_')
-        
-        # 1. Try finding a direct match
-        for key, data in MET_DATABASE.items():
-            if clean_name_base.startswith(key):
-                return data.get(met_col_key, 3.0) # Default to 3.0 MET if level key is missing
-        
-        # 2. Apply Fuzzy Matching for robustness
-        met_keys = list(MET_DATABASE.keys())
-        
-        # We look for the closest match in the MET database keys (cutoff threshold 0.7 for reasonable match)
-        close_matches = difflib.get_close_matches(clean_name_base, met_keys, n=1, cutoff=0.7)
+        clean_name_base = clean_exercise_name(exercise_name)
         
-        if close_matches:
-            best_match_key = close_matches[0]
-            # Use the MET value for the closest matched exercise
-            return MET_DATABASE[best_match_key].get(met_col_key, 3.0)
+        # 1 & 2. Indexed lookup: first key the name starts with, then the closest fuzzy match (cutoff 0.7)
+        met_key = MET_INDEX.resolve(clean_name_base)
+        if met_key is not None:
+            return MET_INDEX.met_database[met_key].get(met_col_key, 3.0) # Default to 3.0 MET if level key is missing
             
         # 3. Fallback based on activity type if no specific or fuzzy match is found
         if 'walk' in clean_name_base or 'march' in clean_name_base or 'stretch' in clean_name_base or 'mobility' in clean_name_base:
@@ -409,89 +586,87 @@ class FitnessAdvisor:
         return 1.0, unit_of_effort
 
 
+    def _logging_unit(self, exercise_name: str, section_key: str, index: int) -> str:
+        """Unit the user logs per set ("Sec" or "Rep"). The first warm-up item is always timed cardio."""
+        if section_key == 'warmup' and index == 1:
+            return "Sec"
+        return self._calculate_calorie_rate(exercise_name, 0.0)[1]
+
+    def _is_time_based_log(self, exercise_name: str, section_key: str) -> bool:
+        """True if the logged units of this exercise are seconds (holds, cool-down, warm-up cardio)."""
+        name_lower = exercise_name.lower()
+        if section_key == 'cooldown':
+            return True
+        # Check main/warmup for explicit time-based descriptions
+        if 'hold' in name_lower or 'second' in name_lower or 'minute' in name_lower:
+            return True
+        # Special check for warmup cardio (which is logged in seconds)
+        return section_key == 'warmup' and ('march' in name_lower or 'jog' in name_lower or 'jack' in name_lower or 'cardio' in name_lower)
+
+    def _planned_seconds_per_set(self, exercise_data: Dict, section_key: str) -> float:
+        """Estimated duration in seconds of ONE planned set (holds, warm-up cardio, or reps at 5s/rep + 10s transition)."""
+        name = exercise_data.get('name', 'Unknown Exercise')
+        # Sets/reps/hold strings are parsed once by the memoized prescription parser
+        reps_rx = parse_prescription(exercise_data.get('reps', ''), exercise_data.get('sets', '1'))
+
+        if section_key == 'cooldown':
+            # Use hold duration in seconds (cooldown)
+            return parse_prescription(exercise_data.get('hold', '') or '30 seconds').seconds_per_set
+        if reps_rx.timed:
+            # Use reps value if it's an isometric hold time (in main workout/warmup); 0 for "max hold" with no time
+            return reps_rx.seconds_per_set
+        if section_key == 'warmup' and reps_rx.is_range:
+            # For warm-up cardio, assume 90s (1.5 min) duration for calculation to keep it fast
+            if 'cardio' in name.lower() or 'march' in name.lower() or 'jack' in name.lower():
+                return 90.0
+            # For dynamic stretches (30s assumption)
+            return 30.0
+
+        # Estimate time: 5 seconds per rep + 10 seconds transition
+        # reps_per_set() defaults to 10 reps and doubles "per side" work
+        return (reps_rx.reps_per_set() * SECONDS_PER_REP) + 10
+
+    def build_calorie_table(self, plan_json: Dict, fitness_level: str) -> PlanCalorieTable:
+        """
+        Flattens warm-up, main workout and cool-down into one PlanCalorieTable so planned and
+        logged calories for the whole day are computed in a single vectorized pass.
+        """
+        exercise_ids, met, planned_sets, planned_seconds, logged_unit_seconds, rate_unit_seconds = [], [], [], [], [], []
+
+        for ex_id, section_key, index, exercise in iter_plan_exercises(plan_json):
+            name = exercise.get('name', 'Unknown Exercise')
+            # Use the stored MET value if available, otherwise look it up (memoized index)
+            met_value = exercise.get('met_value') or self._get_met_value(name, fitness_level)
+
+            exercise_ids.append(ex_id)
+            met.append(met_value if met_value > 0 else 3.0) # Safe general MET if lookup fails
+            planned_sets.append(parse_prescription(exercise.get('reps', ''), exercise.get('sets', '1')).sets)
+            planned_seconds.append(self._planned_seconds_per_set(exercise, section_key))
+            logged_unit_seconds.append(1.0 if self._is_time_based_log(name, section_key) else SECONDS_PER_REP)
+            rate_unit_seconds.append(1.0 if self._logging_unit(name, section_key, index) == "Sec" else SECONDS_PER_REP)
+
+        return PlanCalorieTable(exercise_ids, met, planned_sets, planned_seconds, logged_unit_seconds, rate_unit_seconds)
+
     def _calculate_total_estimated_calories(self, exercise_data: Dict, weight_kg: float, fitness_level: str) -> str:
         """
         [FIX 2 Implementation] Calculates estimated calories using the MET lookup and the time duration.
         Crucially, this now calculates the burn for **ALL planned sets**, ensuring the JSON/MD export
         reflects the total estimated burn based on the full workout plan's volume (sets * reps/duration).
         Formula: Calories = (MET * Weight_KG * 3.5) / 200 * (Duration in minutes)
+        Single-exercise entry point; whole plans go through build_calorie_table().
         """
-        
-        name = exercise_data.get('name', 'Unknown Exercise')
-        
-        # 1. Determine MET value based on fitness level and exercise name
-        met_value = self._get_met_value(name, fitness_level)
-        
-        # 2. Determine Duration in Minutes
-        sets_value = exercise_data.get('sets', '1')
-        num_sets = 1
-        try:
-            num_sets = int(sets_value.split('-')[-1].strip()) if '-' in sets_value else int(sets_value.strip())
-            num_sets = max(1, num_sets)
-        except:
-            pass
-
-        # Determine total duration in seconds (units)
         section_key = 'main' # Assume main if not explicitly passed
         if exercise_data.get('warmup'): section_key = 'warmup'
         if exercise_data.get('cooldown'): section_key = 'cooldown'
-        
-        avg_units_per_set = 0.0
-        
-        reps_value = exercise_data.get('reps', '')
-        hold_duration = exercise_data.get('hold', '')
-        
-        try:
-            if section_key == 'cooldown':
-                # Use hold duration in seconds (cooldown)
-                avg_units_per_set = parse_time_to_seconds(hold_duration or '30 seconds')
-            elif 'hold' in reps_value.lower() or 'minute' in reps_value.lower() or 'second' in reps_value.lower():
-                 # Use reps value if it's an isometric hold time (in main workout/warmup)
-                avg_units_per_set = parse_time_to_seconds(reps_value)
-            elif section_key == 'warmup' and re.search(r'(\d+-\d+)', reps_value):
-                 # For warm-up cardio, assume 90s (1.5 min) duration for calculation to keep it fast
-                 if 'cardio' in name.lower() or 'march' in name.lower() or 'jack' in name.lower():
-                     avg_units_per_set = 90.0 
-                 else:
-                     # For dynamic stretches (30s assumption)
-                     avg_units_per_set = 30.0
-            else:
-                # Estimate duration for typical reps/sets in the main workout (5 seconds per rep is a decent approximation for strength)
-                if '-' in reps_value:
-                    low = int(re.search(r'(\d+)', reps_value.split('-')[0]).group(1))
-                    high_part = reps_value.split('-')[-1]
-                    high = int(re.search(r'(\d+)', high_part).group(1))
-                    avg_reps = (low + high) / 2.0
-                elif re.search(r'(\d+)', reps_value):
-                    avg_reps = int(re.search(r'(\d+)', reps_value).group(1))
-                else:
-                    avg_reps = 10
-                
-                # Account for "per side"
-                if 'side' in reps_value.lower() or 'each' in reps_value.lower():
-                    avg_reps *= 2
-                
-                # Estimate time: 5 seconds per rep + 10 seconds transition
-                avg_units_per_set = (avg_reps * 5) + 10 # seconds. This is the estimated duration of a SINGLE set in seconds.
 
-        except Exception as e:
-            # Fallback to a fixed 60 seconds duration per set on parsing error
-            avg_units_per_set = 60.0
-            
-        # *** Calculate total time using ALL planned sets ***
-        total_seconds = num_sets * avg_units_per_set
-        total_minutes = total_seconds / 60.0
+        table_key = {'warmup': 'warmup', 'main': 'main_workout', 'cooldown': 'cooldown'}[section_key]
+        table = self.build_calorie_table({table_key: [exercise_data]}, fitness_level)
 
-        # 3. Apply the Calorimetry Formula
-        # Formula: Calories = (MET * Weight_KG * 3.5) / 200 * Minutes
-        
         # Check for division by zero
-        if weight_kg == 0 or total_minutes == 0:
+        if weight_kg == 0 or table.planned_seconds_per_set[0] == 0:
             return "Est: 0 Cal (MET: 0.0)"
 
-        estimated_calories = (met_value * weight_kg * 3.5) / 200 * total_minutes
-        
-        return f"Est: {round(estimated_calories)} Cal (MET: {met_value:.1f})" 
+        return f"Est: {table.planned_calories(weight_kg)[0]} Cal (MET: {table.met[0]:.1f})"
 
     def _determine_split_focus_and_repetition(self, total_days: int, day_index: int, fitness_level: str) -> tuple[str, str]:
         """Determine the body part focus and the repetition rule for the current day based on complex rules."""
@@ -612,14 +787,16 @@ class FitnessAdvisor:
             return "Plan structure is missing or empty."
 
         markdown_output = ""
-        total_calories_burned = 0
         weight_kg = profile.get('weight_kg', 70.0)
         fitness_level = profile.get('fitness_level', "Beginner (0–6 months)")
+
+        # --- CALORIE CALCULATION (PYTHON/MET-BASED) ---
+        # One vectorized pass over the whole day computes the burn for **ALL PLANNED SETS** of every exercise
+        calorie_summary = self.build_calorie_table(plan_json, fitness_level).summary(weight_kg)
+        total_calories_burned = calorie_summary['planned_total']
         
         # Helper function for formatting exercise blocks
         def format_exercise_block(exercise_data: Dict, index: int, section_type: str) -> str:
-            nonlocal total_calories_burned
-            
             name = exercise_data.get('name', 'Exercise Name Missing')
             benefit = exercise_data.get('benefit', exercise_data.get('focus', 'N/A'))
             steps = exercise_data.get('steps', [])
@@ -658,63 +835,29 @@ class FitnessAdvisor:
             equipment = exercise_data.get('equipment', 'N/A')
             safety_cue = exercise_data.get('safety_cue', 'N/A')
             
-            # --- CALORIE CALCULATION (PYTHON/MET-BASED) ---
-            # Call the function to calculate the estimated calories for **ALL PLANNED SETS**
-            calorie_calc_str = self._calculate_total_estimated_calories(
-                {'name': name, 'sets': sets_value, 'reps': reps_value, 'hold': hold_duration, 'warmup': section_type=='warmup', 'cooldown': section_type=='cooldown'}, 
-                weight_kg, 
-                fitness_level
-            )
-            
-            # Parse the Python-calculated calorie value and MET value
-            estimated_calories_match = re.search(r'Est: (\d+) Cal', calorie_calc_str)
-            met_match = re.search(r'MET: (\d+\.?\d*)', calorie_calc_str)
-            
-            estimated_calories_per_exercise = int(estimated_calories_match.group(1)) if estimated_calories_match else 0
-            met_used = met_match.group(1) if met_match else '?'
-            met_used_float = float(met_used) if met_match and met_match.group(1).replace('.', '', 1).isdigit() else 3.0 # Store MET as float
-
-            total_calories_burned += estimated_calories_per_exercise
-            calorie_burn_str = f"Est: {estimated_calories_per_exercise} Cal (MET: {met_used})"
+            ex_id = f"{section_type}_{index}"
+            estimated_calories_per_exercise = calorie_summary['planned'][ex_id]
+            met_used_float = calorie_summary['met'][ex_id]
+            calorie_burn_str = f"Est: {estimated_calories_per_exercise} Cal (MET: {met_used_float:.1f})"
                 
             # --- PLANNED UNITS CALCULATION (CRITICAL FOR NEW CALC) ---
             # Recalculate units/set for logging defaults (should still be single set)
             num_planned_sets = 1
             avg_planned_units_per_set = 0.0
             
-            try:
-                # 1. Planned Sets (use the full sets value here only for the metadata storage, not for the calorie formula itself, which is already calculated above)
-                num_planned_sets_total = int(sets_value.split('-')[-1].strip()) if '-' in sets_value else int(sets_value.strip())
-                num_planned_sets_total = max(1, num_planned_sets_total) # Ensure non-zero
-                
-                # 2. Planned Units (Reps or Seconds) for ONE SET
-                if section_type == 'cooldown':
-                    avg_planned_units_per_set = parse_time_to_seconds(hold_duration or '30 seconds')
-                elif rep_label == "Hold Duration":
-                    avg_planned_units_per_set = parse_time_to_seconds(reps_value)
-                elif index == 1 and section_type == 'warmup' and ('min equiv' in reps_value.lower() or 'minute' in reps_value.lower()):
-                    avg_planned_units_per_set = 90.0 
-                    
-                else:
-                    if '-' in reps_value:
-                        low = int(re.search(r'(\d+)', reps_value.split('-')[0]).group(1))
-                        high_part = reps_value.split('-')[-1]
-                        high = int(re.search(r'(\d+)', high_part).group(1))
-                        avg_reps = (low + high) / 2.0
-                    elif re.search(r'(\d+)', reps_value):
-                        avg_reps = int(re.search(r'(\d+)', reps_value).group(1))
-                    else:
-                        avg_reps = 10
-                    
-                    if 'side' in reps_value.lower() or 'each' in reps_value.lower():
-                        avg_reps *= 2
-                        
-                    avg_planned_units_per_set = avg_reps
-
-            except Exception as e:
-                # Fallback to defaults on parsing error
-                num_planned_sets_total = 1
-                avg_planned_units_per_set = 10.0
+            # 1. Planned Sets (use the full sets value here only for the metadata storage, not for the calorie formula itself, which is already calculated above)
+            reps_rx = parse_prescription(reps_value, sets_value)
+            num_planned_sets_total = reps_rx.sets
+            
+            # 2. Planned Units (Reps or Seconds) for ONE SET
+            if section_type == 'cooldown':
+                avg_planned_units_per_set = parse_prescription(hold_duration or '30 seconds').seconds_per_set
+            elif rep_label == "Hold Duration":
+                avg_planned_units_per_set = reps_rx.seconds_per_set
+            elif index == 1 and section_type == 'warmup' and ('min equiv' in reps_value.lower() or 'minute' in reps_value.lower()):
+                avg_planned_units_per_set = 90.0 
+            else:
+                avg_planned_units_per_set = reps_rx.reps_per_set()
             
             # Total Planned Units (for calculation rate use)
             # This is the total units (reps or seconds) across all planned sets
@@ -730,7 +873,7 @@ class FitnessAdvisor:
             
             # --- CRITICAL FIX: Overwrite LLM's dummy value with Python's calculated value ---
             # This ensures the JSON export and the static MD reflect the accurate calorie calculation.
-            exercise_data['est_calories'] = calorie_calc_str 
+            exercise_data['est_calories'] = calorie_burn_str 
             # ---------------------------------------------------------------------------------
             
             # Start of the strictly formatted output
@@ -841,19 +984,51 @@ class FitnessAdvisor:
 
         return "Miscellaneous/Unknown Pattern"
 
+    def new_avoidance_index(self) -> AvoidanceIndex:
+        """Empty repetition-avoidance index for a week; add each day to it as it completes."""
+        return AvoidanceIndex(self._get_movement_pattern_from_exercise)
+
+    def avoidance_index_for(self, user_profile: Dict, day_index: int, previous_plans) -> AvoidanceIndex:
+        """
+        `previous_plans` as an AvoidanceIndex: used as-is when it already is one, otherwise built
+        from the plans dict ({day: result}) over the days before day_index.
+        """
+        if isinstance(previous_plans, AvoidanceIndex):
+            return previous_plans
+        earlier_days = user_profile.get('days_per_week', [])[:max(day_index, 0)]
+        return AvoidanceIndex.from_plans(self._get_movement_pattern_from_exercise, earlier_days, previous_plans)
+
 
     def _build_system_prompt(
         self,
         user_profile: Dict,
         day_name: str,
         day_index: int,
-        previous_plans: Dict, 
+        previous_plans, # AvoidanceIndex of the earlier days (or the legacy {day: result} dict)
         workout_category: str = "Full Body"
     ) -> str:
         """
         [FIX 2 Implementation Note] Builds the entire system prompt. The LLM is forced 
         to use the dummy calorie value, which is later corrected by the Python function.
+        The prompt is kept within PROMPT_TOKEN_BUDGET (per-section sizes are logged at DEBUG level).
         """
+        values = self._prompt_values(user_profile, day_name, day_index, previous_plans, workout_category)
+        system_prompt, _ = PROMPT_BUDGET.render(self.prompt_template, values)
+        return system_prompt
+
+    @property
+    def prompt_template(self) -> PromptTemplate:
+        return PROMPT_TEMPLATE if self.structured_output == "off" else STRUCTURED_PROMPT_TEMPLATE
+
+    def _prompt_values(
+        self,
+        user_profile: Dict,
+        day_name: str,
+        day_index: int,
+        previous_plans,
+        workout_category: str = "Full Body"
+    ) -> Dict:
+        """Every PROMPT_TEMPLATE field for this user and day (list fields as TrimmableList, untrimmed)."""
         
         # --- DYNAMIC VALUE EXTRACTION ---
         name = user_profile.get("name", "User")
@@ -903,40 +1078,10 @@ class FitnessAdvisor:
                  target_rpe = f"{rpe_low}-{max(rpe_high - 1, rpe_low)}"
 
         # --- REPETITION AVOIDANCE ---
-        exercises_to_avoid = set()
-        patterns_to_avoid = set()
-        
-        previous_training_days_keys = [d for d in user_profile.get('days_per_week', []) if user_profile.get('days_per_week', []).index(d) < day_index]
-        days_to_check_patterns = previous_training_days_keys[-3:] 
-        
-        # Collect ALL exercise names for STRICT AVOIDANCE
-        if previous_training_days_keys and previous_plans:
-            for day_key in previous_training_days_keys:
-                plan_data = previous_plans.get(day_key)
-                if plan_data and plan_data.get('success') and 'plan_json' in plan_data and plan_data['plan_json']:
-                    all_exercises = plan_data['plan_json'].get('main_workout', []) + \
-                                    plan_data['plan_json'].get('warmup', []) + \
-                                    plan_data['plan_json'].get('cooldown', [])
-                    
-                    for ex in all_exercises:
-                        name = ex.get('name', '').strip()
-                        if name:
-                            exercises_to_avoid.add(name)
-
-        # Collect MOVEMENT PATTERNS from the last 3 days
-        if days_to_check_patterns and previous_plans:
-            for day_key in previous_training_days_keys:
-                plan_data = previous_plans.get(day_key)
-                if plan_data and plan_data.get('success') and 'plan_json' in plan_data and plan_data['plan_json']:
-                    all_exercises = plan_data['plan_json'].get('main_workout', []) 
-                    
-                    for ex in all_exercises:
-                        name = ex.get('name', '').strip()
-                        if name:
-                            patterns_to_avoid.add(self._get_movement_pattern_from_exercise(name))
-        
-        exercises_to_avoid_list = list(exercises_to_avoid)
-        patterns_to_avoid_list = [p for p in patterns_to_avoid if p not in ["Cardio/Mobility/Flexibility", "Miscellaneous/Unknown Pattern"]]
+        # ALL exercise names of the earlier days (strict avoidance), MOVEMENT PATTERNS of the last 3 days
+        avoidance = self.avoidance_index_for(user_profile, day_index, previous_plans)
+        exercises_to_avoid_list = avoidance.exercises_to_avoid()
+        patterns_to_avoid_list = avoidance.patterns_to_avoid()
         # --- END REPETITION AVOIDANCE ---
 
         # --- RULE INJECTION - RESTRICTIONS (Section 3) ---
@@ -1001,123 +1146,31 @@ class FitnessAdvisor:
         else:
             required_structure = "Main workout must be balanced across all major movement patterns (Push, Pull, Core, Lower Body)."
 
-        # Session Duration Breakdown
-        duration_breakdown = "Warm-up: 10–15% | Main workout: 70–75% | Cooldown: 10–15%"
-        
-        # --- BUILD FINAL PROMPT STRING ---
-        
-        # Removed calorie reference as it is calculated in Python
-        
-        prompt_parts = [
-            "You are FriskaAI, an ACSM ,You are a certified fitness coach and corrective exercise specialist.. You MUST prioritize **maximum exercise variety** and **avoiding consecutive-day muscle group work**.",
-            "Your ONLY output must be a single JSON object following the schema provided below.",
-            "Never include text outside the JSON. Never add comments.",
-            "",
-            "# 1. JSON OUTPUT SCHEMA (MANDATORY)",
-            json.dumps({
-                "day_name": "string",
-                "warmup_duration": "5-7 minutes",
-                # [UPDATE 1]: Changed description to encourage clearer non-jargon titles.
-                "main_workout_category": "string (Example: Upper Body Strength, Full Body Circuit, Lower Body Endurance, Core Stability. Use clear, descriptive non-jargon terms)",
-                    "cooldown_duration": "5-7 minutes",
-                    "warmup": [
-                    {
-                        "name": "string",
-                        "benefit": "string",
-                        "steps": ["3-5 sequential, descriptive step strings"],
-                        "sets": "1",
-                        "reps": "string (e.g., 10-15)",
-                        "intensity_rpe": "RPE 1-3",
-                        "rest": "15 seconds",
-                        "equipment": "string",
-                        # LLM MUST ONLY PROVIDE A DUMMY VALUE/FORMAT. PYTHON WILL REPLACE THIS WITH ACCURATE CALCULATION.
-                        "est_calories": "Est: 0 Cal (MET: 0.0)",
-                        "safety_cue": "string (Mandatory: Provide a specific form tip or safety point for THIS exercise)" # REINFORCED MANDATE
-                    }
-                ],
-                "main_workout": [
-                    {
-                        "name": "string",
-                        "benefit": "string",
-                        "steps": ["3-5 sequential, descriptive step strings"],
-                        "sets": target_sets,
-                        "reps": target_reps,
-                        "intensity_rpe": f"RPE {target_rpe}",
-                        "rest": target_rest_desc,
-                        "equipment": "string",
-                         # LLM MUST ONLY PROVIDE A DUMMY VALUE/FORMAT. PYTHON WILL REPLACE THIS WITH ACCURATE CALCULATION.
-                        "est_calories": "Est: 0 Cal (MET: 0.0)",
-                        "safety_cue": "string (Mandatory: Provide a specific form tip or safety point for THIS exercise)" # REINFORCED MANDATE
-                    }
-                ],
-                "cooldown": [
-                    {
-                        "name": "string",
-                        "benefit": "string",
-                        "steps": ["3-5 sequential, descriptive step strings"],
-                        "sets": "1",
-                        "hold": "string (e.g., 30-60 seconds / side)",
-                        "intensity_rpe": "RPE 1-3",
-                        "rest": "15 seconds",
-                        # LLM MUST ONLY PROVIDE A DUMMY VALUE/FORMAT. PYTHON WILL REPLACE THIS WITH ACCURATE CALCULATION.
-                        "equipment": "string",
-                        "est_calories": "Est: 0 Cal (MET: 0.0)",
-                        "safety_cue": "string (Mandatory: Provide a specific form tip or safety point for THIS exercise)" # REINFORCED MANDATE
-                    }
-                ],
-                "safety_notes": ["3-5 strings"]
-            }, indent=2).replace('"', '`'),
-            "",
-            "# 2. USER PROFILE (DYNAMICALLY INJECTED)",
-            json.dumps(user_profile, indent=2),
-            f"- Targeted Body Parts: **{target_body_parts_str}**", # NEW: Target body part instruction
-            "",
-            "# 3. RESTRICTION RULES (DYNAMICALLY INJECTED)",
-            f"- Current Day: **{day_name}** | Fitness Level/Experience: **{fitness_level}**", # Updated level reference
-            f"- Fitness Level Constraints: **{level_rules}**",
-            f"- Training Consistency Rule: **{repetition_rule}**", 
-            f"- Equipment & Location Rule: **{equipment_rule}**. Strictly use only these equipment options: **{allowed_equipment}**", 
-            f"- **STRICT EXERCISE NAME AVOIDANCE (All Previous Days):** DO NOT use these specific exercise names in ANY section: **{', '.join(exercises_to_avoid_list) if exercises_to_avoid_list else 'None'}**", 
-            f"- **STRICT PATTERN AVOIDANCE (Recovery Constraint from last 3 days):** To ensure muscle group recovery and maximize variety, prioritize movements NOT listed here: **{', '.join(patterns_to_avoid_list) if patterns_to_avoid_list else 'None/Minor Muscle Groups Only'}**",
-            f"- Medical and Safety Restrictions: **{final_medical_restrictions}**", 
-            f"- Physical limitations: **{user_profile.get('physical_limitation', 'None')}**",
-            "",
-            "# 4. REQUIRED EXERCISE STRUCTURE",
-            f"- Session Duration Breakdown: **{duration_breakdown}** (For pacing guidance)", 
-            f"- Warmup: exactly 3 exercises. MUST use the **'reps'** field for dynamic movements, not 'duration'.",
-            f"- **Warmup Structure Mandate (CRITICAL VARIATION):** The 3 exercises MUST follow this order and focus.If any exercises are performed in both side (left/right) then it should show either sec/side or rep/side in reps. Exercise names MUST be varied across different training days (e.g., use Cat-Cow Stretch, Seated Glute Stretch, or Wall Chest Stretch instead of generic 'Stretch'). **AVOID repeating:** Arm Circles, Standing Hip Swings, Low-Impact High Knees, Scapular Push-Ups, Thoracic Rotations.",
-            "   1. Cardio Type Exercise (e.g., Low-Impact High Knees, Modified Jumping Jacks, Spot Walking/Marching). This exercise MUST account for **90 seconds (1.5 minutes)** of the total duration. The duration MUST be used in the calorie calculation.",
-            "   2. Upper Body Dynamic Stretch/Mobility. The duration for this should be treated as **10-15 reps** for calculation.",
-            "   3. Lower Body Dynamic Stretch/Mobility. The duration for this should be treated as **10-15 reps** for calculation.",
-            f"- Cooldown: exactly 3 static stretches/exercises.Exercises/Static Stretches MUST related to the main workout.The duration for this should be treated as **15-30 sec**.If any exercises are performed in both side (left/right) then it should show either sec/side or rep/side in reps. Exercise names MUST be varied across different training days. **AVOID repeating:** (same exercises) (eg.Seated Glute Stretch, Wall Chest Stretch, Deep Diaphragmatic Breathing, Standing Quad Stretch, Hamstring Floor Stretch, shoulder static stretch)",
-            f"- Main workout: exactly {max_main_exercises} exercises. **All main exercises must be unique from each other and the warm-up/cool-down.All exercises are standerd not modified.**",
-            f"- **Movement Focus Mandate:** {required_structure}", # UPDATED: Use dynamic structure based on body parts
-            "",
-            "# 5. SAFETY & GOAL MANDATES (CRITICAL CALORIE GUIDANCE)",
-            f"- Intensity: Main workout RPE must be **{target_rpe}** | Warmup/Cooldown RPE must be **RPE 1-3**.",
-            "- **IMPORTANT:** The Calorie (MET) calculation is handled externally by a Python function. Focus solely on generating highly relevant and safe exercise routines according to the rules above. Use a default 'Est: 0 Cal (MET: 0.0)' in your JSON output for the `est_calories` field.",
-            f"- **CRITICAL MANDATE: SAFETY CUE:** Every single exercise object (warmup, main, cooldown) MUST include a specific and concise instruction in the `safety_cue` field related to form, balance, or injury prevention for that particular exercise. DO NOT leave it blank.", # STRONGER MANDATE
-            f"- **STRICT MAIN WORKOUT REPS RULE (Standard):** All Main workout exercises MUST be in **Reps: {target_reps}** (e.g., 10-15). **DO NOT** use a 'duration' or 'hold' field in the 'main_workout' section for non-isometric exercises.",
-            f"- **SPECIAL ISOMETRIC REPS RULE (Plank/Wall Sit):** For static holds (like Plank, Wall Sit) in the **main_workout** section, the 'reps' field MUST represent the hold time, for example: '**30-45 seconds (or max hold)**'.",
-            f"- **BI-LATERAL REPS CLARIFICATION:** For any exercise performed one side at a time (e.g., Lunges, Single-Arm Row, Side Plank), the 'reps' value MUST clearly indicate per side (e.g., '10-12 / side' or '10-12 each leg').",
-            f"- **STATIC HOLD SCALING:** All static holds (planks, stretches, stability drills) MUST use a hold time appropriate for the user's level, which is a maximum of **{current_level_hold}** total duration. For exercises requiring two sides (e.g., side plank, stretches), split the duration evenly.",
-            f"- Reps/Sets: Main workout sets/reps must be **Sets: {target_sets}, Reps: {target_reps}**.",
-            "- Never exceed user equipment.",
-            "- Prioritize stability for Beginner level users and BMI > 30.",
-            "- Safety Notes must include:",
-            "   1. One top-priority safety tip for conditions/limitation.",
-            "   2. One 'Progression Tip: ...' (Mandatory for next week's plan).",
-            "   3. One or two general wellness tips.",
-            "",
-            "# 6. OUTPUT RULES",
-            "- Output **only** valid JSON.",
-            "- **NO** markdown outside the single ```json block.",
-            "- **NO** text, explanation, or commentary.",
-            "",
-            "```json"
-        ]
-        
-        return "\n".join(prompt_parts)
+        # --- VALUES FOR THE COMPILED TEMPLATE (static sections are rendered once per process) ---
+        return dict(
+            profile_json=json.dumps(user_profile, indent=2),
+            target_body_parts=target_body_parts_str,
+            day_name=day_name,
+            fitness_level=fitness_level,
+            level_rules=level_rules,
+            repetition_rule=repetition_rule,
+            equipment_rule=equipment_rule,
+            allowed_equipment=allowed_equipment,
+            exercises_to_avoid=TrimmableList(exercises_to_avoid_list, empty='None'),
+            patterns_to_avoid=TrimmableList(patterns_to_avoid_list, empty='None/Minor Muscle Groups Only'),
+            # Headings of the two lists; they stop claiming completeness if PROMPT_BUDGET drops the oldest names
+            exercises_to_avoid_scope=ListLabel('exercises_to_avoid', 'All Previous Days', 'Most Recent Days Only'),
+            patterns_to_avoid_scope=ListLabel('patterns_to_avoid', 'Recovery Constraint from last 3 days', 'Recovery Constraint, most recent days only'),
+            medical_restrictions=final_medical_restrictions,
+            physical_limitation=user_profile.get('physical_limitation', 'None'),
+            max_main_exercises=max_main_exercises,
+            required_structure=required_structure,
+            target_rpe=target_rpe,
+            target_reps=target_reps,
+            static_hold=current_level_hold,
+            target_sets=target_sets,
+            target_rest=target_rest_desc
+        )
     
     def _extract_and_move_progression_tip(self, plan_json: Dict) -> str:
         """Extracts the mandatory progression tip and removes it from the daily notes."""
@@ -1140,12 +1193,19 @@ class FitnessAdvisor:
         user_profile: Dict,
         day_name: str,
         day_index: int,
-        previous_plans: Dict, 
-        workout_category: str = "Full Body"
+        previous_plans, # AvoidanceIndex of the earlier days (or the legacy {day: result} dict)
+        workout_category: str = "Full Body",
+        on_exercise=None
     ) -> Dict:
         """
         Generate workout plan with fixed API call and JSON parsing, 
         including exponential backoff for resilience.
+        If `on_exercise(section_key, index, exercise)` is given (and STREAMING_ENABLED), the completion
+        is streamed and the callback fires as each exercise object arrives. On a retry the indices
+        restart at 0, so callers should overwrite by (section_key, index).
+        Unless STRUCTURED_OUTPUT_MODE is "off", sets/RPE/rest/calories are filled in by Python
+        (plan_schema.fill_plan) and token/retry counts go to GENERATION_METRICS.
+        The result carries the rendered prompt as "system_prompt", so callers need not build it again.
         """
         
         goal = user_profile.get("primary_goal", "Weight Maintenance")
@@ -1173,54 +1233,81 @@ class FitnessAdvisor:
         
         progression_tip = "Maintain current routine and focus on perfect form."
 
-        system_prompt = self._build_system_prompt(
-            user_profile, day_name, day_index, previous_plans, workout_category
-        )
+        values = self._prompt_values(user_profile, day_name, day_index, previous_plans, workout_category)
+        system_prompt, prompt_report = PROMPT_BUDGET.render(self.prompt_template, values)
+
+        # Structured output: the model skips sets/RPE/rest/calories and Python fills them from the day's targets
+        structured = self.structured_output != "off"
+        targets = section_targets(values['target_sets'], values['target_rpe'], values['target_rest'])
+        emit_exercise = on_exercise
+        if structured and on_exercise:
+            emit_exercise = lambda section_key, index, exercise: on_exercise(section_key, index, fill_python_owned(exercise, section_key, targets))
         
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}" 
         }
         
-        payload = {
-            "model": "mistral-small",
-            "messages": [
-                {"role": "system", "content": "You are FriskaAI, an expert clinical exercise physiologist. Your ONLY output is the JSON object requested by the user. Do not add any text or commentary outside the JSON."},
-                {"role": "user", "content": system_prompt}
-            ],
-            "temperature": 0.8,
-            "max_tokens": 4096
-        }
+        payload = self._build_payload(system_prompt)
+
+        # --- RESPONSE CACHE LOOKUP ---
+        # Identical prompts (re-submits, shared profiles) skip the LLM call entirely.
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = make_cache_key(payload["messages"], payload["model"], payload["temperature"], payload["max_tokens"])
+            cached_plan_json = self.response_cache.get(cache_key)
+            if cached_plan_json:
+                if structured:
+                    fill_plan(cached_plan_json, targets)
+                if on_exercise:
+                    # Replay the cached plan through the same callback the stream would have used
+                    for section_key in STREAMED_SECTIONS:
+                        for index, exercise in enumerate(cached_plan_json.get(section_key, []) or []):
+                            on_exercise(section_key, index, exercise)
+                progression_tip = self._extract_and_move_progression_tip(cached_plan_json)
+                plan_md = self._convert_plan_to_markdown_enhanced(cached_plan_json, user_profile)
+                return {
+                    "success": True,
+                    "plan_json": cached_plan_json,
+                    "plan_md": plan_md,
+                    "error": None,
+                    "progression_tip": progression_tip,
+                    "system_prompt": system_prompt # The rendered user prompt, for display
+                }
 
         # --- EXPONENTIAL BACKOFF AND RETRY LOGIC ---
         error_message = ""
+        attempts = prompt_tokens = completion_tokens = 0
         for attempt in range(MAX_RETRIES):
+            attempts += 1
             try:
-                # 1. Make the API request
-                response = requests.post(self.endpoint_url, headers=headers, json=payload)
-                
-                # 2. Check for successful status code
-                if response.status_code != 200:
-                    response_text = response.text
-                    raise requests.HTTPError(f"API returned non-200 status: {response.status_code}. Response: {response_text[:100]}...")
-                
-                result = response.json()
-                plan_text = result['choices'][0]['message']['content'] if 'choices' in result and result['choices'] else ""
+                # 1. Make the API request (streamed when a live consumer is attached)
+                stream_to = emit_exercise if on_exercise and STREAMING_ENABLED else None
+                try:
+                    plan_text, usage = self._request_plan_text(headers, payload, stream_to)
+                except ResponseFormatRejected:
+                    # Not one of the MAX_RETRIES: resend at once with the same prompt, without response_format
+                    payload.pop("response_format", None)
+                    attempts += 1
+                    plan_text, usage = self._request_plan_text(headers, payload, stream_to)
+
+                # Tokens spent on this attempt (reported by the endpoint, else estimated; streams report none)
+                prompt_tokens += usage.get('prompt_tokens') or prompt_report.total
+                completion_tokens += usage.get('completion_tokens') or estimate_tokens(plan_text or "")
 
                 if not plan_text or len(plan_text) < 100:
                     raise ValueError("Empty or too short response from API")
 
-                # 3. JSON Parsing and Validation - LOOK FOR THE ```json BLOCK
-                json_match = re.search(r'```json\s*(\{[\s\S]*?\})\s*```', plan_text, re.IGNORECASE | re.DOTALL)
-                
-                if not json_match:
-                    try:
-                        plan_json = json.loads(plan_text.strip())
-                    except json.JSONDecodeError:
-                        raise ValueError("Could could not extract or parse a valid JSON object from the API response.")
-                else:
-                    json_string = json_match.group(1)
-                    plan_json = json.loads(json_string)
+                # 3. JSON Parsing and Validation (recoverable truncations are repaired instead of retried)
+                plan_json, repaired = self._parse_plan_text(plan_text)
+
+                # Cache the raw parsed plan (before tip extraction and calorie enrichment mutate it);
+                # repaired plans are not cached, so a re-submit can still get the complete one
+                if cache_key is not None and not repaired:
+                    self.response_cache.set(cache_key, plan_json)
+                if structured:
+                    fill_plan(plan_json, targets)
+                GENERATION_METRICS.record(self._metrics_mode(payload), attempts, True, repaired, prompt_tokens, completion_tokens)
 
                 # 4. Success: Extract tip and return
                 progression_tip = self._extract_and_move_progression_tip(plan_json)
@@ -1234,7 +1321,8 @@ class FitnessAdvisor:
                     "plan_json": plan_json,
                     "plan_md": plan_md,
                     "error": None,
-                    "progression_tip": progression_tip 
+                    "progression_tip": progression_tip,
+                    "system_prompt": system_prompt # The rendered user prompt, for display
                 }
 
             except (requests.exceptions.RequestException, requests.HTTPError, ValueError, json.JSONDecodeError) as e:
@@ -1246,15 +1334,215 @@ class FitnessAdvisor:
                     pass
 
         # If all attempts fail, return the fallback plan with the final error message
+        GENERATION_METRICS.record(self._metrics_mode(payload), attempts, False, False, prompt_tokens, completion_tokens)
         # The fallback plan's JSON is passed to the markdown converter, where calories are calculated and fixed.
         return {
             "success": False,
             "plan_json": fallback_plan_json,
             "plan_md": self._convert_plan_to_markdown_enhanced(fallback_plan_json, user_profile), 
             "error": error_message,
-            "progression_tip": progression_tip 
+            "progression_tip": progression_tip,
+            "system_prompt": system_prompt # The rendered user prompt, for display
         }
+
+    def _metrics_mode(self, payload: Dict) -> str:
+        """GENERATION_METRICS label: the output mode, or 'prompt_only' once the endpoint refused response_format."""
+        if self.structured_output == "off" or "response_format" in payload:
+            return self.structured_output
+        return "prompt_only"
+
+    def _build_payload(self, system_prompt: str) -> Dict:
+        """Chat-completions request body for one day's prompt (with the response_format of the output mode)."""
+        payload = {
+            "model": "mistral-small",
+            "messages": [
+                {"role": "system", "content": "You are FriskaAI, an expert clinical exercise physiologist. Your ONLY output is the JSON object requested by the user. Do not add any text or commentary outside the JSON."},
+                {"role": "user", "content": system_prompt}
+            ],
+            "temperature": 0.8,
+            "max_tokens": 4096
+        }
+        output_format = response_format(self.structured_output) if self.response_format_supported else None
+        if output_format:
+            payload["response_format"] = output_format
+        return payload
+
+    def _request_plan_text(self, headers: Dict, payload: Dict, on_exercise=None) -> tuple[str, Dict]:
+        """(completion text, usage) of one request; streamed when `on_exercise` is given (streams report no usage)."""
+        if on_exercise:
+            return self._stream_plan_text(headers, payload, on_exercise), {}
+
+        response = self.http_session.post(
+            self.endpoint_url,
+            headers=headers,
+            json=payload,
+            timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        )
+        
+        # 2. Check for successful status code
+        if response.status_code != 200:
+            self._raise_for_status(response, payload)
+        
+        result = response.json()
+        plan_text = result['choices'][0]['message']['content'] if 'choices' in result and result['choices'] else ""
+        return plan_text, result.get('usage') or {}
+
+    def _raise_for_status(self, response: requests.Response, payload: Dict):
+        """
+        Raises for a non-200 response. Only a 400/422 whose error names the response format (not e.g. a
+        bad model name or context length) marks response_format unsupported for this advisor.
+        """
+        message = f"API returned non-200 status: {response.status_code}. Response: {response.text[:100]}..."
+        if response.status_code in (400, 422) and "response_format" in payload and RESPONSE_FORMAT_ERROR_RE.search(response.text):
+            self.response_format_supported = False
+            raise ResponseFormatRejected(message)
+        raise requests.HTTPError(message)
     
+    def _extract_plan_json(self, plan_text: str) -> Dict:
+        """Parses the plan object from the completion text (```json block or bare JSON). Raises ValueError/JSONDecodeError."""
+        return self._parse_plan_text(plan_text)[0]
+
+    def _parse_plan_text(self, plan_text: str) -> tuple[Dict, bool]:
+        """
+        (plan_json, repaired): single-pass extraction that also recovers trailing commas and
+        completions cut off at max_tokens. A repaired plan is only accepted if every section
+        still has exercises; otherwise ValueError sends the call into a retry.
+        """
+        plan_json, repaired = extract_json_object(plan_text)
+        if repaired:
+            missing_sections = [section for section in STREAMED_SECTIONS if not plan_json.get(section)]
+            if missing_sections:
+                raise ValueError(f"Truncated API response is missing: {', '.join(missing_sections)}")
+        return plan_json, repaired
+
+    def _stream_plan_text(self, headers: Dict, payload: Dict, on_exercise) -> str:
+        """
+        Posts with "stream": true, parses the SSE deltas incrementally and returns the full completion text.
+        `on_exercise(section_key, index, exercise)` fires as soon as each exercise object is complete.
+        """
+        parser = IncrementalPlanParser()
+        with self.http_session.post(
+            self.endpoint_url,
+            headers=headers,
+            json={**payload, "stream": True},
+            timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT), # Read timeout applies between chunks
+            stream=True
+        ) as response:
+            if response.status_code != 200:
+                self._raise_for_status(response, payload)
+
+            for delta in iter_sse_content(response):
+                for section_key, index, exercise in parser.feed(delta):
+                    on_exercise(section_key, index, exercise)
+
+        return parser.text
+
+    def _day_dependencies(self, total_days: int, day_index: int, fitness_level: str) -> Set[int]:
+        """
+        Earlier days whose plans this day must see: its split-letter twin (Day 4 Push (A) -> Day 1),
+        plus every day its repetition rule names (3-day B -> Day 1, 5-day C and 7-day E -> all earlier days).
+        """
+        def focus_key(index: int) -> str:
+            focus, _ = self._determine_split_focus_and_repetition(total_days, index, fitness_level)
+            # Split letter, e.g. "Upper Body (A) / Volume" -> "A"; otherwise the whole focus label
+            letter_match = re.search(r'\(([A-Z])\)', focus)
+            return letter_match.group(1) if letter_match else focus
+
+        dependencies = {earlier for earlier in range(day_index) if focus_key(earlier) == focus_key(day_index)}
+        if total_days == 3 and day_index == 1 and fitness_level != "Beginner (0–6 months)":
+            dependencies.add(0) # "Must be entirely different exercises from Day 1 (A)"
+        elif (total_days, day_index) in ((5, 2), (7, 6)):
+            dependencies.update(range(day_index)) # Workout C / E "must be unique"
+        return dependencies
+
+    def _plan_generation_waves(self, user_profile: Dict) -> List[List[int]]:
+        """
+        Groups day indices into dependency waves for concurrent generation.
+        Days in the same wave are generated in parallel and only see plans from earlier waves, so a
+        day always lands in a later wave than every day in _day_dependencies (the repeated split day
+        waits for its counterpart, 3-day B waits for A). Waves are contiguous day ranges.
+
+        Name avoidance between days of the same wave (warm-up, main and cool-down names alike) is
+        the price of the parallelism: such days may share an exercise where the serial loop
+        (CONCURRENT_GENERATION = False) would not. No repetition rule asks for it between them.
+        """
+        days = user_profile.get("days_per_week", [])
+        fitness_level = user_profile.get("fitness_level", "Beginner (0–6 months)")
+
+        waves = []
+        wave_of = {}
+        for day_index in range(len(days)):
+            dependencies = self._day_dependencies(len(days), day_index, fitness_level)
+            # Never earlier than the previous day's wave, so waves stay contiguous (calendar-ordered avoidance)
+            wave_number = max([wave_of[day_index - 1]] if day_index else [0])
+            if dependencies:
+                wave_number = max(wave_number, 1 + max(wave_of[dependency] for dependency in dependencies))
+            wave_of[day_index] = wave_number
+            if wave_number == len(waves):
+                waves.append([])
+            waves[wave_number].append(day_index)
+        return waves
+
+    def generate_workout_plans_concurrently(self, user_profile: Dict, on_day_complete=None, on_exercise=None) -> Dict[str, Dict]:
+        """
+        Generates all training days with a thread pool, one dependency wave at a time.
+        `on_day_complete(day_index, day_name, result, system_prompt)` is called from the
+        calling thread as each day finishes, so Streamlit widgets can be updated safely.
+        `on_exercise(day_name, section_key, index, exercise)` (optional) streams exercises the same way:
+        workers queue them and the calling thread drains the queue while waiting.
+        """
+        days = user_profile.get("days_per_week", [])
+        results = {}
+        streamed_exercises = queue.Queue()
+
+        # Worker threads inherit the script context so any st.* call inside generation stays attached
+        script_ctx = get_script_run_ctx()
+        def attach_script_ctx():
+            if script_ctx is not None:
+                add_script_run_ctx(threading.current_thread(), script_ctx)
+
+        def queue_exercise_for(day: str):
+            if not on_exercise:
+                return None
+            return lambda section_key, index, exercise: streamed_exercises.put((day, section_key, index, exercise))
+
+        def drain_streamed_exercises():
+            while True:
+                try:
+                    on_exercise(*streamed_exercises.get_nowait())
+                except queue.Empty:
+                    return
+
+        with ThreadPoolExecutor(max_workers=max(1, min(MAX_PARALLEL_DAYS, len(days))), initializer=attach_script_ctx) as executor:
+            # Updated only between waves, so every day in a wave reads the same earlier-waves state
+            avoidance = self.new_avoidance_index()
+            for wave in self._plan_generation_waves(user_profile):
+                futures = {}
+                for day_index in wave:
+                    day = days[day_index]
+                    future = executor.submit(self.generate_workout_plan, user_profile, day, day_index, avoidance, "Full Body", queue_exercise_for(day))
+                    futures[future] = (day_index, day)
+
+                pending = set(futures)
+                while pending:
+                    # Short polls while streaming, so exercises render while the wave is still running
+                    done, pending = wait(pending, timeout=0.1 if on_exercise else None, return_when=FIRST_COMPLETED)
+                    if on_exercise:
+                        drain_streamed_exercises()
+
+                    for future in done:
+                        day_index, day = futures[future]
+                        results[day] = future.result()
+                        if on_day_complete:
+                            # The worker rendered the prompt once; it comes back with the result
+                            on_day_complete(day_index, day, results[day], results[day]["system_prompt"])
+
+                # Waves are contiguous day ranges, so adding them in day order keeps the index in calendar order
+                for day_index in wave:
+                    avoidance.add_day(days[day_index], results[days[day_index]])
+
+        return results
+
     def _generate_fallback_plan_json(self, user_profile: Dict, day_name: str, day_focus: str, sets: str, reps: str, rest: str) -> Dict:
         """
         [FIX 2 Implementation] Generate simple fallback plan as a JSON object with required structure. 
@@ -1465,95 +1753,6 @@ def initialize_session_state():
 
 # ============ INTERACTIVE UI HELPER FUNCTIONS ============
 
-def calculate_performance_calorie_burn(exercise_index: str, day_name: str, advisor: FitnessAdvisor, weight_kg: float) -> float:
-    """
-    Calculates the real-time calorie burn based on logged sets and 
-    the actual MET rate, as requested by the user, using the formula
-    Calories = (MET * Weight_KG * 3.5) / 200 * (Duration in minutes).
-    """
-    
-    logged_data = st.session_state.logged_performance.get(day_name, {}).get(exercise_index, {})
-    actual_sets = logged_data.get('actual_sets', 0)
-    # Note: actual_reps is either reps for strength or seconds for time-based/cardio
-    actual_units_per_set = logged_data.get('actual_reps', 0) 
-    
-    # 1. Basic checks
-    if actual_sets <= 0 or actual_units_per_set <= 0 or weight_kg <= 0:
-        return 0.0
-
-    plan = st.session_state.all_json_plans.get(day_name)
-    profile = st.session_state.user_profile
-    if not plan or not profile:
-        return 0.0
-
-    # 2. Find the exercise data and section type
-    ex_data = None
-    section_map = {'warmup': plan.get('warmup', []), 'main': plan.get('main_workout', []), 'cooldown': plan.get('cooldown', [])}
-    section_key = None
-    
-    try:
-        section_key, idx = exercise_index.split('_')
-        idx = int(idx) - 1
-        
-        if section_key in section_map and 0 <= idx < len(section_map[section_key]):
-            ex_data = section_map[section_key][idx]
-    except:
-        return 0.0
-
-    if not ex_data:
-        return 0.0
-        
-    exercise_name = ex_data.get('name', 'Unknown Exercise')
-    fitness_level = profile.get('fitness_level', "Beginner (0–6 months)")
-
-    # 3. Determine MET value based on the exercise and user level
-    # Use the stored MET value if available, otherwise look it up again (robustness)
-    met_value = ex_data.get('met_value') 
-    if not met_value:
-         met_value = advisor._get_met_value(exercise_name, fitness_level) 
-    
-    if met_value <= 0:
-        # Fallback to a safe general MET if lookup fails
-        met_value = 3.0
-        
-    # 4. Determine total duration in minutes based on ACTUAL performance
-    
-    total_seconds = 0.0
-    
-    # Check if the exercise is time-based (hold/cooldown/cardio warmup)
-    name_lower = exercise_name.lower()
-    
-    is_time_based_exercise = False
-    if section_key == 'cooldown':
-        is_time_based_exercise = True
-    # Check main/warmup for explicit time-based descriptions
-    elif ('hold' in name_lower or 'second' in name_lower or 'minute' in name_lower):
-        is_time_based_exercise = True
-    # Special check for warmup cardio (which is logged in seconds)
-    elif section_key == 'warmup' and ('march' in name_lower or 'jog' in name_lower or 'jack' in name_lower or 'cardio' in name_lower):
-         is_time_based_exercise = True
-
-    if is_time_based_exercise:
-        # If it's time-based, actual_units_per_set is the duration in seconds per set
-        total_seconds = actual_sets * actual_units_per_set
-    else:
-        # If it's rep-based, estimate time per rep (5 seconds is a conservative estimate for strength/dynamic)
-        # 5 seconds per rep (assuming 3-1-1 tempo)
-        estimated_seconds_per_set = (actual_units_per_set * 5)
-        total_seconds = actual_sets * estimated_seconds_per_set
-        
-    total_minutes = total_seconds / 60.0
-
-    # 5. Apply the Calorimetry Formula
-    # Formula: Calories = (MET * Weight_KG * 3.5) / 200 * Minutes
-    
-    if total_minutes == 0:
-        return 0.0
-
-    estimated_calories = (met_value * weight_kg * 3.5) / 200 * total_minutes
-    
-    return max(0.0, estimated_calories)
-
 def display_interactive_workout_day(day_name: str, plan_json: Dict, profile: Dict, advisor: FitnessAdvisor):
     """Dynamically renders the workout plan with interactive logging."""
     
@@ -1563,6 +1762,11 @@ def display_interactive_workout_day(day_name: str, plan_json: Dict, profile: Dic
     if day_name not in st.session_state.logged_performance:
         st.session_state.logged_performance[day_name] = {}
 
+    # Calorie inputs for the whole day, flattened once per rerun (MET lookups and parsing are memoized)
+    calorie_table = advisor.build_calorie_table(plan_json or {}, profile.get('fitness_level', "Beginner (0–6 months)"))
+    # ex_id -> (placeholder, rate unit); filled after every widget has written its logged value
+    calorie_slots = {}
+
     def update_sets(day, ex_id, delta):
         st.session_state.logged_performance[day][ex_id]['actual_sets'] = max(0, st.session_state.logged_performance[day][ex_id]['actual_sets'] + delta)
 
@@ -1594,18 +1798,8 @@ def display_interactive_workout_day(day_name: str, plan_json: Dict, profile: Dic
                 planned_unit_label = "Reps"
 
             # Parse a single numeric value from the planned string for the logging widget default
-            try:
-                if '-' in planned_unit_str:
-                    low = int(re.search(r'(\d+)', planned_unit_str.split('-')[0]).group(1))
-                    high_part = planned_unit_str.split('-')[-1]
-                    high = int(re.search(r'(\d+)', high_part).group(1))
-                    planned_numeric_default = int((low + high) / 2)
-                elif re.search(r'(\d+)', planned_unit_str):
-                    planned_numeric_default = int(re.search(r'(\d+)', planned_unit_str).group(1))
-                else:
-                    planned_numeric_default = 10 # Default to 10
-            except:
-                planned_numeric_default = 10
+            planned_rx = parse_prescription(planned_unit_str)
+            planned_numeric_default = int(planned_rx.average) if planned_rx.average is not None else 10 # Default to 10
 
 
             # --- UI RENDERING ---
@@ -1650,15 +1844,13 @@ def display_interactive_workout_day(day_name: str, plan_json: Dict, profile: Dic
             units_key = f"units_log_{ex_id}_{day_name}"
             current_units = st.session_state.logged_performance[day_name][ex_id]['actual_reps']
             
-            # Units display and input
-            # Use the dedicated calorie rate function to get the correct unit (Rep or Sec)
-            rate_per_unit, rate_unit = advisor._calculate_calorie_rate(exercise.get('name', ''), weight_kg)
+            # Units display and input (Rep or Sec; the first warm-up cardio is always logged in seconds)
+            rate_unit = advisor._logging_unit(exercise.get('name', ''), section_key, idx + 1)
             
             # If the exercise is the FIRST cardio warmup, enforce SECONDS for logging and default to 90
             if idx == 0 and section_key == 'warmup':
                  unit_input_default = 90
                  unit_input_step = 5
-                 rate_unit = "Sec" # ENFORCE SECONDS for warm-up cardio logging
             else:
                  unit_input_default = planned_numeric_default
                  unit_input_step = 1
@@ -1683,28 +1875,21 @@ def display_interactive_workout_day(day_name: str, plan_json: Dict, profile: Dic
                 st.session_state.logged_performance[day_name][ex_id]['actual_reps'] = new_units
                 # Since Streamlit reruns on interaction, the calorie calculation will pick up the new value automatically.
 
-            # --- Calorie Burn Display (UPDATED RATE CALCULATION) ---
-            total_cal = calculate_performance_calorie_burn(ex_id, day_name, advisor, weight_kg)
-            
-            # Determine the MET value and calculate the rate per unit based on the type of unit (Rep or Sec)
-            met_value = exercise.get('met_value', advisor._get_met_value(exercise.get('name', ''), profile.get('fitness_level', "Beginner (0–6 months)")))
-            
-            # Formula: Cal/Minute = (MET * Weight_KG * 3.5) / 200
-            cal_per_minute = (met_value * weight_kg * 3.5) / 200
-            cal_per_unit_rate = 0.0
-            if rate_unit == "Sec":
-                # If the unit is seconds, the rate is Cal/minute / 60
-                cal_per_unit_rate = cal_per_minute / 60
-            elif rate_unit == "Rep":
-                # If the unit is reps, the rate is Cal/minute * (estimated seconds per rep / 60 seconds)
-                # We estimate 5 seconds per rep for strength/dynamic movements
-                cal_per_unit_rate = (cal_per_minute * 5) / 60 
-
+            # --- Calorie Burn Display ---
+            # Reserved here, filled from the vectorized day summary once all sections are rendered
             col_log_cal.markdown(f"**🔥 Performance Burn**")
-            col_log_cal.info(f"**{round(total_cal)} Cal** (Rate Est: {cal_per_unit_rate:.2f} Cal/{rate_unit})")
+            calorie_slots[ex_id] = (col_log_cal.empty(), rate_unit)
             
             # Display Steps (Always display steps below the logging)
-            with st.expander("Show Detailed Steps"):
+            # The expander reruns when toggled, so the demo GIF is only read while it is open
+            # (a plain expander on Streamlit releases without on_change: steps only, as before)
+            toggle_options = {'key': f"steps_{ex_id}_{day_name}", 'on_change': "rerun"} if EXPANDER_RERUNS_ON_TOGGLE else {}
+            steps_expander = st.expander("Show Detailed Steps", **toggle_options)
+            with steps_expander:
+                if getattr(steps_expander, 'open', None):
+                    demo_gif = MEDIA.gif_for(exercise.get('name', ''), display_width_for(st.context.headers, DEMO_GIF_WIDTH))
+                    if demo_gif:
+                        st.image(demo_gif, width=DEMO_GIF_WIDTH)
                 st.markdown("##### How to Perform:")
                 steps = exercise.get('steps', [])
                 if steps:
@@ -1727,10 +1912,11 @@ def display_interactive_workout_day(day_name: str, plan_json: Dict, profile: Dic
         # Total Summary
         st.markdown("## 🔥 **Daily Summary**")
         
-        # Calculate total for the day
-        total_daily_calories = 0
-        for ex_id in st.session_state.logged_performance.get(day_name, {}):
-            total_daily_calories += calculate_performance_calorie_burn(ex_id, day_name, advisor, weight_kg)
+        # Calculate per-exercise burn and the day total in one pass over the logged performance
+        calorie_summary = calorie_table.summary(weight_kg, st.session_state.logged_performance[day_name])
+        for ex_id, (slot, rate_unit) in calorie_slots.items():
+            slot.info(f"**{round(calorie_summary['logged'][ex_id])} Cal** (Rate Est: {calorie_summary['rates'][ex_id]:.2f} Cal/{rate_unit})")
+        total_daily_calories = calorie_summary['logged_total']
 
         st.info(f"**TOTAL Calories Burned (Based on Logged Performance):** **{round(total_daily_calories)} Cal**")
         
@@ -2019,22 +2205,55 @@ def main():
             st.rerun() 
             return
 
-        for idx, day in enumerate(days_to_generate):
-            
-            # Pass all previously generated plans to the prompt builder
-            previous_plans_to_pass = {d: st.session_state.workout_plans[d] for d in days_to_generate if d in st.session_state.workout_plans and days_to_generate.index(d) < idx}
-            
-            # Building the system prompt, but NOT displaying it
-            system_prompt = advisor._build_system_prompt(
-                profile, 
-                day, 
-                idx, 
-                previous_plans_to_pass, 
-                "Full Body"
+        def store_day_result(day: str, result: Dict):
+            st.session_state.workout_plans[day] = result
+            st.session_state.all_json_plans[day] = result.get('plan_json', None)
+            st.session_state.all_progression_tips[day] = result.get('progression_tip', "No specific tip generated for this day.")
+
+        # --- LIVE PREVIEW (STREAMING) ---
+        # One expander per day; each exercise gets a placeholder that is filled as soon as its JSON object
+        # has streamed in, so the warm-up is visible while the main workout is still being generated.
+        live_preview = st.container()
+        stream_views = {}
+        section_titles = {'warmup': "Warm-Up", 'main_workout': "Main Workout", 'cooldown': "Cool-Down"}
+
+        def on_exercise(day: str, section_key: str, ex_idx: int, exercise: Dict):
+            if day not in stream_views:
+                stream_views[day] = {'expander': live_preview.expander(f"📋 {day} Workout (generating...)", expanded=True), 'slots': {}}
+            view = stream_views[day]
+            slot_key = (section_key, ex_idx) # Retries restart the indices and overwrite the same slots
+            if slot_key not in view['slots']:
+                view['slots'][slot_key] = view['expander'].empty()
+            amount = exercise.get('hold') if section_key == 'cooldown' else exercise.get('reps', 'N/A')
+            view['slots'][slot_key].markdown(
+                f"**{section_titles[section_key]} {ex_idx + 1}. {exercise.get('name', 'N/A')}** — "
+                f"Sets: {exercise.get('sets', '1')} | {amount or 'N/A'} | Rest: {exercise.get('rest', 'N/A')}"
             )
-            
-            st.session_state.all_prompts[day] = system_prompt
-            
+        stream_exercise = on_exercise if STREAMING_ENABLED else None
+
+        if CONCURRENT_GENERATION and len(days_to_generate) > 1:
+            # Independent days run in parallel; the progress bar advances as each day finishes
+            progress_bar.progress(0.01)
+            status_text.text(f"Generating {len(days_to_generate)} workouts in parallel...")
+            completed_days = []
+
+            def on_day_complete(idx: int, day: str, result: Dict, system_prompt: str):
+                st.session_state.all_prompts[day] = system_prompt
+                store_day_result(day, result)
+                completed_days.append(day)
+                progress_bar.progress(len(completed_days) / len(days_to_generate))
+                status_text.text(f"Finished {day} workout... ({len(completed_days)}/{len(days_to_generate)})")
+
+            advisor.generate_workout_plans_concurrently(profile, on_day_complete=on_day_complete, on_exercise=stream_exercise)
+
+        # Sequential path: generates every day not already produced by the concurrent mode above
+        # The avoidance index grows by one day per iteration and is what the prompt builder reads
+        avoidance = advisor.new_avoidance_index()
+        for idx, day in enumerate(days_to_generate):
+            if day in st.session_state.workout_plans:
+                avoidance.add_day(day, st.session_state.workout_plans[day])
+                continue
+
             progress = (idx) / len(days_to_generate) 
             if progress == 0 and idx == 0:
                  progress = 0.01
@@ -2046,14 +2265,16 @@ def main():
                 profile,
                 day,
                 idx,
-                previous_plans_to_pass, 
-                "Full Body"
+                avoidance, 
+                "Full Body",
+                on_exercise=(lambda section_key, ex_idx, exercise, day=day: on_exercise(day, section_key, ex_idx, exercise)) if stream_exercise else None
             )
             
-            st.session_state.workout_plans[day] = result
-            st.session_state.all_json_plans[day] = result.get('plan_json', None)
-            st.session_state.all_progression_tips[day] = result.get('progression_tip', "No specific tip generated for this day.")
-            
+            # The system prompt is stored, but NOT displayed (rendered once, inside generate_workout_plan)
+            st.session_state.all_prompts[day] = result["system_prompt"]
+            store_day_result(day, result)
+            avoidance.add_day(day, st.session_state.workout_plans[day])
+
             progress_bar.progress((idx + 1) / len(days_to_generate))
 
 
@@ -2090,6 +2311,12 @@ def main():
             st.markdown(f"👋 Welcome, **{profile.get('name', 'User')}**!")
             st.markdown(f"Your Personalized Fitness Plan is Ready")
             st.markdown(f"📅 Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | 🎯 Goal: **{profile.get('primary_goal', 'N/A')}** | 💪 Level: **{profile.get('fitness_level', 'N/A')}**")
+            if advisor.response_cache is not None:
+                cache_stats = advisor.response_cache.stats()
+                st.caption(f"⚡ Plan cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses ({cache_stats['entries']} stored plans)")
+            generation_stats = GENERATION_METRICS.stats().get(advisor.structured_output)
+            if generation_stats:
+                st.caption(f"🧾 LLM output ({advisor.structured_output}): {generation_stats['completion_tokens_per_call']:.0f} tokens per day plan, retry rate {generation_stats['retry_rate']:.0%}")
             
             st.markdown("\n")
             